@@ -0,0 +1,9 @@
+"""
+ASGI entrypoint for ASGI servers, e.g. ``uvicorn asgi:app --workers 4``.
+
+Requests run on a thread each (up to ASGI_THREADS per process), see myapp/asgi.py.
+"""
+
+from myapp.asgi import create_asgi_app
+
+app = create_asgi_app()
@@ -0,0 +1,210 @@
+"""
+Compare GitHub logins per second of gunicorn sync and gthread workers and of
+uvicorn serving asgi.py while the provider is slow.
+
+Every login is GET /auth/github/login followed by the callback, which makes
+three provider calls (token, then user + emails at the same time) against a
+local stub that answers after --latency seconds. The app is served by
+--workers sync workers (one request each at a time), by --workers gthread
+workers with --threads threads each, then by --workers uvicorn processes with
+ASGI_THREADS=--threads, while --concurrency clients log in for --seconds.
+
+    python -m benchmarks.oauth_latency --workers 2 --threads 16 --concurrency 64
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+ROOT = Path(__file__).resolve().parents[1]
+
+MODES = ("sync", "gthread", "asgi")
+
+
+def _point_at_stub() -> None:
+    from myapp.blueprints.auth.oauth import oauth
+
+    url = os.environ["BENCH_PROVIDER_URL"]
+    oauth.github.access_token_url = f"{url}/login/oauth/access_token"
+    oauth.github.authorize_url = f"{url}/login/oauth/authorize"
+    oauth.github.api_base_url = f"{url}/"
+
+
+def bench_wsgi():
+    """App factory for the gunicorn servers: GitHub pointed at the stub provider."""
+    from myapp import create_app
+
+    app = create_app()
+    _point_at_stub()
+    return app
+
+
+def bench_asgi():
+    """App factory for uvicorn, same as bench_wsgi() behind asgi.py's adapter."""
+    from myapp.asgi import create_asgi_app
+
+    app = create_asgi_app()
+    _point_at_stub()
+    return app
+
+
+def _command(mode: str, port: int, workers: int, threads: int) -> list[str]:
+    if mode == "asgi":
+        return [
+            sys.executable, "-m", "uvicorn", "--factory", "benchmarks.oauth_latency:bench_asgi",
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+            "--log-level", "warning",
+        ]  # fmt: skip
+    return [
+        sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}",
+        "--workers", str(workers), "--worker-class", mode,
+        "--threads", str(threads if mode == "gthread" else 1),
+        "--timeout", "120", "--log-level", "warning",
+        "benchmarks.oauth_latency:bench_wsgi()",
+    ]  # fmt: skip
+
+
+def _wait_ready(base: str, server: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with {server.returncode}")
+        try:
+            if requests.get(f"{base}/health/live", timeout=5).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+
+def _login(base: str) -> bool:
+    with requests.Session() as client:
+        resp = client.get(f"{base}/auth/github/login", allow_redirects=False, timeout=60)
+        state = parse_qs(urlparse(resp.headers["Location"]).query)["state"][0]
+        resp = client.get(
+            f"{base}/auth/github/callback",
+            params={"code": "abc", "state": state},
+            allow_redirects=False,
+            timeout=60,
+        )
+        return resp.status_code == 302
+
+
+def _load(base: str, concurrency: int, seconds: float) -> dict[str, float]:
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+
+    def client() -> None:
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                ok = _login(base)
+            except (requests.RequestException, KeyError):
+                ok = False
+            with lock:
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in clients:
+        t.start()
+    for t in clients:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    pct = lambda p: latencies[int(p * (len(latencies) - 1))] * 1000 if latencies else 0.0  # noqa: E731
+    return {
+        "logins": len(latencies),
+        "errors": errors,
+        "per_s": len(latencies) / elapsed,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+    }
+
+
+def run(
+    mode: str, provider_url: str, db_url: str, workers: int, threads: int, concurrency: int,
+    seconds: float, port: int,
+) -> dict[str, float]:  # fmt: skip
+    env = {
+        **os.environ,
+        "CONFIG": "development",
+        "SECRET_KEY": "bench",
+        "DATABASE_URL": db_url,
+        "AUTH_PROVIDERS": "local,github",
+        "GITHUB_CLIENT_ID": "bench",
+        "GITHUB_CLIENT_SECRET": "bench",
+        "RATELIMIT_ENABLED": "0",
+        "SQL_STATS_ENABLED": "0",
+        "SERVER_TIMING_ENABLED": "0",
+        "BENCH_PROVIDER_URL": provider_url,
+        "ASGI_THREADS": str(threads),
+    }
+    server = subprocess.Popen(_command(mode, port, workers, threads), cwd=ROOT, env=env)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(base, server)
+        _login(base)  # creates the user; the measured logins find it
+        return _load(base, concurrency, seconds)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated subset")
+    parser.add_argument("--workers", type=int, default=2, help="server processes")
+    parser.add_argument("--threads", type=int, default=16, help="threads per process")
+    parser.add_argument("--concurrency", type=int, default=64, help="clients logging in")
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration per mode")
+    parser.add_argument("--latency", type=float, default=0.1, help="provider response delay")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    from myapp import create_app
+    from myapp.extensions import db
+    from tests.stub_provider import StubProvider
+
+    with tempfile.TemporaryDirectory() as tmp, StubProvider() as provider:
+        db_url = f"sqlite:///{Path(tmp) / 'bench.sqlite3'}"
+        os.environ["DATABASE_URL"] = db_url
+        with create_app("development").app_context():
+            db.create_all()
+        provider.delays = dict.fromkeys(
+            ("/login/oauth/access_token", "/user", "/user/emails"), args.latency
+        )
+
+        for mode in args.modes.split(","):
+            r = run(
+                mode, provider.url, db_url, args.workers, args.threads, args.concurrency,
+                args.seconds, args.port,
+            )  # fmt: skip
+            threads = 1 if mode == "sync" else args.threads
+            print(
+                f"{mode:<8} workers={args.workers} threads={threads:<3} "
+                f"logins={r['logins']:<6} errors={r['errors']:<4} {r['per_s']:7.1f} logins/s  "
+                f"p50={r['p50_ms']:.0f}ms p95={r['p95_ms']:.0f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Gunicorn configuration (copied to /app/gunicorn.conf.py by the Dockerfile).
+
+Every setting can be overridden from the environment, see .env.example.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+
+
+def _env_int(name: str, default: int) -> int:
+    val = os.getenv(name)
+    if val is None or not val.strip():
+        return default
+    return int(val)
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    val = os.getenv(name)
+    if val is None:
+        return default
+    return val.strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
+def _cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS
+        return os.cpu_count() or 1
+
+
+# ----------------------------
+# Server socket
+# ----------------------------
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+backlog = _env_int("GUNICORN_BACKLOG", 2048)
+
+# ----------------------------
+# Workers
+# ----------------------------
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync").strip().lower()
+if worker_class not in {"sync", "gthread"}:
+    raise RuntimeError(f"Unsupported GUNICORN_WORKER_CLASS={worker_class!r}. Use sync or gthread.")
+
+threads = _env_int("GUNICORN_THREADS", 4 if worker_class == "gthread" else 1)
+
+# sync workers handle one request each, so oversubscribe the CPUs;
+# gthread workers get their concurrency from threads instead. gthread is the
+# supported choice for I/O-bound traffic such as OAuth callbacks, which spend
+# most of their time waiting on the provider (benchmarks/oauth_latency.py).
+_default_workers = 2 * _cpu_count() + 1 if worker_class == "sync" else _cpu_count() + 1
+workers = _env_int("GUNICORN_WORKERS", _default_workers)
+
+timeout = _env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = _env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = _env_int("GUNICORN_KEEPALIVE", 5)
+
+# Recycle workers periodically to cap slow memory growth; jitter avoids
+# all workers restarting at the same moment.
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 2000)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10)
+
+# Load the app once in the master so workers share its memory (copy-on-write)
+# and boot faster. Inherited DB connections are dropped in post_fork below.
+preload_app = _env_bool("GUNICORN_PRELOAD", True)
+
+# Compile templates and open pool connections before the worker takes traffic
+_warmup = _env_bool("GUNICORN_WARMUP", True)
+
+# ----------------------------
+# Logging
+# ----------------------------
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-") or None
+errorlog = "-"
+
+# ----------------------------
+# Hooks
+# ----------------------------
+_master_started = time.monotonic()
+
+
+def _dispose_engines(app) -> None:
+    from myapp.extensions import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False: the parent's sockets must not be closed from the child,
+            # just forgotten so this worker opens its own connections.
+            engine.dispose(close=False)
+
+
+def on_starting(server) -> None:
+    # Samples from a previous run would be merged into this one
+    metrics_dir = os.getenv("METRICS_DIR")
+    if metrics_dir:
+        from myapp.metrics import clear_directory
+
+        clear_directory(metrics_dir)
+
+
+def when_ready(server) -> None:
+    server.log.info("Master ready in %.1f ms", (time.monotonic() - _master_started) * 1000)
+
+
+def post_fork(server, worker) -> None:
+    worker.boot_started = time.monotonic()
+    if server.cfg.preload_app:
+        _dispose_engines(server.app.wsgi())
+
+
+def post_worker_init(worker) -> None:
+    if _warmup:
+        from myapp.warmup import warmup as warmup_app
+
+        warmup_app(worker.wsgi)
+
+    # Start the readiness probes now so the first /health/ready has results
+    monitor = getattr(worker.wsgi, "extensions", {}).get("health")
+    if monitor is not None:
+        monitor.ensure_started()
+
+    # Refresh OIDC discovery documents / signing keys ahead of expiry
+    for documents in getattr(worker.wsgi, "extensions", {}).get("oidc", {}).values():
+        documents.ensure_started()
+
+    started = getattr(worker, "boot_started", None)
+    if started is not None:
+        worker.log.info(
+            "Worker %s booted in %.1f ms", worker.pid, (time.monotonic() - started) * 1000
+        )
+
+
+def child_exit(server, worker) -> None:
+    # Gauges (in-flight, pool state) of a dead worker must not be summed any more
+    if os.getenv("METRICS_DIR"):
+        from myapp.metrics import mark_process_dead
+
+        mark_process_dead(worker.pid)
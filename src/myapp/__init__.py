@@ -1,23 +1,67 @@
 from __future__ import annotations
 
+import importlib
 import os
+import time
 
 from dotenv import load_dotenv
 from flask import Flask, render_template
 
-from .blueprints.admin import bp as admin_bp
-from .blueprints.api import bp as api_bp
-from .blueprints.auth import bp as auth_bp
-from .blueprints.auth import init_auth
-from .cli import register_cli
-from .config import build_config
-from .errors import register_error_handlers
-from .extensions import csrf, db, login_manager, migrate
-from .models import User
-from .request_id import register_request_id
+# name -> (module, url_prefix, optional init hook). Modules are imported only for
+# blueprints listed in APP_BLUEPRINTS, so CLI/job processes can skip them entirely.
+_BLUEPRINTS: dict[str, tuple[str, str, str | None]] = {
+    "auth": (".blueprints.auth", "/auth", "init_auth"),
+    "api": (".blueprints.api", "/api", None),
+    "admin": (".blueprints.admin", "/admin", None),
+}
+
+
+def register_blueprints(app: Flask) -> None:
+    names = app.config.get("APP_BLUEPRINTS", list(_BLUEPRINTS))
+    for name in names:
+        if name == "none":
+            continue
+        try:
+            module_name, url_prefix, init_hook = _BLUEPRINTS[name]
+        except KeyError as e:
+            raise ValueError(
+                f"Unknown blueprint {name!r} in APP_BLUEPRINTS. "
+                f"Use one of: {', '.join(sorted(_BLUEPRINTS))}, none"
+            ) from e
+
+        module = importlib.import_module(module_name, __name__)
+        if init_hook:
+            getattr(module, init_hook)(app)
+        app.register_blueprint(module.bp, url_prefix=url_prefix)
 
 
 def create_app(config_name: str | None = None) -> Flask:
+    # Imported here so `import myapp` stays cheap; counted in create_app_ms
+    started = time.perf_counter()
+
+    from werkzeug.middleware.proxy_fix import ProxyFix
+
+    from .auth.hashing import init_password_hashing
+    from .auth.tokens import init_api_tokens
+    from .auth.user_cache import init_user_cache
+    from .cache import init_cache
+    from .cli import register_cli
+    from .config import build_config
+    from .errors import register_error_handlers
+    from .extensions import csrf, db, login_manager, migrate
+    from .health import register_health
+    from .logs import configure_logging
+    from .memory import init_memory_inspector
+    from .metrics import register_metrics
+    from .models import User
+    from .profiling import register_profiling
+    from .querystats import register_query_stats
+    from .ratelimit import init_rate_limiter
+    from .request_id import register_request_id
+    from .sqlite_tuning import register_sqlite_pragmas
+    from .templating import init_template_cache
+    from .timing import register_server_timing
+
     load_dotenv()  # Load .env if it exists
 
     app = Flask(
@@ -30,6 +74,12 @@ def create_app(config_name: str | None = None) -> Flask:
     # Config: default from env (e.g. CONFIG=development)
     config_name = config_name or os.getenv("CONFIG", "development").lower()
     app.config.from_mapping(build_config(config_name))
+    configure_logging(app)
+
+    # Client address/scheme from the X-Forwarded-* headers set by trusted proxies
+    proxies = int(app.config.get("TRUSTED_PROXY_COUNT", 0))
+    if proxies > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
 
     # Ensure instance folder exists (good for local configs / sqlite)
     os.makedirs(app.instance_path, exist_ok=True)
@@ -39,28 +89,42 @@ def create_app(config_name: str | None = None) -> Flask:
     login_manager.init_app(app)
     csrf.init_app(app)
     migrate.init_app(app, db)
+    register_sqlite_pragmas(app)
+    init_template_cache(app)
+
+    init_password_hashing(app)
+    user_cache = init_user_cache(app)
+    init_cache(app)
+    init_memory_inspector(app)
+    init_rate_limiter(app)
+    init_api_tokens(app)
 
     @login_manager.user_loader
     def load_user(user_id: str):
+        if user_cache is not None:
+            return user_cache.load(int(user_id))
         return db.session.get(User, int(user_id))
 
-    init_auth(app)
-
-    # Register blueprints
-    app.register_blueprint(auth_bp, url_prefix="/auth")
-    app.register_blueprint(api_bp, url_prefix="/api")
-    app.register_blueprint(admin_bp, url_prefix="/admin")
+    register_blueprints(app)
 
     register_cli(app)
     register_request_id(app)
+    register_metrics(app)
+    register_server_timing(app)
+    register_query_stats(app)
+    register_profiling(app)
+    register_health(app)
     register_error_handlers(app)
 
     @app.get("/")
     def index():
         return render_template("index.html")
 
-    @app.get("/health")
-    def health():
-        return {"status": "ok"}
+    app.extensions["startup"] = {"create_app_ms": (time.perf_counter() - started) * 1000}
+
+    if app.config.get("WARMUP_ON_CREATE", False):
+        from .warmup import warmup
+
+        warmup(app)
 
     return app
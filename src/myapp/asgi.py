@@ -0,0 +1,96 @@
+"""
+Serving the app from an ASGI server (uvicorn, hypercorn), see asgi.py at the
+repository root.
+
+asgiref's WsgiToAsgi runs the WSGI app through ``sync_to_async`` in
+thread-sensitive mode, which by default means one thread shared by the whole
+process: a single OAuth callback waiting on its provider would stall every
+other request. ThreadedWsgiToAsgi enters asgiref's ThreadSensitiveContext per
+request, so each request in flight gets its own thread, and caps them at
+ASGI_THREADS with a semaphore. The event loop owns the sockets (keep-alive,
+slow clients); the app, which is synchronous all the way down (Flask-Login,
+Flask-SQLAlchemy sessions), gets a thread per request, like gunicorn's gthread
+worker.
+
+The ASGI lifespan events do what docker/gunicorn.conf.py does per worker:
+warm up, then start the health probes and OIDC refreshers.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from contextvars import Context
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from asgiref.wsgi import WsgiToAsgi
+from flask import Flask
+
+from . import create_app
+
+logger = logging.getLogger("myapp.asgi")
+
+# One thread per DB connection of the default pool (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+DEFAULT_THREADS = 20
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    def __init__(
+        self, wsgi_application: Flask, threads: int = DEFAULT_THREADS, warmup: bool = True
+    ) -> None:
+        super().__init__(wsgi_application)
+        self.threads = threads
+        self.warmup = warmup
+        self._slots = asyncio.Semaphore(threads)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        async with self._slots:
+            # A fresh context per request: asgiref copies context variables back
+            # from the worker thread, and must not see another request's state
+            await asyncio.create_task(self._serve(scope, receive, send), context=Context())
+
+    async def _serve(self, scope, receive, send) -> None:
+        # A new thread-sensitive context gives the request its own thread
+        async with ThreadSensitiveContext():
+            await super().__call__(scope, receive, send)
+
+    def startup(self) -> None:
+        app = self.wsgi_application
+        if self.warmup and "warmup" not in app.extensions:  # not done by WARMUP_ON_CREATE
+            from .warmup import warmup
+
+            warmup(app)
+        monitor = app.extensions.get("health")
+        if monitor is not None:
+            monitor.ensure_started()
+        for documents in app.extensions.get("oidc", {}).values():
+            documents.ensure_started()
+
+    async def lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await sync_to_async(self.startup, thread_sensitive=False)()
+                except Exception as exc:
+                    logger.exception("ASGI startup failed")
+                    await send({"type": "lifespan.startup.failed", "message": str(exc)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(
+    config_name: str | None = None, threads: int | None = None
+) -> ThreadedWsgiToAsgi:
+    """ASGI application serving create_app(config_name) from up to `threads` threads."""
+    if threads is None:
+        threads = int(os.getenv("ASGI_THREADS") or DEFAULT_THREADS)
+    warmup = os.getenv("ASGI_WARMUP", "1").strip().lower() in {"1", "true", "yes", "y", "on"}
+    return ThreadedWsgiToAsgi(create_app(config_name), threads=threads, warmup=warmup)
@@ -0,0 +1,260 @@
+"""
+Password hashing on a small bounded thread pool per worker.
+
+hashlib's scrypt/pbkdf2 release the GIL, so with gthread workers hashes run
+in parallel with other requests, but never more than
+PASSWORD_HASH_MAX_CONCURRENCY at once, and at most PASSWORD_HASH_MAX_QUEUE
+more may wait. Beyond that, or after waiting PASSWORD_HASH_WAIT_TIMEOUT
+seconds, the request fails fast with 503 + Retry-After instead of tying up
+the worker, so a credential-stuffing burst cannot starve other traffic.
+
+The limits are per process, so they only matter with several requests in
+flight per process (gthread workers). A sync worker serves one
+request at a time: its pool never queues or rejects anything, and the worker
+count alone bounds concurrent hashes.
+"""
+
+from __future__ import annotations
+
+import os
+import statistics
+import threading
+import time
+import weakref
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import TypeVar
+
+from flask import Flask, current_app, has_app_context
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import (
+    DEFAULT_PBKDF2_ITERATIONS,
+    check_password_hash,
+    generate_password_hash,
+)
+
+from ..metrics import get_metrics
+
+EXTENSION_KEY = "password_hashing"
+# werkzeug's default for generate_password_hash
+DEFAULT_METHOD = "scrypt"
+
+# Candidates for calibrate(), cheapest first within each family
+SCRYPT_CANDIDATES = tuple(f"scrypt:{2**k}:8:1" for k in (14, 15, 16, 17))
+PBKDF2_CANDIDATES = tuple(
+    f"pbkdf2:sha256:{n}" for n in (300_000, 600_000, 1_000_000, 1_500_000, 2_000_000)
+)
+
+T = TypeVar("T")
+
+
+class HashingUnavailable(ServiceUnavailable):
+    description = "Too many sign-in attempts are being processed. Please try again shortly."
+
+
+class HashExecutor:
+    def __init__(
+        self,
+        *,
+        max_workers: int = 2,
+        max_queue: int = 8,
+        wait_timeout: float = 2.0,
+        retry_after: int = 1,
+    ) -> None:
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.wait_timeout = wait_timeout
+        self.retry_after = retry_after
+        self.rejected = 0
+        self._executor: ThreadPoolExecutor | None = None
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        _executors.add(self)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        self.max_workers, thread_name_prefix="myapp-hash"
+                    )
+        return self._executor
+
+    def reset_after_fork(self) -> None:
+        # The parent's pool threads do not exist in the child
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+
+    def run(self, fn: Callable[..., T], *args) -> T:
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingUnavailable(retry_after=self.retry_after)
+
+        slots = self._slots
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        # The slot is held until the hash finishes, even if we stop waiting for it
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.wait_timeout)
+        except FutureTimeout:
+            self.rejected += 1
+            raise HashingUnavailable(retry_after=self.retry_after) from None
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+_executors: weakref.WeakSet[HashExecutor] = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for executor in list(_executors):
+        executor.reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _run(op: str, fn: Callable[..., T], *args) -> T:
+    if not has_app_context():
+        return fn(*args)
+
+    executor: HashExecutor | None = current_app.extensions.get(EXTENSION_KEY)
+    metrics = get_metrics()
+    started = time.perf_counter()
+    try:
+        result = executor.run(fn, *args) if executor is not None else fn(*args)
+    except HashingUnavailable:
+        if metrics is not None:
+            metrics.inc("myapp_password_hash_rejections_total", (("op", op),))
+        raise
+    if metrics is not None:
+        metrics.observe("myapp_password_hash_seconds", time.perf_counter() - started, (("op", op),))
+    return result
+
+
+def configured_method() -> str:
+    method = current_app.config.get("PASSWORD_HASH_METHOD") if has_app_context() else None
+    return method or DEFAULT_METHOD
+
+
+def canonical_method(method: str) -> str:
+    """Fill in werkzeug's defaults, e.g. "scrypt" -> "scrypt:32768:8:1"."""
+    name, *args = method.split(":")
+    if name == "scrypt":
+        n, r, p = args if args else (2**15, 8, 1)
+        return f"scrypt:{int(n)}:{int(r)}:{int(p)}"
+    if name == "pbkdf2":
+        hash_name = args[0] if args else "sha256"
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    raise ValueError(f"Unsupported password hash method {method!r}")
+
+
+def needs_rehash(pwhash: str, method: str | None = None) -> bool:
+    return pwhash.split("$", 1)[0] != canonical_method(method or configured_method())
+
+
+def hash_password(password: str) -> str:
+    return _run("hash", generate_password_hash, password, configured_method())
+
+
+def verify_password(pwhash: str, password: str) -> bool:
+    return _run("verify", check_password_hash, pwhash, password)
+
+
+def rehash_if_needed(pwhash: str, password: str) -> str | None:
+    """New hash if `pwhash` (already verified) uses other parameters than configured."""
+    if not needs_rehash(pwhash):
+        return None
+    try:
+        return hash_password(password)
+    except HashingUnavailable:
+        return None  # upgrade on a later login rather than failing this one
+
+
+# ----------------------------
+# Calibration
+# ----------------------------
+@dataclass(frozen=True)
+class Measurement:
+    method: str
+    median_ms: float
+    memory_kib: int
+
+
+def memory_kib(method: str) -> int:
+    name, *args = canonical_method(method).split(":")
+    if name == "scrypt":
+        n, r, p = map(int, args)
+        return 128 * n * r * p // 1024
+    return 0
+
+
+def benchmark(method: str, rounds: int = 3) -> float:
+    """Median wall time of one hash in milliseconds."""
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        generate_password_hash("calibration-password", method)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(
+    target_ms: float,
+    *,
+    families: Iterable[str] = ("scrypt", "pbkdf2"),
+    rounds: int = 3,
+    max_memory_kib: int = 64 * 1024,
+) -> tuple[Measurement | None, list[Measurement]]:
+    """
+    Measure candidates on this host and return the strongest one within
+    `target_ms` plus all measurements. Families are tried in order (scrypt first,
+    it is memory-hard) until one has a candidate within target; within a family
+    measuring stops at the first candidate over target.
+    """
+    candidates = {"scrypt": SCRYPT_CANDIDATES, "pbkdf2": PBKDF2_CANDIDATES}
+    results: list[Measurement] = []
+    for family in families:
+        family_best = None
+        for method in candidates[family]:
+            if memory_kib(method) > max_memory_kib:
+                break
+            measurement = Measurement(method, benchmark(method, rounds), memory_kib(method))
+            results.append(measurement)
+            if measurement.median_ms > target_ms:
+                break
+            family_best = measurement
+        if family_best is not None:
+            return family_best, results
+    return None, results
+
+
+def get_hash_executor() -> HashExecutor | None:
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def init_password_hashing(app: Flask) -> HashExecutor | None:
+    if app.config.get("PASSWORD_HASH_METHOD"):
+        canonical_method(app.config["PASSWORD_HASH_METHOD"])  # fail at startup, not at login
+    if not app.config.get("PASSWORD_HASH_OFFLOAD", True):
+        return None
+    executor = HashExecutor(
+        max_workers=int(app.config.get("PASSWORD_HASH_MAX_CONCURRENCY", 2)),
+        max_queue=int(app.config.get("PASSWORD_HASH_MAX_QUEUE", 8)),
+        wait_timeout=float(app.config.get("PASSWORD_HASH_WAIT_TIMEOUT", 2.0)),
+        retry_after=int(app.config.get("PASSWORD_HASH_RETRY_AFTER", 1)),
+    )
+    app.extensions[EXTENSION_KEY] = executor
+    return executor
@@ -0,0 +1,226 @@
+"""
+Outbound HTTP to OAuth providers.
+
+authlib opens a new requests.Session, and with it a new TCP + TLS connection,
+for the token exchange and for every API call. Here every worker keeps one
+keep-alive connection pool (a shared HTTPAdapter) that all provider sessions
+are mounted on, and every call gets OAUTH_HTTP_CONNECT_TIMEOUT /
+OAUTH_HTTP_READ_TIMEOUT unless it passes its own timeout.
+
+Each provider has a circuit breaker. After OAUTH_BREAKER_FAILURES consecutive
+failures (connection errors, timeouts, 5xx responses) its calls fail at once
+with 503 (ProviderUnavailable, also raised for the failures themselves) for
+OAUTH_BREAKER_RESET seconds; then a single trial call decides whether it
+closes again. During a provider outage, logins fail fast instead of
+each holding a worker thread for the full timeout.
+
+``gather()`` runs independent calls (GitHub user + emails) concurrently, using
+a small per-worker thread pool.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import threading
+import time
+import weakref
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import requests
+from flask import Flask, current_app
+from requests.adapters import HTTPAdapter
+from werkzeug.exceptions import ServiceUnavailable
+
+logger = logging.getLogger("myapp.auth.http")
+
+EXTENSION_KEY = "oauth_http"
+
+
+class ProviderUnavailable(ServiceUnavailable):
+    def __init__(self, provider: str, retry_after: int | None = None) -> None:
+        super().__init__(
+            description=f"Sign-in with {provider} is unavailable right now. Try again later.",
+            retry_after=retry_after,
+        )
+        self.provider = provider
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def before_call(self) -> None:
+        """Raise ProviderUnavailable while open; let one trial call through afterwards."""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.reset_timeout - self.clock()
+            if remaining > 0 or self._trial:
+                raise ProviderUnavailable(self.name, retry_after=max(1, math.ceil(remaining)))
+            self._trial = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("Circuit for %s closed again", self.name)
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def release_trial(self) -> None:
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            trial_failed = self._trial
+            self._trial = False
+            if trial_failed or (self.opened_at is None and self.failures >= self.failure_threshold):
+                if not trial_failed:
+                    logger.warning(
+                        "Circuit for %s opened after %d failures", self.name, self.failures
+                    )
+                self.opened_at = self.clock()
+
+
+class OutboundHTTP:
+    def __init__(
+        self,
+        *,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 10.0,
+        pool_size: int = 10,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        max_workers: int = 4,
+    ) -> None:
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_workers = max_workers
+        self.adapter = self._new_adapter()
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        _outbound.add(self)
+
+    def _new_adapter(self) -> HTTPAdapter:
+        # No retries: a retry against a struggling provider only adds to its load
+        return HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        breaker = self.breakers.get(provider)
+        if breaker is None:
+            with self._lock:
+                breaker = self.breakers.setdefault(
+                    provider,
+                    CircuitBreaker(
+                        provider,
+                        failure_threshold=self.failure_threshold,
+                        reset_timeout=self.reset_timeout,
+                    ),
+                )
+        return breaker
+
+    def mount(self, session: requests.Session) -> None:
+        """Route `session` through the shared pool (its own adapters are dropped)."""
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+
+    def call(self, provider: str, send: Callable[[], requests.Response]) -> requests.Response:
+        breaker = self.breaker(provider)
+        breaker.before_call()
+        try:
+            response = send()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            breaker.record_failure()
+            logger.warning("%s request failed: %s", provider, e)
+            raise ProviderUnavailable(provider) from e
+        except BaseException:
+            breaker.release_trial()  # not the provider's fault
+            raise
+        if response.status_code >= 500:
+            breaker.record_failure()
+            logger.warning("%s answered %d", provider, response.status_code)
+            raise ProviderUnavailable(provider)
+        breaker.record_success()
+        return response
+
+    def gather(self, first: Callable[[], Any], *rest: Callable[[], Any]) -> list[Any]:
+        """
+        Run `first` in this thread and `rest` on the pool, all at once; results
+        in order, the first error re-raised. Only `first` may use the request
+        context (authlib's token exchange reads the session).
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="myapp-oauth-http"
+                    )
+        futures = [self._executor.submit(call) for call in rest]
+        result = first()
+        return [result, *(future.result() for future in futures)]
+
+    def reset_after_fork(self) -> None:
+        # Sockets and threads of the parent must not be used by the child
+        self.adapter = self._new_adapter()
+        self._executor = None
+        self._lock = threading.Lock()
+
+
+_outbound: weakref.WeakSet[OutboundHTTP] = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for outbound in list(_outbound):
+        outbound.reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def get_outbound_http() -> OutboundHTTP | None:
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def init_outbound_http(app: Flask) -> OutboundHTTP:
+    config = app.config
+    outbound = OutboundHTTP(
+        connect_timeout=float(config.get("OAUTH_HTTP_CONNECT_TIMEOUT", 3.05)),
+        read_timeout=float(config.get("OAUTH_HTTP_READ_TIMEOUT", 10.0)),
+        pool_size=int(config.get("OAUTH_HTTP_POOL_SIZE", 10)),
+        failure_threshold=int(config.get("OAUTH_BREAKER_FAILURES", 5)),
+        reset_timeout=float(config.get("OAUTH_BREAKER_RESET", 30.0)),
+    )
+    app.extensions[EXTENSION_KEY] = outbound
+    return outbound
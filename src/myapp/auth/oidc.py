@@ -0,0 +1,306 @@
+"""
+OpenID Connect discovery document and signing keys (JWKS) of a provider.
+
+authlib fetches ``server_metadata_url`` and then the JWKS on first use in each
+worker, while a login is waiting, and keeps them until the process exits.
+OIDCDocuments keeps both documents in three layers instead:
+
+- in memory, each with a TTL from the response's Cache-Control max-age (less
+  Age), clamped to OIDC_MIN_TTL..OIDC_MAX_TTL, OIDC_DEFAULT_TTL without one;
+- in ``<instance>/oidc/<provider>-<document>.json``, so restarted workers
+  start warm and a worker adopts a copy another worker already refreshed;
+- refreshed by a background thread once OIDC_REFRESH_AHEAD of the TTL has
+  passed, i.e. before it expires.
+
+Requests never wait for a refresh: expired documents are served until the
+refresher replaced them (a failed refresh is retried after OIDC_MIN_TTL).
+Only a cold start without a persisted copy fetches inline. A token signed
+with an unknown ``kid`` (the provider rotated keys before we refreshed)
+refetches the JWKS inline, at most once per OIDC_KID_REFRESH_INTERVAL.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import weakref
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from flask import Flask
+
+logger = logging.getLogger("myapp.auth.oidc")
+
+EXTENSION_KEY = "oidc"
+
+DOCUMENTS = ("metadata", "jwks")
+
+_MAX_AGE = re.compile(r"(?:^|,)\s*max-age\s*=\s*\"?(\d+)", re.IGNORECASE)
+
+
+def cache_ttl(
+    headers, *, default: float = 3600.0, minimum: float = 300.0, maximum: float = 86400.0
+) -> float:
+    """Seconds a response may be cached according to Cache-Control / Age, clamped."""
+    cache_control = headers.get("Cache-Control", "") or ""
+    if re.search(r"no-store|no-cache", cache_control, re.IGNORECASE):
+        return minimum
+    match = _MAX_AGE.search(cache_control)
+    if match is None:
+        return default
+    try:
+        age = float(headers.get("Age") or 0)
+    except ValueError:
+        age = 0.0
+    return min(maximum, max(minimum, int(match.group(1)) - age))
+
+
+@dataclass(frozen=True)
+class Document:
+    data: dict[str, Any]
+    fetched_at: float
+    expires_at: float
+
+    def refresh_at(self, ahead: float) -> float:
+        return self.fetched_at + (self.expires_at - self.fetched_at) * ahead
+
+
+class OIDCDocuments:
+    def __init__(
+        self,
+        provider: str,
+        metadata_url: str,
+        fetch: Callable[[str], Any],
+        *,
+        cache_dir: str | None = None,
+        default_ttl: float = 3600.0,
+        min_ttl: float = 300.0,
+        max_ttl: float = 86400.0,
+        refresh_ahead: float = 0.8,
+        kid_refresh_interval: float = 60.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """`fetch(url)` returns a requests-like response (headers, json(), raise_for_status())."""
+        self.provider = provider
+        self.metadata_url = metadata_url
+        self.fetch = fetch
+        self.cache_dir = cache_dir
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.refresh_ahead = refresh_ahead
+        self.kid_refresh_interval = kid_refresh_interval
+        self.clock = clock
+        self.documents: dict[str, Document] = {}
+        self._retry_at: dict[str, float] = {}
+        self._kid_refreshed_at: float | None = None
+        self._lock = threading.RLock()  # fetching the JWKS may first fetch the metadata
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        for name in DOCUMENTS:
+            document = self._read(name)
+            if document is not None:
+                self.documents[name] = document
+        _instances.add(self)
+
+    # ----------------------------
+    # Persistence
+    # ----------------------------
+    def _path(self, name: str) -> str | None:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"{self.provider}-{name}.json")
+
+    def _read(self, name: str) -> Document | None:
+        path = self._path(name)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                return Document(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            logger.warning("Ignoring unreadable OIDC cache file %s", path, exc_info=True)
+            return None
+
+    def _write(self, name: str, document: Document) -> None:
+        path = self._path(name)
+        if path is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Atomic replace: other workers read the file at any time
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=f".{self.provider}-{name}")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(asdict(document), f)
+            os.replace(tmp, path)
+        except OSError:
+            logger.warning("Could not persist OIDC %s of %s", name, self.provider, exc_info=True)
+
+    # ----------------------------
+    # Fetching
+    # ----------------------------
+    def _url(self, name: str) -> str:
+        if name == "metadata":
+            return self.metadata_url
+        uri = self.metadata().get("jwks_uri")
+        if not uri:
+            raise RuntimeError(f'Missing "jwks_uri" in the {self.provider} metadata')
+        return uri
+
+    def _fetch(self, name: str) -> Document:
+        response = self.fetch(self._url(name))
+        response.raise_for_status()
+        now = self.clock()
+        ttl = cache_ttl(
+            response.headers, default=self.default_ttl, minimum=self.min_ttl, maximum=self.max_ttl
+        )
+        document = Document(response.json(), now, now + ttl)
+        self.documents[name] = document
+        self._retry_at.pop(name, None)
+        self._write(name, document)
+        return document
+
+    def _due(self, name: str, now: float) -> bool:
+        return now >= self._refresh_at(name)
+
+    def _refresh_at(self, name: str) -> float:
+        document = self.documents.get(name)
+        default = document.refresh_at(self.refresh_ahead) if document is not None else 0.0
+        return self._retry_at.get(name, default)
+
+    def refresh_due(self) -> None:
+        """Refresh the documents that are due (run by the background thread)."""
+        for name in DOCUMENTS:
+            now = self.clock()
+            if not self._due(name, now):
+                continue
+            with self._lock:
+                # Another worker may have refreshed the shared copy already
+                persisted = self._read(name)
+                current = self.documents.get(name)
+                if persisted is not None and (
+                    current is None or persisted.fetched_at > current.fetched_at
+                ):
+                    self.documents[name] = persisted
+                if not self._due(name, now):
+                    continue
+                try:
+                    self._fetch(name)
+                except Exception:
+                    self._retry_at[name] = now + self.min_ttl
+                    logger.warning(
+                        "Refreshing OIDC %s of %s failed, keeping the cached copy",
+                        name,
+                        self.provider,
+                        exc_info=True,
+                    )
+
+    def _next_due(self) -> float:
+        return min(self._refresh_at(name) for name in DOCUMENTS)
+
+    # ----------------------------
+    # Background refresh
+    # ----------------------------
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh_due()
+            except Exception:
+                logger.exception("OIDC refresh of %s failed", self.provider)
+            delay = max(1.0, self._next_due() - self.clock())
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"myapp-oidc-{self.provider}", daemon=True
+                )
+                self._thread.start()
+
+    def reset_after_fork(self) -> None:
+        self._thread = None
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    # ----------------------------
+    # Reading (request path)
+    # ----------------------------
+    def _get(self, name: str) -> dict[str, Any]:
+        self.ensure_started()
+        document = self.documents.get(name)
+        if document is None:
+            # Cold start without a persisted copy: nothing to serve yet
+            with self._lock:
+                document = self.documents.get(name) or self._fetch(name)
+        elif document.expires_at <= self.clock():
+            self._wake.set()
+        return document.data
+
+    def metadata(self) -> dict[str, Any]:
+        return self._get("metadata")
+
+    def jwks(self) -> dict[str, Any]:
+        return self._get("jwks")
+
+    def refresh_keys(self) -> dict[str, Any]:
+        """
+        JWKS after a token named a key we don't have. Fetches inline at most once
+        per kid_refresh_interval, so forged kids cannot hammer the provider.
+        """
+        with self._lock:
+            now = self.clock()
+            last = self._kid_refreshed_at
+            if last is None or now - last >= self.kid_refresh_interval:
+                self._kid_refreshed_at = now
+                try:
+                    return self._fetch("jwks").data
+                except Exception:
+                    logger.warning("Refetching the %s JWKS failed", self.provider, exc_info=True)
+        return self.jwks()
+
+
+_instances: weakref.WeakSet[OIDCDocuments] = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for documents in list(_instances):
+        documents.reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def init_oidc_documents(
+    app: Flask, provider: str, metadata_url: str, fetch: Callable[[str], Any]
+) -> OIDCDocuments:
+    config = app.config
+    documents = OIDCDocuments(
+        provider,
+        metadata_url,
+        fetch,
+        cache_dir=config.get("OIDC_CACHE_DIR") or os.path.join(app.instance_path, "oidc"),
+        default_ttl=float(config.get("OIDC_DEFAULT_TTL", 3600.0)),
+        min_ttl=float(config.get("OIDC_MIN_TTL", 300.0)),
+        max_ttl=float(config.get("OIDC_MAX_TTL", 86400.0)),
+        refresh_ahead=float(config.get("OIDC_REFRESH_AHEAD", 0.8)),
+        kid_refresh_interval=float(config.get("OIDC_KID_REFRESH_INTERVAL", 60.0)),
+    )
+    app.extensions.setdefault(EXTENSION_KEY, {})[provider] = documents
+    return documents
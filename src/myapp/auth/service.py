@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+from datetime import datetime
 from urllib.parse import urlparse
 
 from flask import current_app, request
 from flask_login import login_user
+from sqlalchemy import Select, literal, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
 
 from ..extensions import db
-from ..models import User, auth_identity
+from ..models import AuthIdentity, User
 
 
 def is_safe_next_url(url: str) -> bool:
@@ -19,6 +23,119 @@ def is_safe_next_url(url: str) -> bool:
     return parts.scheme == "" and parts.netloc == "" and url.startswith("/")
 
 
+def _user_for_identity(provider: str, subject: str) -> User | None:
+    # One joined query instead of identity lookup + lazy load of ident.user
+    return db.session.execute(
+        select(User)
+        .join(AuthIdentity, AuthIdentity.user_id == User.id)
+        .where(AuthIdentity.provider == provider, AuthIdentity.subject == subject)
+    ).scalar_one_or_none()
+
+
+def _lost_race(provider: str, subject: str) -> User | None:
+    # Drops the user we may have just created; the winner's row is committed by now
+    db.session.rollback()
+    return _user_for_identity(provider, subject)
+
+
+def _add_user(email: str | None, username: str | None) -> User:
+    user = User(email=email, username=username)
+    db.session.add(user)
+    db.session.flush()  # ensure user.id
+    return user
+
+
+def _unclaimed(email: str | None, username: str | None) -> tuple[str | None, str | None]:
+    """Drop the email / username another account already owns (one we may not link to)."""
+    clauses = []
+    if email:
+        clauses.append(User.email == email)
+    if username:
+        clauses.append(User.username == username)
+    if not clauses:
+        return email, username
+    taken = db.session.execute(select(User.email, User.username).where(or_(*clauses))).all()
+    if any(row.email == email for row in taken):
+        email = None
+    if any(row.username == username for row in taken):
+        username = None
+    return email, username
+
+
+def _insert_identity(values: dict[str, object]) -> bool:
+    """
+    Insert the identity row unless (provider, subject) exists already.
+    True if this call inserted it. Postgres and SQLite do it in one
+    ``INSERT ... ON CONFLICT DO NOTHING``; other dialects use a savepoint.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        try:
+            with db.session.begin_nested():
+                db.session.add(AuthIdentity(**values))
+        except IntegrityError:
+            return False
+        return True
+
+    stmt = (
+        insert(AuthIdentity)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=["provider", "subject"])
+        .returning(AuthIdentity.id)
+    )
+    return db.session.execute(stmt).first() is not None
+
+
+_IDENTITY_COLUMNS = ("provider", "subject", "email", "email_verified")
+
+
+def _user_with_identity_statement(
+    email: str | None, username: str | None, identity: dict[str, object]
+) -> Select:
+    """
+    Postgres: insert the user and its identity in one statement (data-modifying
+    CTEs). Selects the new user, or nothing if the identity exists already; the
+    user row is inserted either way, so the caller rolls back in that case.
+    """
+    from sqlalchemy.dialects.postgresql import insert
+
+    now = datetime.now()  # Python-side column defaults are not applied inside a CTE
+    new_user = (
+        insert(User)
+        .values(email=email, username=username, is_admin=False, is_active=True, created_at=now)
+        .returning(*User.__table__.c)
+        .cte("new_user")
+    )
+    new_identity = (
+        insert(AuthIdentity)
+        .from_select(
+            ["user_id", *_IDENTITY_COLUMNS, "created_at"],
+            select(new_user.c.id, *(literal(identity[c]) for c in _IDENTITY_COLUMNS), literal(now)),
+        )
+        .on_conflict_do_nothing(index_elements=["provider", "subject"])
+        .returning(AuthIdentity.user_id)
+        .cte("new_identity")
+    )
+    return select(aliased(User, new_user)).join(
+        new_identity, new_identity.c.user_id == new_user.c.id
+    )
+
+
+def _create_user(
+    email: str | None, username: str | None, identity: dict[str, object]
+) -> User | None:
+    """New user linked to `identity`; None if a concurrent first login inserted it first."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        stmt = _user_with_identity_statement(email, username, identity)
+        return db.session.execute(stmt).scalar_one_or_none()
+    user = _add_user(email, username)
+    return user if _insert_identity({**identity, "user_id": user.id}) else None
+
+
 def get_or_create_user_from_oauth(
     *,
     provider: str,
@@ -27,36 +144,57 @@ def get_or_create_user_from_oauth(
     email_verified: bool,
     username_hint: str | None,
 ) -> User:
+    """
+    User for an OAuth identity, created (or linked by email) on first login.
+
+    Returning logins cost one query. The first login inserts the user and the
+    identity (ON CONFLICT DO NOTHING) in one more statement on Postgres, two on
+    other databases; if a concurrent first login for the same subject got there
+    first, our transaction (and the user it created) is rolled back and the
+    winner's user is returned instead of failing on uq_provider_subject. If the
+    email or username belongs to an account the identity may not be linked to
+    (untrusted provider, unverified email), the new user is created without it;
+    the identity row still records the email.
+    """
     # 1) identity exists -> login that user
-    ident = auth_identity.query.filter_by(provider=provider, subject=subject).first()
-    if ident:
-        return ident.user
+    user = _user_for_identity(provider, subject)
+    if user is not None:
+        return user
 
     # 2) optional: link by email only if allowed and trusted
-    user = None
     link_by_email = bool(current_app.config.get("AUTH_LINK_BY_EMAIL", False))
     trusted = set(current_app.config.get("AUTH_TRUSTED_EMAIL_PROVIDERS", []))
     if link_by_email and email and email_verified and provider in trusted:
-        user = User.query.filter_by(email=email).first()
+        user = db.session.execute(select(User).filter_by(email=email)).scalar_one_or_none()
 
-    # 3) create user if none
-    if not user:
-        user = User(email=email, username=username_hint)
+    identity = {
+        "provider": provider,
+        "subject": subject,
+        "email": email,
+        "email_verified": bool(email_verified),
+    }
+    # 3) create user if none, together with the identity
+    if user is None:
+        try:
+            created = _create_user(email, username_hint, identity)
+        except IntegrityError:
+            # Usually a concurrent first login inserted the same email first
+            winner = _lost_race(provider, subject)
+            if winner is not None:
+                return winner
+            # Otherwise an existing account owns the email or username
+            created = _create_user(*_unclaimed(email, username_hint), identity)
+    else:
+        created = user if _insert_identity({**identity, "user_id": user.id}) else None
 
-    db.session.add(user)
-    db.session.flush()  # ensure user.id
+    if created is None:
+        winner = _lost_race(provider, subject)
+        if winner is None:  # the other login rolled back after all
+            raise RuntimeError(f"OAuth identity {provider}:{subject} disappeared during login")
+        return winner
 
-    db.session.add(
-        auth_identity(
-            user_id=user.id,
-            provider=provider,
-            subject=subject,
-            email=email,
-            email_verified=bool(email_verified),
-        )
-    )
     db.session.commit()
-    return user
+    return created
 
 
 def complete_login(user: User) -> str:
@@ -0,0 +1,242 @@
+"""
+Signed bearer tokens for machine-to-machine API calls.
+
+A token is ``<kid>.<payload>.<signature>``: an itsdangerous-signed payload with
+the subject, scopes, expiry and a random id (jti), prefixed by the id of the
+key that signed it. Validation needs only the key ring in config, never the
+database. To rotate keys, add a new entry to API_TOKEN_KEYS, point
+API_TOKEN_KID at it and drop the old one once its tokens have expired.
+
+Revocation goes through a deny-list of jti values (the revoked_tokens table)
+that each worker keeps in memory and reloads from a background thread every
+API_TOKEN_REVOCATION_REFRESH seconds, so a revoked token stops working in
+other workers within that interval and immediately in the one revoking it.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import secrets
+import threading
+import time
+import weakref
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime
+
+from flask import Flask, current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import delete, select
+
+from ..extensions import db
+from ..models import RevokedToken
+
+logger = logging.getLogger("myapp.auth.tokens")
+
+EXTENSION_KEY = "api_tokens"
+DEFAULT_KID = "default"
+
+_SALT = "myapp.api-token"
+
+
+class InvalidToken(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class TokenClaims:
+    sub: str
+    scopes: frozenset[str]
+    exp: int
+    jti: str
+    kid: str
+
+    def has_scopes(self, scopes: Iterable[str]) -> bool:
+        return set(scopes) <= self.scopes
+
+
+def key_ring(app: Flask) -> dict[str, str]:
+    """kid -> secret from API_TOKEN_KEYS, or a single key derived from SECRET_KEY."""
+    keys = dict(app.config.get("API_TOKEN_KEYS") or {})
+    if not keys:
+        return {DEFAULT_KID: app.config["SECRET_KEY"]}
+    for kid in keys:
+        if not kid or "." in kid:
+            raise ValueError(f"Invalid API token key id {kid!r}: must be non-empty without '.'")
+    return keys
+
+
+def signing_kid(app: Flask) -> str:
+    keys = key_ring(app)
+    kid = app.config.get("API_TOKEN_KID") or next(iter(keys))
+    if kid not in keys:
+        raise ValueError(f"API_TOKEN_KID {kid!r} is not in API_TOKEN_KEYS")
+    return kid
+
+
+def _serializer(secret: str) -> URLSafeSerializer:
+    return URLSafeSerializer(secret, salt=_SALT)
+
+
+def mint_token(
+    app: Flask, subject: str, scopes: Iterable[str] = (), ttl: int | None = None
+) -> tuple[str, TokenClaims]:
+    ttl = ttl if ttl is not None else int(app.config.get("API_TOKEN_TTL", 3600))
+    kid = signing_kid(app)
+    claims = TokenClaims(
+        sub=subject,
+        scopes=frozenset(scopes),
+        exp=int(time.time()) + ttl,
+        jti=secrets.token_urlsafe(12),
+        kid=kid,
+    )
+    payload = {
+        "sub": claims.sub,
+        "scp": sorted(claims.scopes),
+        "exp": claims.exp,
+        "jti": claims.jti,
+    }
+    return f"{kid}.{_serializer(key_ring(app)[kid]).dumps(payload)}", claims
+
+
+def decode_token(app: Flask, token: str, *, verify_exp: bool = True) -> TokenClaims:
+    """Check signature and expiry (no database access); raises InvalidToken."""
+    kid, _, signed = token.partition(".")
+    secret = key_ring(app).get(kid)
+    if secret is None or not signed:
+        raise InvalidToken("unknown key id")
+    try:
+        payload = _serializer(secret).loads(signed)
+        claims = TokenClaims(
+            sub=str(payload["sub"]),
+            scopes=frozenset(payload.get("scp", ())),
+            exp=int(payload["exp"]),
+            jti=str(payload["jti"]),
+            kid=kid,
+        )
+    except (BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidToken("bad signature or payload") from None
+    if verify_exp and claims.exp <= time.time():
+        raise InvalidToken("expired")
+    return claims
+
+
+# ----------------------------
+# Deny-list
+# ----------------------------
+class RevocationList:
+    """
+    In-memory copy of the unexpired rows of revoked_tokens, reloaded by a daemon
+    thread. The first lookup in a process waits up to `initial_wait` seconds
+    for the first load; if the table cannot be read, tokens stay valid on
+    signature and expiry alone and a warning is logged.
+    """
+
+    def __init__(self, app: Flask, interval: float = 30.0, initial_wait: float = 2.0) -> None:
+        self.app = app
+        self.interval = interval
+        self.initial_wait = initial_wait
+        self._revoked: dict[str, int] = {}  # jti -> exp
+        # Revoked by this process; kept across reloads that may predate the commit
+        self._local: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._loaded = threading.Event()
+        self._stop = threading.Event()
+        _revocation_lists.add(self)
+
+    def reset_after_fork(self) -> None:
+        # The refresh thread does not exist in the child; start a new one on first use
+        self._lock = threading.Lock()
+        self._thread = None
+        self._loaded = threading.Event()
+        self._stop = threading.Event()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="myapp-token-revocations", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self.reload()
+            self._loaded.set()
+            if self._stop.wait(self.interval):
+                return
+
+    def reload(self) -> None:
+        now = datetime.now()
+        try:
+            with self.app.app_context(), db.engine.connect() as conn:
+                rows = conn.execute(
+                    select(RevokedToken.jti, RevokedToken.expires_at).where(
+                        RevokedToken.expires_at > now
+                    )
+                ).all()
+        except Exception:
+            logger.warning("Could not load revoked API tokens", exc_info=True)
+            return
+        revoked = {jti: int(expires_at.timestamp()) for jti, expires_at in rows}
+        with self._lock:
+            self._local = {j: exp for j, exp in self._local.items() if exp > now.timestamp()}
+            self._revoked = {**revoked, **self._local}
+
+    def add(self, jti: str, exp: int) -> None:
+        with self._lock:
+            self._local[jti] = exp
+            self._revoked = {**self._revoked, jti: exp}
+
+    def is_revoked(self, jti: str) -> bool:
+        self._ensure_started()
+        if not self._loaded.is_set():
+            self._loaded.wait(self.initial_wait)
+        return jti in self._revoked
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+_revocation_lists: weakref.WeakSet[RevocationList] = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for revocations in list(_revocation_lists):
+        revocations.reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def get_revocation_list() -> RevocationList:
+    return current_app.extensions[EXTENSION_KEY]
+
+
+def verify_token(token: str) -> TokenClaims:
+    """decode_token plus the deny-list check, for the current app."""
+    claims = decode_token(current_app, token)
+    if get_revocation_list().is_revoked(claims.jti):
+        raise InvalidToken("revoked")
+    return claims
+
+
+def revoke_token(claims: TokenClaims) -> None:
+    """Record `claims.jti` in revoked_tokens and drop expired rows; the caller commits."""
+    db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= datetime.now()))
+    db.session.merge(RevokedToken(jti=claims.jti, expires_at=datetime.fromtimestamp(claims.exp)))
+    get_revocation_list().add(claims.jti, claims.exp)
+
+
+def init_api_tokens(app: Flask) -> RevocationList:
+    signing_kid(app)  # fail at startup on a broken key ring
+    revocations = RevocationList(
+        app, interval=float(app.config.get("API_TOKEN_REVOCATION_REFRESH", 30.0))
+    )
+    app.extensions[EXTENSION_KEY] = revocations
+    return revocations
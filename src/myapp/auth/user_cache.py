@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from ..extensions import db
+from ..models import User
+
+EXTENSION_KEY = "user_cache"
+
+
+class UserCache:
+    """
+    Bounded TTL+LRU cache in front of the Flask-Login user_loader.
+
+    Only column values are cached, never live ORM instances: a hit rebuilds a
+    detached User and merges it into the current session without touching the
+    database. Entries are dropped when the row is updated or deleted through
+    the ORM in this process; other workers pick up changes once the TTL expires.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[int, tuple[float, dict[str, object]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int) -> dict[str, object] | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, values = entry
+            if expires_at <= now:
+                del self._data[user_id]
+                self.misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self.hits += 1
+            return values
+
+    def put(self, user_id: int, values: dict[str, object]) -> None:
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[user_id] = (expires_at, values)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            if self._data.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def load(self, user_id: int) -> User | None:
+        values = self.get(user_id)
+        if values is not None:
+            user = User(**values)
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+
+        user = db.session.get(User, user_id)
+        if user is not None:
+            self.put(user_id, _snapshot(user))
+        return user
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            size = len(self._data)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+def _snapshot(user: User) -> dict[str, object]:
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+
+def get_user_cache() -> UserCache | None:
+    if not has_app_context():
+        return None
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def _on_user_changed(mapper, connection, target: User) -> None:
+    cache = get_user_cache()
+    if cache is not None and target.id is not None:
+        cache.invalidate(target.id)
+
+
+def _on_orm_execute(orm_execute_state) -> None:
+    # Bulk UPDATE/DELETE statements bypass mapper events; drop everything.
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is User:
+        cache = get_user_cache()
+        if cache is not None:
+            cache.clear()
+
+
+def _register_events() -> None:
+    if event.contains(User, "after_update", _on_user_changed):
+        return
+    event.listen(User, "after_update", _on_user_changed)
+    event.listen(User, "after_delete", _on_user_changed)
+    event.listen(db.session, "do_orm_execute", _on_orm_execute)
+
+
+def init_user_cache(app: Flask) -> UserCache | None:
+    if not app.config.get("USER_CACHE_ENABLED", True):
+        return None
+
+    cache = UserCache(
+        maxsize=int(app.config.get("USER_CACHE_SIZE", 1024)),
+        ttl=float(app.config.get("USER_CACHE_TTL", 30.0)),
+    )
+    app.extensions[EXTENSION_KEY] = cache
+    _register_events()
+    return cache
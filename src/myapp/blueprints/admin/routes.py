@@ -1,10 +1,126 @@
-from flask import render_template
+from flask import (
+    abort,
+    current_app,
+    redirect,
+    render_template,
+    request,
+    send_from_directory,
+    url_for,
+)
 
+from ...memory import GROUPINGS, SnapshotError, get_memory_inspector, process_stats
+from ...profiling import get_window_profiler, is_profile_name, list_profiles, profile_dir
+from ...querystats import query_budget
 from . import bp
 from .utils import admin_required
 
 
 @bp.get("/")
+@query_budget(1)
 @admin_required
 def dashboard():
     return render_template("admin/dashboard.html")
+
+
+@bp.get("/profiles/")
+@query_budget(1)
+@admin_required
+def profiles():
+    window = get_window_profiler()
+    if window is None:
+        abort(404)
+    return render_template(
+        "admin/profiles.html",
+        profiles=list_profiles(current_app),
+        running=window.running,
+        max_window=current_app.config.get("PROFILE_MAX_WINDOW", 60),
+    )
+
+
+@bp.post("/profiles/window")
+@query_budget(1)
+@admin_required
+def profile_window():
+    window = get_window_profiler()
+    if window is None:
+        abort(404)
+    window.start(request.form.get("seconds", 10.0, type=float))
+    return redirect(url_for("admin.profiles"))
+
+
+@bp.get("/profiles/<name>")
+@query_budget(1)
+@admin_required
+def profile_download(name: str):
+    if get_window_profiler() is None or not is_profile_name(name):
+        abort(404)
+    return send_from_directory(profile_dir(current_app), name, as_attachment=True)
+
+
+def _memory_inspector():
+    inspector = get_memory_inspector()
+    if inspector is None:
+        abort(404)
+    return inspector
+
+
+def _memory_report(inspector) -> dict:
+    """Top sites of ?snapshot=, or the diff between ?old= and ?new=."""
+    group = request.args.get("group", "lineno")
+    limit = request.args.get("limit", 25, type=int)
+    try:
+        if request.args.get("old") and request.args.get("new"):
+            old, new = request.args["old"], request.args["new"]
+            return {"diff": inspector.diff(old, new, group=group, limit=limit)}
+        if request.args.get("snapshot"):
+            return {"top": inspector.top(request.args["snapshot"], group=group, limit=limit)}
+    except SnapshotError as e:
+        abort(404, description=str(e))
+    except ValueError as e:
+        abort(400, description=str(e))
+    return {}
+
+
+@bp.get("/memory/")
+@query_budget(1)
+@admin_required
+def memory():
+    inspector = _memory_inspector()
+    return render_template(
+        "admin/memory.html",
+        stats=process_stats(),
+        snapshots=inspector.snapshots(),
+        report=_memory_report(inspector),
+        groupings=GROUPINGS,
+    )
+
+
+@bp.get("/memory/report.json")
+@query_budget(1)
+@admin_required
+def memory_report():
+    inspector = _memory_inspector()
+    return {
+        "stats": process_stats(),
+        "snapshots": inspector.snapshots(),
+        **_memory_report(inspector),
+    }
+
+
+@bp.post("/memory/<action>")
+@query_budget(1)
+@admin_required
+def memory_action(action: str):
+    inspector = _memory_inspector()
+    if action == "start":
+        inspector.start()
+    elif action == "stop":
+        inspector.stop()
+    elif action == "snapshot":
+        try:
+            inspector.snapshot(request.form.get("name", "").strip() or None)
+        except SnapshotError as e:
+            abort(409, description=str(e))
+    else:
+        abort(404)
+    return redirect(url_for("admin.memory"))
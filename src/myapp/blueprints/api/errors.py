@@ -1,5 +1,6 @@
 from flask import jsonify
 
+from ...errors import extra_headers
 from . import bp
 
 
@@ -21,10 +22,14 @@ def bad_request(e):
 
 @bp.errorhandler(401)
 def unauthorized(e):
-    return jsonify(
-        error="unauthorized",
-        message="Authentication required",
-    ), 401
+    return (
+        jsonify(
+            error="unauthorized",
+            message="Authentication required",
+        ),
+        401,
+        extra_headers(e),
+    )
 
 
 @bp.errorhandler(403)
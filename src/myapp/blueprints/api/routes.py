@@ -0,0 +1,13 @@
+from flask import g
+
+from ...querystats import query_budget
+from . import bp
+from .utils import api_auth_required
+
+
+@bp.get("/whoami")
+@query_budget(0)
+@api_auth_required()
+def whoami():
+    claims = g.api_token
+    return {"sub": claims.sub, "scopes": sorted(claims.scopes), "exp": claims.exp}
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from functools import wraps
+
+from flask import abort, g, request
+from werkzeug.datastructures import WWWAuthenticate
+from werkzeug.exceptions import Unauthorized
+
+from ...auth.tokens import InvalidToken, verify_token
+
+
+def api_auth_required(*scopes: str):
+    """
+    Require a valid "Authorization: Bearer <token>" with all of `scopes`.
+    The token's claims are available as g.api_token; no user is loaded.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+            if scheme.lower() != "bearer" or not token.strip():
+                raise Unauthorized(www_authenticate=WWWAuthenticate("bearer"))
+            try:
+                claims = verify_token(token.strip())
+            except InvalidToken:
+                raise Unauthorized(
+                    www_authenticate=WWWAuthenticate("bearer", {"error": "invalid_token"})
+                ) from None
+            if not claims.has_scopes(scopes):
+                abort(403)
+            g.api_token = claims
+            return view(*args, **kwargs)
+
+        return wrapped
+
+    return decorator
@@ -1,12 +1,82 @@
 from __future__ import annotations
 
-from authlib.integrations.flask_client import OAuth
+from authlib.integrations.flask_client import FlaskOAuth2App, OAuth
+from authlib.integrations.requests_client import OAuth2Session
 
-oauth = OAuth()
+from ...auth.http import OutboundHTTP, init_outbound_http
+from ...auth.oidc import OIDCDocuments, init_oidc_documents
+
+GOOGLE_METADATA_URL = "https://accounts.google.com/.well-known/openid-configuration"
+
+
+class PooledOAuth2Session(OAuth2Session):
+    """OAuth2Session on the worker's shared pool, behind the provider's circuit breaker."""
+
+    outbound: OutboundHTTP | None = None
+    provider: str = ""
+
+    def request(self, method, url, *args, **kwargs):
+        if self.outbound is None:
+            return super().request(method, url, *args, **kwargs)
+        return self.outbound.call(
+            self.provider,
+            lambda: super(PooledOAuth2Session, self).request(method, url, *args, **kwargs),
+        )
+
+    def close(self) -> None:
+        # authlib closes the session after every call; the pooled connections stay open
+        if self.outbound is None:
+            super().close()
+
+
+class PooledFlaskOAuth2App(FlaskOAuth2App):
+    client_cls = PooledOAuth2Session
+    outbound: OutboundHTTP | None = None
+    # Discovery document + JWKS from the worker's cache instead of authlib's own fetch
+    documents: OIDCDocuments | None = None
+
+    def _pooled(self, session: PooledOAuth2Session) -> PooledOAuth2Session:
+        if self.outbound is not None:
+            self.outbound.mount(session)
+            session.outbound = self.outbound
+            session.provider = self.name
+            session.default_timeout = self.outbound.timeout
+        return session
+
+    def _get_session(self):
+        return self._pooled(super()._get_session())
+
+    def _get_oauth_client(self, **metadata):
+        return self._pooled(super()._get_oauth_client(**metadata))
+
+    def load_server_metadata(self):
+        if self.documents is None:
+            return super().load_server_metadata()
+        # Values given to register() win over the discovery document
+        return {**self.documents.metadata(), **self.server_metadata}
+
+    def fetch_jwk_set(self, force=False):
+        if self.documents is None:
+            return super().fetch_jwk_set(force)
+        # authlib forces a refetch when the ID token names a kid the key set lacks
+        return self.documents.refresh_keys() if force else self.documents.jwks()
+
+    def fetch_document(self, url: str):
+        """GET a public document (discovery, JWKS) through the pool and circuit breaker."""
+        with self._get_session() as session:
+            return session.request("GET", url, withhold_token=True)
+
+
+class PooledOAuth(OAuth):
+    oauth2_client_cls = PooledFlaskOAuth2App
+
+
+oauth = PooledOAuth()
 
 
 def init_oauth(app) -> None:
     oauth.init_app(app)
+    outbound = init_outbound_http(app)
 
     # GitHub
     if "github" in app.config.get("AUTH_PROVIDERS", []):
@@ -19,6 +89,7 @@ def init_oauth(app) -> None:
             api_base_url="https://api.github.com/",
             client_kwargs={"scope": "read:user user:email"},
         )
+        oauth.github.outbound = outbound
 
     # Google (OpenID Connect)
     if "google" in app.config.get("AUTH_PROVIDERS", []):
@@ -26,6 +97,10 @@ def init_oauth(app) -> None:
             name="google",
             client_id=app.config["GOOGLE_CLIENT_ID"],
             client_secret=app.config["GOOGLE_CLIENT_SECRET"],
-            server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
+            server_metadata_url=GOOGLE_METADATA_URL,
             client_kwargs={"scope": "openid email profile"},
         )
+        oauth.google.outbound = outbound
+        oauth.google.documents = init_oidc_documents(
+            app, "google", GOOGLE_METADATA_URL, oauth.google.fetch_document
+        )
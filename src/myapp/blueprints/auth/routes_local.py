@@ -6,11 +6,14 @@ from flask_login import current_user, login_required, login_user, logout_user
 from ...auth.service import complete_login
 from ...extensions import db
 from ...models import User
+from ...querystats import query_budget
+from ...ratelimit import throttle
 from . import bp
 from .forms import LoginForm, RegisterForm
 
 
 @bp.get("/login")
+@query_budget(1)
 def login():
     if current_user.is_authenticated:
         return redirect(current_app.config.get("AUTH_DEFAULT_REDIRECT", "/admin"))
@@ -20,6 +23,8 @@ def login():
 
 
 @bp.post("/login")
+@query_budget(4)  # +2 when an outdated password hash is upgraded
+@throttle("login")
 def login_post():
     if current_user.is_authenticated:
         return redirect(current_app.config.get("AUTH_DEFAULT_REDIRECT", "/admin"))
@@ -37,11 +42,15 @@ def login_post():
         providers = current_app.config.get("AUTH_PROVIDERS", ["local"])
         return render_template("auth/login.html", form=form, providers=providers), 401
 
+    if db.session.is_modified(user):  # password hash upgraded by check_password
+        db.session.commit()
+
     login_user(user, remember=bool(form.remember.data))
     return redirect(complete_login(user))
 
 
 @bp.post("/logout")
+@query_budget(1)
 @login_required
 def logout():
     logout_user()
@@ -49,6 +58,7 @@ def logout():
 
 
 @bp.get("/register")
+@query_budget(1)
 def register():
     if not current_app.config.get("AUTH_ALLOW_REGISTRATION", False):
         return redirect(url_for("auth.login"))
@@ -58,6 +68,8 @@ def register():
 
 
 @bp.post("/register")
+@query_budget(4)
+@throttle("register")
 def register_post():
     if not current_app.config.get("AUTH_ALLOW_REGISTRATION", False):
         return redirect(url_for("auth.login"))
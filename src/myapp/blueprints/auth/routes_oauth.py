@@ -3,12 +3,16 @@ from __future__ import annotations
 from flask import redirect, request, url_for
 from flask_login import login_user
 
+from ...auth.http import ProviderUnavailable, get_outbound_http
 from ...auth.service import complete_login, get_or_create_user_from_oauth, is_safe_next_url
+from ...querystats import query_budget
+from ...timing import span
 from . import bp
 from .oauth import oauth
 
 
 @bp.get("/github/login")
+@query_budget(0)
 def github_login():
     next_url = request.args.get("next", "")
     if next_url and not is_safe_next_url(next_url):
@@ -17,17 +21,33 @@ def github_login():
     return oauth.github.authorize_redirect(redirect_uri, next=next_url)
 
 
+def _github_emails(token):
+    # Optional: when only the email lookup fails the user logs in without an email
+    try:
+        return oauth.github.get("user/emails", token=token)
+    except ProviderUnavailable:
+        return None
+
+
 @bp.get("/github/callback")
+@query_budget(5)
 def github_callback():
-    oauth.github.authorize_access_token()
-    userinfo = oauth.github.get("user").json()
+    with span("oauth"):
+        token = oauth.github.authorize_access_token()
+        # Independent calls: fetch the profile and the email list at the same time
+        user_resp, emails_resp = get_outbound_http().gather(
+            lambda: oauth.github.get("user", token=token),
+            lambda: _github_emails(token),
+        )
+    user_resp.raise_for_status()
+    userinfo = user_resp.json()
 
     # GitHub "id" is stable; preferred subject
     subject = str(userinfo["id"])
     username = userinfo.get("login")
 
     # Try get primary email (may be absent/private)
-    emails = oauth.github.get("user/emails").json()
+    emails = emails_resp.json() if emails_resp is not None and emails_resp.ok else []
     primary = next((e for e in emails if e.get("primary")), None)
     email = primary.get("email") if primary else None
     # GitHub email verification is tricky; treat as unverified unless explicitly true
@@ -46,6 +66,7 @@ def github_callback():
 
 
 @bp.get("/google/login")
+@query_budget(0)
 def google_login():
     next_url = request.args.get("next", "")
     if next_url and not is_safe_next_url(next_url):
@@ -55,10 +76,13 @@ def google_login():
 
 
 @bp.get("/google/callback")
+@query_budget(5)
 def google_callback():
-    token = oauth.google.authorize_access_token()
-    # OpenID Connect userinfo
-    claims = oauth.google.parse_id_token(token)
+    with span("oauth"):
+        # The ID token is checked against the cached signing keys (auth/oidc.py)
+        token = oauth.google.authorize_access_token()
+        # OpenID Connect claims, verified by authorize_access_token
+        claims = token.get("userinfo") or oauth.google.userinfo(token=token)
 
     subject = str(claims["sub"])
     email = claims.get("email")
@@ -0,0 +1,27 @@
+"""
+Caching: a Cache over pluggable backends (per-process LRU+TTL, a SQLite file
+shared by the workers of one host, Redis), with tag invalidation, single-flight
+computation of misses and hit/miss counters, plus @cached / @cached_view.
+
+Configured by CACHE_URL; see core.Cache for the semantics.
+"""
+
+from .backends import Backend, MemoryBackend, RedisBackend, SQLiteBackend
+from .core import Cache, make_key
+from .decorators import cached, cached_view
+from .ext import EXTENSION_KEY, backend_from_url, get_cache, init_cache
+
+__all__ = [
+    "EXTENSION_KEY",
+    "Backend",
+    "Cache",
+    "MemoryBackend",
+    "RedisBackend",
+    "SQLiteBackend",
+    "backend_from_url",
+    "cached",
+    "cached_view",
+    "get_cache",
+    "init_cache",
+    "make_key",
+]
@@ -0,0 +1,240 @@
+"""
+Storage backends for myapp.cache. Values are opaque bytes; expiry is absolute
+(time.time()) so it means the same thing in every worker.
+
+- MemoryBackend: LRU + TTL in this process only. Counters (incr, used for tag
+  versions) are kept apart and never evicted.
+- SQLiteBackend: one file shared by all workers on a host (WAL, one connection
+  per thread), like the rate-limit store.
+- RedisBackend: any redis.Redis-compatible client, so tests can pass a fake.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Protocol
+
+
+class Backend(Protocol):
+    def get(self, key: str) -> bytes | None: ...
+
+    def get_many(self, keys: list[str]) -> list[bytes | None]: ...
+
+    def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Set only if absent (or expired); True if this call stored it."""
+        ...
+
+    def delete(self, key: str) -> None: ...
+
+    def incr(self, key: str) -> int: ...
+
+    def clear(self) -> None: ...
+
+
+class MemoryBackend:
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        # Evicting a tag version would reset it to 0 and revive entries stored
+        # before an invalidation, so counters live outside the LRU and maxsize
+        self._counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: str, now: float) -> bytes | None:
+        counter = self._counters.get(key)
+        if counter is not None:
+            return str(counter).encode()
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            return self._get(key, time.time())
+
+    def get_many(self, keys: list[str]) -> list[bytes | None]:
+        now = time.time()
+        with self._lock:
+            return [self._get(key, now) for key in keys]
+
+    def _set(self, key: str, value: bytes, ttl: float) -> None:
+        self._data[key] = (time.time() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        with self._lock:
+            if self._get(key, time.time()) is not None:
+                return False
+            self._set(key, value, ttl)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._counters.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = self._counters.get(key, 0) + 1
+            self._counters[key] = value
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._counters.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+class SQLiteBackend:
+    def __init__(self, path: str, *, busy_timeout: float = 1.0, prune_every: int = 1000) -> None:
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._writes = 0
+        _sqlite_backends.add(self)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # it is a cache
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def reset_after_fork(self) -> None:
+        self._local = threading.local()
+
+    def get(self, key: str) -> bytes | None:
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: list[str]) -> list[bytes | None]:
+        marks = ",".join("?" * len(keys))
+        rows = self._conn().execute(
+            f"SELECT key, value FROM cache WHERE key IN ({marks}) AND expires > ?",
+            (*keys, time.time()),
+        )
+        found = dict(rows.fetchall())
+        return [found.get(key) for key in keys]
+
+    def _wrote(self) -> None:
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self._conn().execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl),
+        )
+        self._wrote()
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+            "WHERE cache.expires <= ?",
+            (key, value, now + ttl, now),
+        )
+        self._wrote()
+        return cursor.rowcount == 1
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def incr(self, key: str) -> int:
+        (value,) = (
+            self._conn()
+            .execute(
+                "INSERT INTO cache (key, value, expires) VALUES (?, '1', 9e999) "
+                "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1 "
+                "RETURNING value",
+                (key,),
+            )
+            .fetchone()
+        )
+        return int(value)
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM cache")
+
+
+_sqlite_backends: weakref.WeakSet[SQLiteBackend] = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for backend in list(_sqlite_backends):
+        backend.reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class RedisBackend:
+    """`client` is a redis.Redis (or anything with the same get/mget/set/delete/incr)."""
+
+    def __init__(self, client, prefix: str = "") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(self.prefix + key)
+
+    def get_many(self, keys: list[str]) -> list[bytes | None]:
+        return list(self.client.mget([self.prefix + k for k in keys]))
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)))
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return bool(self.client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)), nx=True))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(self.prefix + key))
+
+    def clear(self) -> None:
+        # Only our own keys; the database may be shared with Celery etc.
+        keys = list(self.client.scan_iter(match=f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
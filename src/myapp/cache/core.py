@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import pickle
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future
+from typing import Any, TypeVar
+
+from .backends import Backend
+
+logger = logging.getLogger("myapp.cache")
+
+T = TypeVar("T")
+
+_MISSING = object()
+
+
+class Cache:
+    """
+    Pickled values in a Backend, with tags, single-flight and hit/miss counters.
+
+    Tags: every tag has a version counter in the backend. An entry records the
+    versions of its tags when it was stored; invalidate_tags() bumps the
+    counters, so older entries no longer match and count as misses. Nothing
+    has to be enumerated or deleted, which works the same on every backend.
+
+    Single-flight: concurrent get_or_set() misses for one key in a process wait
+    for the first caller's result. Across processes the first caller also takes
+    a short lock entry in the backend (add()), and other workers poll for the
+    value for up to `lock_timeout` seconds before computing it themselves.
+
+    Backend errors are logged and treated as misses, so a cache outage costs
+    latency but never fails a request.
+    """
+
+    def __init__(
+        self,
+        backend: Backend,
+        *,
+        default_ttl: float = 300.0,
+        prefix: str = "",
+        lock_timeout: float = 5.0,
+        poll_interval: float = 0.05,
+    ) -> None:
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0  # misses caused by tag invalidation
+        self.coalesced = 0  # misses answered by another caller's computation
+        self.errors = 0
+        self._inflight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    # ----------------------------
+    # Keys and tags
+    # ----------------------------
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}v:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}t:{tag}"
+
+    def _tag_versions(self, tags: Iterable[str]) -> dict[str, int]:
+        tags = sorted(set(tags))
+        if not tags:
+            return {}
+        values = self.backend.get_many([self._tag_key(t) for t in tags])
+        return {t: int(v or 0) for t, v in zip(tags, values, strict=True)}
+
+    def invalidate_tags(self, *tags: str) -> None:
+        for tag in tags:
+            try:
+                self.backend.incr(self._tag_key(tag))
+            except Exception:
+                self.errors += 1
+                logger.warning("Cache tag invalidation failed for %r", tag, exc_info=True)
+
+    # ----------------------------
+    # Plain access
+    # ----------------------------
+    def _load(self, key: str) -> Any:
+        try:
+            raw = self.backend.get(self._key(key))
+            if raw is None:
+                return _MISSING
+            versions, value = pickle.loads(raw)
+            if versions and self._tag_versions(versions) != versions:
+                self.stale += 1
+                return _MISSING
+        except Exception:
+            self.errors += 1
+            logger.warning("Cache read failed for %r", key, exc_info=True)
+            return _MISSING
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._load(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None, tags: Iterable[str] = ()) -> None:
+        try:
+            self._store(key, value, ttl, self._tag_versions(tags))
+        except Exception:
+            self.errors += 1
+            logger.warning("Cache write failed for %r", key, exc_info=True)
+
+    def _store(self, key: str, value: Any, ttl: float | None, versions: dict[str, int]) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        raw = pickle.dumps((versions, value), pickle.HIGHEST_PROTOCOL)
+        self.backend.set(self._key(key), raw, ttl)
+
+    def _store_quietly(
+        self, key: str, value: Any, ttl: float | None, versions: dict[str, int]
+    ) -> None:
+        try:
+            self._store(key, value, ttl, versions)
+        except Exception:
+            self.errors += 1
+            logger.warning("Cache write failed for %r", key, exc_info=True)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.backend.delete(self._key(key))
+        except Exception:
+            self.errors += 1
+            logger.warning("Cache delete failed for %r", key, exc_info=True)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    # ----------------------------
+    # Single-flight
+    # ----------------------------
+    def get_or_set(
+        self,
+        key: str,
+        compute: Callable[[], T],
+        ttl: float | None = None,
+        tags: Iterable[str] = (),
+        store_if: Callable[[T], bool] | None = None,
+    ) -> T:
+        """
+        Cached value for `key`, or compute(), store and return it. `store_if`
+        can veto storing a result (e.g. an error page).
+        """
+        value = self._load(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        self.misses += 1
+        if not leader:
+            self.coalesced += 1
+            return future.result()
+
+        try:
+            value = self._compute_once(key, compute, ttl, tags, store_if)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _compute_once(
+        self,
+        key: str,
+        compute: Callable[[], T],
+        ttl: float | None,
+        tags: Iterable[str],
+        store_if: Callable[[T], bool] | None,
+    ) -> T:
+        lock_key = f"{self.prefix}l:{key}"
+        try:
+            # Versions from before computing: an invalidation while we compute wins
+            versions = self._tag_versions(tags)
+            locked = self.backend.add(lock_key, b"1", self.lock_timeout)
+        except Exception:
+            self.errors += 1
+            logger.warning("Cache unavailable for %r, computing without it", key, exc_info=True)
+            return compute()
+
+        if not locked:
+            # Another worker is computing it; wait for its result
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                value = self._load(key)
+                if value is not _MISSING:
+                    self.coalesced += 1
+                    return value
+
+        try:
+            value = compute()
+            if store_if is None or store_if(value):
+                self._store_quietly(key, value, ttl, versions)
+            return value
+        finally:
+            if locked:
+                try:
+                    self.backend.delete(lock_key)
+                except Exception:
+                    pass
+
+    # ----------------------------
+    # Stats
+    # ----------------------------
+    def stats(self) -> dict[str, float | int]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def make_key(*parts: object) -> str:
+    """Stable key for arbitrary (repr-able) arguments, hashed to a fixed length."""
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
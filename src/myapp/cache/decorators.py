@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from functools import wraps
+
+from flask import Response, make_response, request
+from flask_login import current_user
+
+from .core import make_key
+from .ext import get_cache
+
+# Headers that must not be replayed to another client from a cached response
+_UNCACHEABLE_HEADERS = ("Set-Cookie", "Vary")
+
+
+def _resolve_tags(tags, args, kwargs) -> tuple[str, ...]:
+    return tuple(tags(*args, **kwargs)) if callable(tags) else tuple(tags)
+
+
+def cached(
+    ttl: float | None = None,
+    *,
+    tags: Iterable[str] | Callable[..., Iterable[str]] = (),
+    key: Callable[..., str] | None = None,
+):
+    """
+    Cache a function's return value (it must be picklable) per arguments.
+
+    `tags` may be a callable taking the function's arguments, e.g.
+    ``tags=lambda user_id: [f"user:{user_id}"]``. Outside an app context or
+    with CACHE_ENABLED off the function is simply called. The wrapper gets
+    ``invalidate(*args, **kwargs)`` to drop one entry.
+    """
+
+    def decorator(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+
+        def cache_key(*args, **kwargs) -> str:
+            suffix = key(*args, **kwargs) if key else make_key(args, sorted(kwargs.items()))
+            return f"fn:{name}:{suffix}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            if cache is None:
+                return fn(*args, **kwargs)
+            return cache.get_or_set(
+                cache_key(*args, **kwargs),
+                lambda: fn(*args, **kwargs),
+                ttl,
+                _resolve_tags(tags, args, kwargs),
+            )
+
+        def invalidate(*args, **kwargs) -> None:
+            cache = get_cache()
+            if cache is not None:
+                cache.delete(cache_key(*args, **kwargs))
+
+        wrapper.invalidate = invalidate
+        return wrapper
+
+    return decorator
+
+
+def cached_view(
+    ttl: float | None = None,
+    *,
+    tags: Iterable[str] | Callable[..., Iterable[str]] = (),
+    per_user: bool = False,
+):
+    """
+    Cache the response of a GET view per URL (path + query string).
+
+    Only 200 responses without Set-Cookie/Vary are stored. Responses are shared
+    by all clients unless `per_user` is set, which adds the logged-in user's id
+    to the key (and therefore loads the user). Responses carry ``X-Cache: HIT``
+    or ``MISS``.
+    """
+
+    def decorator(view):
+        name = f"{view.__module__}.{view.__qualname__}"
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            if cache is None or request.method not in ("GET", "HEAD"):
+                return view(*args, **kwargs)
+
+            user = current_user.get_id() if per_user else None
+            cache_key = f"view:{name}:{make_key(request.full_path, user)}"
+            computed = []
+
+            def render():
+                response = make_response(view(*args, **kwargs))
+                computed.append(response)
+                if response.status_code != 200 or any(
+                    h in response.headers for h in _UNCACHEABLE_HEADERS
+                ):
+                    return None
+                return (response.get_data(), response.headers.get("Content-Type"))
+
+            entry = cache.get_or_set(
+                cache_key,
+                render,
+                ttl,
+                _resolve_tags(tags, args, kwargs),
+                store_if=lambda entry: entry is not None,
+            )
+            if computed:
+                response = computed[0]
+                response.headers["X-Cache"] = "MISS"
+                return response
+            if entry is None:  # another request rendered an uncacheable response meanwhile
+                return view(*args, **kwargs)
+            body, content_type = entry
+            return Response(body, content_type=content_type, headers={"X-Cache": "HIT"})
+
+        return wrapper
+
+    return decorator
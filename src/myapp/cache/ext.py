@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import os
+
+from flask import Flask, current_app, has_app_context
+
+from .backends import Backend, MemoryBackend, RedisBackend, SQLiteBackend
+from .core import Cache
+
+EXTENSION_KEY = "cache"
+
+
+def backend_from_url(url: str, app: Flask) -> Backend:
+    """memory:// (default), sqlite:// (file in the instance folder), sqlite:///path or redis://..."""
+    if not url or url.startswith("memory://"):
+        return MemoryBackend(int(app.config.get("CACHE_MAX_ENTRIES", 1024)))
+    if url == "sqlite://":
+        return SQLiteBackend(os.path.join(app.instance_path, "cache.sqlite3"))
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url.removeprefix("sqlite:///"))
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ModuleNotFoundError as e:
+            raise RuntimeError(
+                "CACHE_URL points at Redis but 'redis' is not installed. "
+                "Install with: pip install -e '.[redis]'"
+            ) from e
+        return RedisBackend(redis.Redis.from_url(url, socket_timeout=0.5))
+    raise ValueError(f"Unsupported CACHE_URL {url!r}")
+
+
+def get_cache() -> Cache | None:
+    return current_app.extensions.get(EXTENSION_KEY) if has_app_context() else None
+
+
+def init_cache(app: Flask, backend: Backend | None = None) -> Cache | None:
+    if not app.config.get("CACHE_ENABLED", True):
+        return None
+    cache = Cache(
+        backend or backend_from_url(app.config.get("CACHE_URL", ""), app),
+        default_ttl=float(app.config.get("CACHE_DEFAULT_TTL", 300.0)),
+        prefix=app.config.get("CACHE_KEY_PREFIX", "myapp:"),
+        lock_timeout=float(app.config.get("CACHE_LOCK_TIMEOUT", 5.0)),
+    )
+    app.extensions[EXTENSION_KEY] = cache
+    return cache
@@ -1,7 +1,7 @@
 import click
 
-from .extensions import db
-from .models import User
+# Command dependencies (models, hashing, tokens, measurement helpers) are imported
+# inside the commands, so registering the CLI imports nothing beyond click.
 
 
 def register_cli(app):
@@ -9,6 +9,9 @@ def register_cli(app):
     @click.argument("email")
     @click.password_option()
     def create_admin(email, password):
+        from .extensions import db
+        from .models import User
+
         email = email.lower().strip()
         user = User.query.filter_by(email=email).first()
         if user:
@@ -19,3 +22,140 @@ def register_cli(app):
         db.session.add(user)
         db.session.commit()
         click.echo("Admin created.")
+
+    @app.cli.command("calibrate-hash")
+    @click.option(
+        "--target-ms",
+        type=float,
+        default=None,
+        help="Latency budget per hash. Defaults to PASSWORD_HASH_TARGET_MS.",
+    )
+    @click.option(
+        "--family",
+        type=click.Choice(["auto", "scrypt", "pbkdf2"]),
+        default="auto",
+        show_default=True,
+        help="auto prefers scrypt and falls back to pbkdf2.",
+    )
+    @click.option("--rounds", default=3, show_default=True, help="Hashes per candidate.")
+    @click.option(
+        "--max-memory-mb",
+        type=int,
+        default=64,
+        show_default=True,
+        help="Upper bound for scrypt memory per hash (times PASSWORD_HASH_MAX_CONCURRENCY).",
+    )
+    @click.option(
+        "--write/--no-write",
+        default=False,
+        help="Store the result as PASSWORD_HASH_METHOD in the env file.",
+    )
+    @click.option("--env-file", default=".env", show_default=True)
+    def calibrate_hash(target_ms, family, rounds, max_memory_mb, write, env_file):
+        """Pick the strongest password hash parameters within a latency budget on this host."""
+        from .auth.hashing import calibrate
+
+        target_ms = target_ms if target_ms is not None else app.config["PASSWORD_HASH_TARGET_MS"]
+        families = ("scrypt", "pbkdf2") if family == "auto" else (family,)
+        best, results = calibrate(
+            target_ms, families=families, rounds=rounds, max_memory_kib=max_memory_mb * 1024
+        )
+
+        click.echo(f"{'median ms':>10} {'memory':>9}  method")
+        for m in results:
+            memory = f"{m.memory_kib // 1024} MiB" if m.memory_kib else "-"
+            click.echo(f"{m.median_ms:>10.1f} {memory:>9}  {m.method}")
+
+        if best is None:
+            raise click.ClickException(f"No candidate hashes within {target_ms:.0f} ms here.")
+        click.echo(f"\nPASSWORD_HASH_METHOD={best.method}")
+
+        if write:
+            from dotenv import set_key
+
+            set_key(env_file, "PASSWORD_HASH_METHOD", best.method, quote_mode="never")
+            click.echo(f"Written to {env_file}; existing hashes are upgraded on next login.")
+
+    @app.cli.command("build-template-cache")
+    def build_template_cache():
+        """Precompile all templates into the Jinja bytecode cache (e.g. at image build)."""
+        from .templating import compile_templates, install_template_cache
+
+        directory = install_template_cache(app)
+        count = compile_templates(app)
+        click.echo(f"Compiled {count} templates into {directory}")
+
+    @app.cli.command("profile-token")
+    @click.option(
+        "--mode", type=click.Choice(["sample", "cprofile"]), default="sample", show_default=True
+    )
+    def profile_token(mode):
+        """Print a token for the X-Profile header (valid for PROFILE_TOKEN_MAX_AGE seconds)."""
+        from .profiling import make_profile_token
+
+        click.echo(make_profile_token(app, mode))
+
+    @app.cli.command("mint-token")
+    @click.argument("subject")
+    @click.option("--scope", "scopes", multiple=True, help="Repeat for several scopes.")
+    @click.option("--ttl", type=int, default=None, help="Lifetime in seconds (API_TOKEN_TTL).")
+    def mint_token_command(subject, scopes, ttl):
+        """Print a signed API bearer token for SUBJECT (a service or client name)."""
+        from .auth.tokens import mint_token
+
+        token, claims = mint_token(app, subject, scopes, ttl)
+        click.echo(token)
+        click.echo(f"jti={claims.jti} kid={claims.kid} exp={claims.exp}", err=True)
+
+    @app.cli.command("revoke-token")
+    @click.argument("token")
+    def revoke_token_command(token):
+        """Add an API token to the deny-list until it expires."""
+        from .auth.tokens import InvalidToken, decode_token, revoke_token
+        from .extensions import db
+
+        try:
+            claims = decode_token(app, token, verify_exp=False)
+        except InvalidToken as e:
+            raise click.ClickException(f"Not a valid token: {e}.") from None
+        revoke_token(claims)
+        db.session.commit()
+        click.echo(f"Revoked {claims.jti}.")
+
+    @app.cli.command("cache-invalidate")
+    @click.argument("tags", nargs=-1, required=True)
+    def cache_invalidate(tags):
+        """Invalidate cache entries by tag (effective for shared CACHE_URL backends)."""
+        from .cache import get_cache
+
+        cache = get_cache()
+        if cache is None:
+            raise click.ClickException("The cache is disabled (CACHE_ENABLED=0).")
+        cache.invalidate_tags(*tags)
+        click.echo(f"Invalidated {len(tags)} tag(s).")
+
+    @app.cli.command("startup-report")
+    @click.option("--top", default=15, show_default=True, help="Number of modules to list.")
+    @click.option("--prefix", default=None, help="Only list modules starting with this prefix.")
+    @click.option("--budget-ms", type=float, default=None, help="Defaults to STARTUP_BUDGET_MS.")
+    def startup_report(top, prefix, budget_ms):
+        """Measure import + create_app time in a fresh interpreter."""
+        from .startup import measure_startup
+
+        budget_ms = budget_ms if budget_ms is not None else app.config["STARTUP_BUDGET_MS"]
+        report = measure_startup()
+
+        click.echo(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for row in report.top(top, prefix=prefix):
+            click.echo(
+                f"{row.cumulative_us / 1000:>14.1f} {row.self_us / 1000:>9.1f}  {row.module}"
+            )
+        click.echo(
+            f"\ncreate_app: {report.create_app_ms:.1f} ms, "
+            f"total: {report.total_ms:.1f} ms (budget {budget_ms:.0f} ms)"
+        )
+
+        if report.total_ms > budget_ms:
+            raise click.ClickException(
+                f"Startup took {report.total_ms:.1f} ms, over the {budget_ms:.0f} ms budget."
+            )
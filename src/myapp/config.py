@@ -6,6 +6,9 @@ from dataclasses import asdict, dataclass, field
 from pathlib import Path
 from urllib.parse import urlparse
 
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
+
 
 def _env_bool(name: str, default: bool = False) -> bool:
     val = os.getenv(name)
@@ -14,6 +17,20 @@ def _env_bool(name: str, default: bool = False) -> bool:
     return val.strip().lower() in {"1", "true", "yes", "y", "on"}
 
 
+def _env_int(name: str, default: int) -> int:
+    val = os.getenv(name)
+    if val is None or not val.strip():
+        return default
+    return int(val)
+
+
+def _env_float(name: str, default: float) -> float:
+    val = os.getenv(name)
+    if val is None or not val.strip():
+        return default
+    return float(val)
+
+
 def _env_list(name: str, default: list[str]) -> list[str]:
     raw = os.getenv(name)
     if not raw:
@@ -21,6 +38,13 @@ def _env_list(name: str, default: list[str]) -> list[str]:
     return [x.strip().lower() for x in raw.split(",") if x.strip()]
 
 
+def _env_mapping(name: str) -> dict[str, str]:
+    """Parse "key=value,key2=value2" (keys and values keep their case)."""
+    raw = os.getenv(name, "")
+    pairs = (item.split("=", 1) for item in raw.split(",") if "=" in item)
+    return {k.strip(): v.strip() for k, v in pairs if k.strip()}
+
+
 _PROJECT_ROOT = Path(__file__).resolve().parents[2]
 _INSTANCE_DIR = _PROJECT_ROOT / "instance"
 
@@ -56,10 +80,59 @@ def _db_url(default: str) -> str:
     return _normalize_db_url(os.getenv("DATABASE_URL", default))
 
 
+def _engine_options(db_url: str) -> dict[str, object]:
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS for the given database URL.
+    Pool settings come from DB_* env vars; defaults depend on the dialect.
+    """
+    if not db_url:
+        return {}
+
+    url = make_url(db_url)
+    backend = url.get_backend_name()
+
+    if backend == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            # One shared connection, otherwise every checkout sees an empty database
+            return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+        return {
+            "poolclass": QueuePool,
+            "pool_size": _env_int("DB_POOL_SIZE", 5),
+            "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+            "pool_timeout": _env_float("DB_POOL_TIMEOUT", 30.0),
+            "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", False),
+        }
+
+    if backend == "postgresql" and _env_bool("DB_PGBOUNCER", False):
+        # pgbouncer (transaction pooling) owns the pool; prepared statements don't survive it
+        options: dict[str, object] = {"poolclass": NullPool}
+        if url.get_driver_name() == "psycopg":
+            options["connect_args"] = {"prepare_threshold": None}
+        return options
+
+    return {
+        "poolclass": QueuePool,
+        "pool_size": _env_int("DB_POOL_SIZE", 10),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_float("DB_POOL_TIMEOUT", 10.0),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+
+
 @dataclass(frozen=True)
 class BaseConfig:
     SECRET_KEY: str = os.getenv("SECRET_KEY", secrets.token_hex(32))
 
+    # Blueprints to import and register ("none" for CLI/job processes)
+    APP_BLUEPRINTS: list[str] = field(
+        default_factory=lambda: _env_list("APP_BLUEPRINTS", ["auth", "api", "admin"])
+    )
+    # Fail `flask startup-report` when importing + create_app takes longer than this
+    STARTUP_BUDGET_MS: float = field(
+        default_factory=lambda: _env_float("STARTUP_BUDGET_MS", 1500.0)
+    )
+
     AUTH_PROVIDERS: list[str] = field(
         default_factory=lambda: _env_list("AUTH_PROVIDERS", ["local"])
     )
@@ -76,6 +149,40 @@ class BaseConfig:
         default_factory=lambda: _env_list("AUTH_TRUSTED_EMAIL_PROVIDERS", ["google"])
     )
 
+    # OAuth clients (blueprints/auth/oauth.py), only read for enabled providers
+    GITHUB_CLIENT_ID: str = field(default_factory=lambda: os.getenv("GITHUB_CLIENT_ID", ""))
+    GITHUB_CLIENT_SECRET: str = field(default_factory=lambda: os.getenv("GITHUB_CLIENT_SECRET", ""))
+    GOOGLE_CLIENT_ID: str = field(default_factory=lambda: os.getenv("GOOGLE_CLIENT_ID", ""))
+    GOOGLE_CLIENT_SECRET: str = field(default_factory=lambda: os.getenv("GOOGLE_CLIENT_SECRET", ""))
+    # Provider calls (auth/http.py): one keep-alive pool per worker, connect/read timeouts in
+    # seconds, and per provider a circuit breaker that answers 503 for OAUTH_BREAKER_RESET
+    # seconds once OAUTH_BREAKER_FAILURES calls in a row failed
+    OAUTH_HTTP_CONNECT_TIMEOUT: float = field(
+        default_factory=lambda: _env_float("OAUTH_HTTP_CONNECT_TIMEOUT", 3.05)
+    )
+    OAUTH_HTTP_READ_TIMEOUT: float = field(
+        default_factory=lambda: _env_float("OAUTH_HTTP_READ_TIMEOUT", 10.0)
+    )
+    OAUTH_HTTP_POOL_SIZE: int = field(default_factory=lambda: _env_int("OAUTH_HTTP_POOL_SIZE", 10))
+    OAUTH_BREAKER_FAILURES: int = field(
+        default_factory=lambda: _env_int("OAUTH_BREAKER_FAILURES", 5)
+    )
+    OAUTH_BREAKER_RESET: float = field(
+        default_factory=lambda: _env_float("OAUTH_BREAKER_RESET", 30.0)
+    )
+    # OIDC discovery document + JWKS (auth/oidc.py): cached for the response's max-age clamped
+    # to MIN..MAX (DEFAULT without one), persisted in OIDC_CACHE_DIR (empty = <instance>/oidc)
+    # and refreshed in the background once OIDC_REFRESH_AHEAD of that time has passed
+    OIDC_CACHE_DIR: str = field(default_factory=lambda: os.getenv("OIDC_CACHE_DIR", ""))
+    OIDC_DEFAULT_TTL: float = field(default_factory=lambda: _env_float("OIDC_DEFAULT_TTL", 3600.0))
+    OIDC_MIN_TTL: float = field(default_factory=lambda: _env_float("OIDC_MIN_TTL", 300.0))
+    OIDC_MAX_TTL: float = field(default_factory=lambda: _env_float("OIDC_MAX_TTL", 86400.0))
+    OIDC_REFRESH_AHEAD: float = field(default_factory=lambda: _env_float("OIDC_REFRESH_AHEAD", 0.8))
+    # An ID token with an unknown key id refetches the JWKS at most this often (seconds)
+    OIDC_KID_REFRESH_INTERVAL: float = field(
+        default_factory=lambda: _env_float("OIDC_KID_REFRESH_INTERVAL", 60.0)
+    )
+
     SESSION_COOKIE_HTTPONLY: bool = True
     SESSION_COOKIE_SAMESITE: str = "Lax"
     REMEMBER_COOKIE_HTTPONLY: bool = True
@@ -88,11 +195,210 @@ class BaseConfig:
     SQLALCHEMY_TRACK_MODIFICATIONS: bool = field(
         default_factory=lambda: _env_bool("SQLALCHEMY_TRACK_MODIFICATIONS", False)
     )
+    # Filled from SQLALCHEMY_DATABASE_URI in __post_init__ unless given explicitly
+    SQLALCHEMY_ENGINE_OPTIONS: dict[str, object] = field(default_factory=dict)
+
+    # Structured logging (see logs.py): JSON records written by a background QueueListener
+    LOG_JSON: bool = field(default_factory=lambda: _env_bool("LOG_JSON", False))
+    LOG_LEVEL: str = field(default_factory=lambda: os.getenv("LOG_LEVEL", "INFO").upper())
+    # Per-logger levels and sampling rates for records below WARNING, e.g.
+    # LOG_LEVELS="myapp=DEBUG,sqlalchemy.engine=INFO" LOG_SAMPLING="myapp=0.05"
+    LOG_LEVELS: dict[str, str] = field(default_factory=lambda: _env_mapping("LOG_LEVELS"))
+    LOG_SAMPLING: dict[str, str] = field(default_factory=lambda: _env_mapping("LOG_SAMPLING"))
+    LOG_FILE: str = field(default_factory=lambda: os.getenv("LOG_FILE", ""))
+    LOG_ACCESS: bool = field(default_factory=lambda: _env_bool("LOG_ACCESS", False))
+
+    # Prometheus-style /metrics (see metrics.py). Set METRICS_DIR (shared by all gunicorn
+    # workers, cleared by the master at start) to aggregate across processes.
+    METRICS_ENABLED: bool = field(default_factory=lambda: _env_bool("METRICS_ENABLED", True))
+    METRICS_DIR: str = field(default_factory=lambda: os.getenv("METRICS_DIR", ""))
+    # /metrics requires "Authorization: Bearer <token>"; without a token it is only served
+    # in debug/testing mode
+    METRICS_TOKEN: str = field(default_factory=lambda: os.getenv("METRICS_TOKEN", ""))
+    # Seconds between pool/user-cache gauge updates from the request path
+    METRICS_SYNC_INTERVAL: float = field(
+        default_factory=lambda: _env_float("METRICS_SYNC_INTERVAL", 1.0)
+    )
+
+    # Server-Timing breakdown (db/tpl/hash/oauth/app) per response, see timing.py.
+    # SERVER_TIMING_ADMIN lets admins request it with "X-Server-Timing: 1" when disabled.
+    SERVER_TIMING_ENABLED: bool = field(
+        default_factory=lambda: _env_bool("SERVER_TIMING_ENABLED", False)
+    )
+    SERVER_TIMING_ADMIN: bool = field(
+        default_factory=lambda: _env_bool("SERVER_TIMING_ADMIN", True)
+    )
+    SERVER_TIMING_LOG: bool = field(default_factory=lambda: _env_bool("SERVER_TIMING_LOG", False))
+
+    # Per-request SQL statement counts, N+1 warnings and @query_budget checks (querystats.py).
+    # Strict mode raises when a budget is exceeded; it defaults to on under TESTING.
+    SQL_STATS_ENABLED: bool = field(default_factory=lambda: _env_bool("SQL_STATS_ENABLED", False))
+    SQL_N_PLUS_ONE_THRESHOLD: int = field(
+        default_factory=lambda: _env_int("SQL_N_PLUS_ONE_THRESHOLD", 5)
+    )
+    SQL_BUDGET_STRICT: bool = field(default_factory=lambda: _env_bool("SQL_BUDGET_STRICT", False))
+
+    # On-demand profiling for admins (profiling.py); files go to PROFILE_DIR,
+    # default <instance>/profiles, and only the newest PROFILE_KEEP are kept
+    PROFILING_ENABLED: bool = field(default_factory=lambda: _env_bool("PROFILING_ENABLED", True))
+    PROFILE_DIR: str = field(default_factory=lambda: os.getenv("PROFILE_DIR", ""))
+    PROFILE_INTERVAL: float = field(default_factory=lambda: _env_float("PROFILE_INTERVAL", 0.005))
+    PROFILE_MAX_WINDOW: float = field(
+        default_factory=lambda: _env_float("PROFILE_MAX_WINDOW", 60.0)
+    )
+    PROFILE_KEEP: int = field(default_factory=lambda: _env_int("PROFILE_KEEP", 50))
+    PROFILE_TOKEN_MAX_AGE: int = field(
+        default_factory=lambda: _env_int("PROFILE_TOKEN_MAX_AGE", 900)
+    )
+
+    # tracemalloc snapshots and gc/identity-map stats under /admin/memory/ (memory.py)
+    MEMORY_INSPECTOR_ENABLED: bool = field(
+        default_factory=lambda: _env_bool("MEMORY_INSPECTOR_ENABLED", True)
+    )
+    # Frames kept per allocation; 1 is enough to group by file and line
+    MEMORY_TRACE_FRAMES: int = field(default_factory=lambda: _env_int("MEMORY_TRACE_FRAMES", 1))
+    MEMORY_MAX_SNAPSHOTS: int = field(default_factory=lambda: _env_int("MEMORY_MAX_SNAPSHOTS", 10))
+
+    # Number of reverse proxies in front of the app (load balancer, nginx). When > 0 the
+    # client address and scheme come from X-Forwarded-For/-Proto (werkzeug's ProxyFix);
+    # otherwise every client behind a proxy shares the proxy's address, including its
+    # per-IP rate limits. Leave 0 when clients connect directly (the headers are spoofable).
+    TRUSTED_PROXY_COUNT: int = field(default_factory=lambda: _env_int("TRUSTED_PROXY_COUNT", 0))
+
+    # Sliding-window limits for login/registration (ratelimit.py), "<count>/<seconds>" or
+    # "<count>/minute"; empty disables one. Storage: empty = SQLite file in the instance
+    # folder (shared by the workers of one host), sqlite:///path, memory:// or redis://...
+    RATELIMIT_ENABLED: bool = field(default_factory=lambda: _env_bool("RATELIMIT_ENABLED", True))
+    RATELIMIT_STORAGE_URL: str = field(
+        default_factory=lambda: os.getenv("RATELIMIT_STORAGE_URL", "")
+    )
+    RATELIMIT_LOGIN_PER_IP: str = field(
+        default_factory=lambda: os.getenv("RATELIMIT_LOGIN_PER_IP", "20/minute")
+    )
+    RATELIMIT_LOGIN_PER_EMAIL: str = field(
+        default_factory=lambda: os.getenv("RATELIMIT_LOGIN_PER_EMAIL", "5/minute")
+    )
+    RATELIMIT_REGISTER_PER_IP: str = field(
+        default_factory=lambda: os.getenv("RATELIMIT_REGISTER_PER_IP", "5/hour")
+    )
+
+    # Bearer tokens for the API (auth/tokens.py). Key ring as "kid=secret,kid2=secret2";
+    # empty uses SECRET_KEY under kid "default". API_TOKEN_KID signs new tokens.
+    API_TOKEN_KEYS: dict[str, str] = field(default_factory=lambda: _env_mapping("API_TOKEN_KEYS"))
+    API_TOKEN_KID: str = field(default_factory=lambda: os.getenv("API_TOKEN_KID", ""))
+    # Default lifetime of `flask mint-token` tokens
+    API_TOKEN_TTL: int = field(default_factory=lambda: _env_int("API_TOKEN_TTL", 3600))
+    # Seconds between deny-list reloads in each worker
+    API_TOKEN_REVOCATION_REFRESH: float = field(
+        default_factory=lambda: _env_float("API_TOKEN_REVOCATION_REFRESH", 30.0)
+    )
+
+    # /health/ready (health.py): checks refreshed by a background thread per worker. A worker
+    # is not ready while pool saturation (checked out / (size + overflow)) >= the threshold.
+    HEALTH_CHECK_INTERVAL: float = field(
+        default_factory=lambda: _env_float("HEALTH_CHECK_INTERVAL", 5.0)
+    )
+    HEALTH_POOL_SATURATION: float = field(
+        default_factory=lambda: _env_float("HEALTH_POOL_SATURATION", 1.0)
+    )
+    HEALTH_REQUIRE_MIGRATIONS: bool = field(
+        default_factory=lambda: _env_bool("HEALTH_REQUIRE_MIGRATIONS", True)
+    )
+    HEALTH_REQUIRE_WARMUP: bool = field(
+        default_factory=lambda: _env_bool("HEALTH_REQUIRE_WARMUP", False)
+    )
+
+    # Unhandled exceptions: full traceback for the first ERROR_LOG_BURST per fingerprint
+    # (type + ERROR_LOG_FRAMES innermost frames) and ERROR_LOG_WINDOW seconds, then counted
+    ERROR_LOG_WINDOW: float = field(default_factory=lambda: _env_float("ERROR_LOG_WINDOW", 60.0))
+    ERROR_LOG_BURST: int = field(default_factory=lambda: _env_int("ERROR_LOG_BURST", 5))
+    ERROR_LOG_FRAMES: int = field(default_factory=lambda: _env_int("ERROR_LOG_FRAMES", 3))
+
+    # Opt-in SQLite profile (WAL etc.), applied per connection by sqlite_tuning.py
+    SQLITE_PERFORMANCE_MODE: bool = field(
+        default_factory=lambda: _env_bool("SQLITE_PERFORMANCE_MODE", False)
+    )
+    SQLITE_JOURNAL_MODE: str = field(
+        default_factory=lambda: os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    )
+    SQLITE_SYNCHRONOUS: str = field(
+        default_factory=lambda: os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    )
+    SQLITE_MMAP_SIZE: int = field(default_factory=lambda: _env_int("SQLITE_MMAP_SIZE", 268435456))
+    SQLITE_CACHE_SIZE: int = field(default_factory=lambda: _env_int("SQLITE_CACHE_SIZE", -64000))
+    SQLITE_TEMP_STORE: str = field(default_factory=lambda: os.getenv("SQLITE_TEMP_STORE", "MEMORY"))
+    SQLITE_BUSY_TIMEOUT: int = field(default_factory=lambda: _env_int("SQLITE_BUSY_TIMEOUT", 5000))
+
+    # Application cache (myapp.cache): memory:// (per process, LRU), sqlite:// (file in the
+    # instance folder shared by the workers of one host), sqlite:///path or redis://...
+    CACHE_ENABLED: bool = field(default_factory=lambda: _env_bool("CACHE_ENABLED", True))
+    CACHE_URL: str = field(default_factory=lambda: os.getenv("CACHE_URL", "memory://"))
+    CACHE_DEFAULT_TTL: float = field(default_factory=lambda: _env_float("CACHE_DEFAULT_TTL", 300.0))
+    # Entry limit of the memory:// backend
+    CACHE_MAX_ENTRIES: int = field(default_factory=lambda: _env_int("CACHE_MAX_ENTRIES", 1024))
+    CACHE_KEY_PREFIX: str = field(default_factory=lambda: os.getenv("CACHE_KEY_PREFIX", "myapp:"))
+    # How long other workers wait for one worker computing the same missing key
+    CACHE_LOCK_TIMEOUT: float = field(default_factory=lambda: _env_float("CACHE_LOCK_TIMEOUT", 5.0))
+
+    # Per-process cache in front of the Flask-Login user_loader
+    USER_CACHE_ENABLED: bool = field(default_factory=lambda: _env_bool("USER_CACHE_ENABLED", True))
+    USER_CACHE_SIZE: int = field(default_factory=lambda: _env_int("USER_CACHE_SIZE", 1024))
+    USER_CACHE_TTL: float = field(default_factory=lambda: _env_float("USER_CACHE_TTL", 30.0))
+
+    # Password hashing on a bounded per-worker thread pool (auth/hashing.py). Calls beyond
+    # concurrency + queue, or waiting longer than the timeout, fail fast with 503.
+    # werkzeug method string, e.g. "scrypt:65536:8:1" (`flask calibrate-hash` picks one).
+    # Empty means werkzeug's default. Other hashes are upgraded on successful login.
+    PASSWORD_HASH_METHOD: str = field(default_factory=lambda: os.getenv("PASSWORD_HASH_METHOD", ""))
+    PASSWORD_HASH_TARGET_MS: float = field(
+        default_factory=lambda: _env_float("PASSWORD_HASH_TARGET_MS", 250.0)
+    )
+    # Bounded hashing pool per process (auth/hashing.py). It only queues/rejects when a
+    # process has several requests in flight (gthread workers); sync workers
+    # serve one request at a time and never reach the limits.
+    PASSWORD_HASH_OFFLOAD: bool = field(
+        default_factory=lambda: _env_bool("PASSWORD_HASH_OFFLOAD", True)
+    )
+    PASSWORD_HASH_MAX_CONCURRENCY: int = field(
+        default_factory=lambda: _env_int("PASSWORD_HASH_MAX_CONCURRENCY", 2)
+    )
+    PASSWORD_HASH_MAX_QUEUE: int = field(
+        default_factory=lambda: _env_int("PASSWORD_HASH_MAX_QUEUE", 8)
+    )
+    PASSWORD_HASH_WAIT_TIMEOUT: float = field(
+        default_factory=lambda: _env_float("PASSWORD_HASH_WAIT_TIMEOUT", 2.0)
+    )
+    PASSWORD_HASH_RETRY_AFTER: int = field(
+        default_factory=lambda: _env_int("PASSWORD_HASH_RETRY_AFTER", 1)
+    )
+
+    # On-disk Jinja bytecode cache shared by all workers (see templating.py)
+    JINJA_BYTECODE_CACHE: bool = field(
+        default_factory=lambda: _env_bool("JINJA_BYTECODE_CACHE", False)
+    )
+    # Defaults to <instance>/jinja-cache
+    JINJA_BYTECODE_CACHE_DIR: str = field(
+        default_factory=lambda: os.getenv("JINJA_BYTECODE_CACHE_DIR", "")
+    )
+
+    # Warm-up (see warmup.py): at the end of create_app and/or from the gunicorn hook
+    WARMUP_ON_CREATE: bool = field(default_factory=lambda: _env_bool("WARMUP_ON_CREATE", False))
+    WARMUP_DB_CONNECTIONS: int = field(default_factory=lambda: _env_int("WARMUP_DB_CONNECTIONS", 1))
+
+    def __post_init__(self) -> None:
+        if not self.SQLALCHEMY_ENGINE_OPTIONS:
+            object.__setattr__(
+                self, "SQLALCHEMY_ENGINE_OPTIONS", _engine_options(self.SQLALCHEMY_DATABASE_URI)
+            )
 
 
 @dataclass(frozen=True)
 class DevelopmentConfig(BaseConfig):
     DEBUG: bool = True
+    SERVER_TIMING_ENABLED: bool = field(
+        default_factory=lambda: _env_bool("SERVER_TIMING_ENABLED", True)
+    )
+    SQL_STATS_ENABLED: bool = field(default_factory=lambda: _env_bool("SQL_STATS_ENABLED", True))
     SESSION_COOKIE_SECURE: bool = False
     REMEMBER_COOKIE_SECURE: bool = False
 
@@ -102,6 +408,13 @@ class TestingConfig(BaseConfig):
     TESTING: bool = True
     SQLALCHEMY_DATABASE_URI: str = field(default_factory=lambda: _db_url("sqlite:///test.sqlite3"))
     WTF_CSRF_ENABLED: bool = False
+    SQL_STATS_ENABLED: bool = field(default_factory=lambda: _env_bool("SQL_STATS_ENABLED", True))
+    SQL_BUDGET_STRICT: bool = field(default_factory=lambda: _env_bool("SQL_BUDGET_STRICT", True))
+    RATELIMIT_ENABLED: bool = field(default_factory=lambda: _env_bool("RATELIMIT_ENABLED", False))
+    # The test schema comes from db.create_all(), not migrations
+    HEALTH_REQUIRE_MIGRATIONS: bool = field(
+        default_factory=lambda: _env_bool("HEALTH_REQUIRE_MIGRATIONS", False)
+    )
     SESSION_COOKIE_SECURE: bool = False
     REMEMBER_COOKIE_SECURE: bool = False
 
@@ -110,6 +423,7 @@ class TestingConfig(BaseConfig):
 class ProductionConfig(BaseConfig):
     DEBUG: bool = False
     TESTING: bool = False
+    LOG_JSON: bool = field(default_factory=lambda: _env_bool("LOG_JSON", True))
 
 
 _CONFIG_MAP: dict[str, type[BaseConfig]] = {
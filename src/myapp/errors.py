@@ -1,53 +1,286 @@
 from __future__ import annotations
 
-from flask import g, jsonify, render_template, request
-from werkzeug.exceptions import HTTPException
+import hashlib
+import logging
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from flask import Flask, g, jsonify, render_template, request
+from markupsafe import escape
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.exceptions import HTTPException, default_exceptions
+from werkzeug.http import parse_accept_header
+
+# Placeholder rendered in place of the request ID; survives HTML escaping and JSON encoding
+_SLOT = "__request_id_slot__"
+
+# Distinct script roots (mount points) whose HTML error pages are kept rendered
+_MAX_SCRIPT_ROOTS = 16
+
+# Status codes whose default JSON bodies are serialized once at startup
+_PREBUILT_JSON = {
+    code: default_exceptions[code]() for code in (400, 401, 403, 404, 405, 409, 413, 429, 500, 503)
+}
+
+
+@lru_cache(maxsize=512)
+def _accept_prefers_html(accept: str) -> bool:
+    mimetypes = parse_accept_header(accept, MIMEAccept)
+    best = mimetypes.best_match(["text/html", "application/json"], default="application/json")
+    return best == "text/html" and mimetypes["text/html"] >= mimetypes["application/json"]
 
 
 def _wants_html() -> bool:
-    # If the client explicitly prefers HTML over JSON
-    best = request.accept_mimetypes.best_match(
-        ["text/html", "application/json"], default="application/json"
-    )
-    return (
-        best == "text/html"
-        and request.accept_mimetypes["text/html"] >= request.accept_mimetypes["application/json"]
-    )
+    # If the client explicitly prefers HTML over JSON (memoized per distinct Accept header)
+    return _accept_prefers_html(request.headers.get("Accept", ""))
+
+
+@dataclass(frozen=True)
+class _Slotted:
+    """A body rendered once at startup, with a cheap slot for the request ID."""
+
+    head: str
+    tail: str
+
+    def fill(self, value: str) -> str:
+        return f"{self.head}{value}{self.tail}"
+
+
+def _split(body: str, slot: str) -> _Slotted:
+    head, sep, tail = body.partition(slot)
+    if not sep:
+        raise ValueError("request ID slot missing from pre-rendered body")
+    return _Slotted(head, tail)
+
+
+def _prerender_html(app: Flask, script_root: str | None = None) -> dict[int, tuple[_Slotted, str]]:
+    """
+    Render errors/<code>.html once per code: with an ID slot and without an ID.
+    URLs in the pages (static assets) are built for `script_root`, by default the
+    one APPLICATION_ROOT / SERVER_NAME give.
+    """
+    pages = {}
+    overrides = {"SCRIPT_NAME": script_root} if script_root is not None else None
+    with app.test_request_context("/", environ_overrides=overrides):
+        for name in app.jinja_env.list_templates():
+            stem = name.removeprefix("errors/").removesuffix(".html")
+            if not (name.startswith("errors/") and stem.isdigit()):
+                continue
+            pages[int(stem)] = (
+                _split(render_template(name, request_id=_SLOT), _SLOT),
+                render_template(name, request_id=None),
+            )
+    return pages
+
+
+def _prerender_json(app: Flask) -> dict[int | str, _Slotted]:
+    bodies: dict[int | str, _Slotted] = {}
+    with app.test_request_context("/"):
+        payloads: dict[int | str, dict[str, str]] = {
+            code: {"error": exc.name.lower().replace(" ", "_"), "message": exc.description}
+            for code, exc in _PREBUILT_JSON.items()
+        }
+        payloads["unexpected"] = {
+            "error": "internal_server_error",
+            "message": "An unexpected error occurred",
+        }
+        for key, payload in payloads.items():
+            body = jsonify(**payload, request_id=_SLOT).get_data(as_text=True)
+            bodies[key] = _split(body, app.json.dumps(_SLOT))
+    return bodies
+
+
+def extra_headers(e: HTTPException) -> list[tuple[str, str]]:
+    """
+    Headers of `e` an error handler should keep: Retry-After (429/503), Allow (405),
+    WWW-Authenticate (401). Content-Type is dropped, the handler renders its own body.
+    """
+    return [(k, v) for k, v in e.get_headers() if k.lower() != "content-type"]
+
+
+def exception_fingerprint(exc: BaseException, frames: int = 3) -> str:
+    """Stable ID from the exception type plus its innermost frames (no source lookups)."""
+    tb = [
+        (f.f_code.co_filename, lineno, f.f_code.co_name)
+        for f, lineno in traceback.walk_tb(exc.__traceback__)
+    ]
+    parts = [f"{type(exc).__module__}.{type(exc).__qualname__}"]
+    parts += [f"{filename}:{lineno}:{func}" for filename, lineno, func in tb[-frames:]]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:12]
+
+
+@dataclass
+class _Window:
+    started: float
+    exc_type: str
+    count: int = 0
+    suppressed: int = 0
+    request_ids: list[str] = field(default_factory=list)
+
+
+class ExceptionLogLimiter:
+    """
+    Per fingerprint, log the first `burst` exceptions of each `window` with a full
+    traceback and only count the rest. Suppressed counts (plus a few sample
+    request IDs) are reported in one summary line when the window closes.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        *,
+        window: float = 60.0,
+        burst: int = 5,
+        frames: int = 3,
+        sample_ids: int = 5,
+    ) -> None:
+        self.logger = logger
+        self.window = window
+        self.burst = burst
+        self.frames = frames
+        self.sample_ids = sample_ids
+        self.suppressed_total = 0
+        self._windows: dict[str, _Window] = {}
+        self._next_deadline: float | None = None
+        self._lock = threading.Lock()
+
+    def log(self, exc: BaseException, request_id: str | None) -> bool:
+        """Log or count one exception. Returns True if it was logged in full."""
+        fingerprint = exception_fingerprint(exc, self.frames)
+        now = time.monotonic()
+        with self._lock:
+            closed = self._pop_expired(now)
+            win = self._windows.get(fingerprint)
+            if win is None:
+                win = self._windows[fingerprint] = _Window(now, type(exc).__qualname__)
+                self._schedule(now + self.window)
+            win.count += 1
+            full = win.count <= self.burst
+            if not full:
+                win.suppressed += 1
+                self.suppressed_total += 1
+                if request_id and len(win.request_ids) < self.sample_ids:
+                    win.request_ids.append(request_id)
+
+        self._summarize(closed)
+        if full:
+            self.logger.error(
+                "Unhandled exception (request_id=%s, fingerprint=%s)",
+                request_id,
+                fingerprint,
+                exc_info=exc,
+            )
+        return full
+
+    def flush(self, force: bool = False) -> None:
+        """Emit summaries for closed windows (or all windows if force)."""
+        if not force and (self._next_deadline is None or time.monotonic() < self._next_deadline):
+            return
+        with self._lock:
+            closed = self._pop_expired(float("inf") if force else time.monotonic())
+        self._summarize(closed)
+
+    def _schedule(self, deadline: float) -> None:
+        if self._next_deadline is None or deadline < self._next_deadline:
+            self._next_deadline = deadline
+
+    def _pop_expired(self, now: float) -> list[tuple[str, _Window]]:
+        if self._next_deadline is None or now < self._next_deadline:
+            return []
+        closed = [(fp, w) for fp, w in self._windows.items() if now >= w.started + self.window]
+        for fp, _ in closed:
+            del self._windows[fp]
+        self._next_deadline = min(
+            (w.started + self.window for w in self._windows.values()), default=None
+        )
+        return closed
+
+    def _summarize(self, closed: list[tuple[str, _Window]]) -> None:
+        for fingerprint, win in closed:
+            if win.suppressed:
+                self.logger.warning(
+                    "Suppressed %d duplicate %s exceptions in %.0fs "
+                    "(fingerprint=%s, sample request_ids=%s)",
+                    win.suppressed,
+                    win.exc_type,
+                    self.window,
+                    fingerprint,
+                    ",".join(win.request_ids) or "-",
+                )
 
 
 def register_error_handlers(app):
+    with app.test_request_context("/"):
+        default_root = request.script_root
+    # script root -> pages; mounts other than APPLICATION_ROOT are rendered on first use
+    html_by_root = {default_root: _prerender_html(app)}
+    html_pages = html_by_root[default_root]
+    json_bodies = _prerender_json(app)
+
+    limiter = ExceptionLogLimiter(
+        app.logger,
+        window=float(app.config.get("ERROR_LOG_WINDOW", 60.0)),
+        burst=int(app.config.get("ERROR_LOG_BURST", 5)),
+        frames=int(app.config.get("ERROR_LOG_FRAMES", 3)),
+    )
+    app.extensions["exception_log_limiter"] = limiter
+
+    @app.after_request
+    def _flush_exception_summaries(response):
+        # Cheap deadline check; makes summaries appear even after errors stop
+        limiter.flush()
+        return response
+
+    def _pages_for_request():
+        pages = html_by_root.get(request.script_root)
+        if pages is None:
+            pages = _prerender_html(app, request.script_root)
+            if len(html_by_root) < _MAX_SCRIPT_ROOTS:
+                html_by_root[request.script_root] = pages
+        return pages
+
+    def _html(code, request_id):
+        slotted, without_id = _pages_for_request()[code]
+        return slotted.fill(escape(request_id)) if request_id else without_id
+
+    def _json_response(key, request_id, status, headers=None):
+        body = json_bodies[key].fill(app.json.dumps(request_id))
+        return app.response_class(body, status=status, headers=headers, mimetype=app.json.mimetype)
+
     @app.errorhandler(HTTPException)
     def handle_http_exception(e: HTTPException):
         request_id = getattr(g, "request_id", None)
+        headers = extra_headers(e)
 
         if _wants_html():
-            # Render a matching template if present; fallback to 500 template
+            # Pre-rendered page for the code if a template exists; fallback to 500 page
             code = e.code or 500
-            template = f"errors/{code}.html"
-            try:
-                return render_template(template, request_id=request_id), code
-            except Exception:
-                return render_template("errors/500.html", request_id=request_id), 500
+            if code in html_pages:
+                return _html(code, request_id), code, headers
+            return _html(500, request_id), 500
+
+        default = _PREBUILT_JSON.get(e.code)
+        if default is not None and (e.name, e.description) == (default.name, default.description):
+            return _json_response(e.code, request_id, e.code, headers)
 
         payload = {
             "error": e.name.lower().replace(" ", "_"),
             "message": e.description,
             "request_id": request_id,
         }
-        return jsonify(payload), e.code
+        return jsonify(payload), e.code, headers
 
     @app.errorhandler(Exception)
     def handle_unexpected_exception(e: Exception):
         request_id = getattr(g, "request_id", None)
 
-        # Keep logs correlated
-        app.logger.exception("Unhandled exception (request_id=%s)", request_id)
+        # Keep logs correlated; identical tracebacks are rate-limited per fingerprint
+        limiter.log(e, request_id)
 
         if _wants_html():
-            return render_template("errors/500.html", request_id=request_id), 500
+            return _html(500, request_id), 500
 
-        return jsonify(
-            error="internal_server_error",
-            message="An unexpected error occurred",
-            request_id=request_id,
-        ), 500
+        return _json_response("unexpected", request_id, 500)
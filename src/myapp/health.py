@@ -0,0 +1,240 @@
+"""
+Liveness and readiness endpoints.
+
+``/health/live`` only says the process can answer HTTP; use it for restarts
+(Docker HEALTHCHECK). ``/health/ready`` says whether this worker should get
+traffic: database reachable, schema at the migration head, connection pool
+not saturated and (optionally) warm-up finished. Those checks run in a daemon
+thread every HEALTH_CHECK_INTERVAL seconds per worker, and the endpoint only
+reads the last results, so a load balancer probing every worker often adds no
+database load. Results older than three intervals (a stuck probe thread, or
+a probe blocked on a dead database) count as not ready.
+
+``/health`` keeps returning ``{"status": "ok"}`` for existing monitors.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import weakref
+
+from flask import Flask, current_app
+from sqlalchemy import text
+
+from .extensions import db
+from .querystats import query_budget
+
+logger = logging.getLogger("myapp.health")
+
+EXTENSION_KEY = "health"
+
+
+def _check_database(engine) -> dict[str, object]:
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+
+# QueuePool's default when SQLALCHEMY_ENGINE_OPTIONS leaves max_overflow out
+_DEFAULT_MAX_OVERFLOW = 10
+
+
+def _check_pool(engine, threshold: float, max_overflow: int) -> dict[str, object]:
+    pool = engine.pool
+    if not hasattr(pool, "checkedout") or not hasattr(pool, "size"):
+        return {"ok": True, "pool": type(pool).__name__}  # NullPool/StaticPool: nothing to fill
+    if max_overflow < 0:
+        return {"ok": True, "checked_out": pool.checkedout(), "capacity": None}  # unbounded
+    # The pool has no public accessor for max_overflow; it comes from the engine options
+    capacity = pool.size() + max_overflow
+    checked_out = pool.checkedout()
+    saturation = checked_out / capacity if capacity else 0.0
+    return {
+        "ok": saturation < threshold,
+        "checked_out": checked_out,
+        "capacity": capacity,
+        "saturation": round(saturation, 3),
+    }
+
+
+def migration_heads(app: Flask) -> set[str]:
+    """Head revisions of the migration scripts (needs an app context)."""
+    from alembic.script import ScriptDirectory
+
+    config = app.extensions["migrate"].migrate.get_config()
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+
+def _check_migrations(engine, heads: set[str]) -> dict[str, object]:
+    from alembic.runtime.migration import MigrationContext
+
+    with engine.connect() as conn:
+        current = set(MigrationContext.configure(conn).get_current_heads())
+    return {"ok": current == heads, "current": sorted(current), "head": sorted(heads)}
+
+
+class HealthMonitor:
+    def __init__(self, app: Flask, interval: float = 5.0, initial_wait: float = 1.0) -> None:
+        self.app = app
+        self.interval = interval
+        self.initial_wait = initial_wait
+        self.results: dict[str, dict[str, object]] = {}
+        self.checked_at: float | None = None
+        self._heads: set[str] | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._refreshed = threading.Event()
+        self._stop = threading.Event()
+        _monitors.add(self)
+
+    # ----------------------------
+    # Probing (background thread)
+    # ----------------------------
+    def _checks(self):
+        config = self.app.config
+        yield "database", lambda: _check_database(db.engine), True
+        max_overflow = config.get("SQLALCHEMY_ENGINE_OPTIONS", {}).get(
+            "max_overflow", _DEFAULT_MAX_OVERFLOW
+        )
+        yield (
+            "pool",
+            lambda: _check_pool(
+                db.engine, float(config.get("HEALTH_POOL_SATURATION", 1.0)), int(max_overflow)
+            ),
+            True,
+        )
+        yield (
+            "migrations",
+            lambda: _check_migrations(db.engine, self._migration_heads()),
+            bool(config.get("HEALTH_REQUIRE_MIGRATIONS", True)),
+        )
+
+    def _migration_heads(self) -> set[str]:
+        if self._heads is None:
+            self._heads = migration_heads(self.app)
+        return self._heads
+
+    def refresh(self) -> None:
+        results: dict[str, dict[str, object]] = {}
+        with self.app.app_context():
+            for name, check, required in self._checks():
+                try:
+                    result = check()
+                except Exception as e:
+                    # The body is unauthenticated: only the class, the detail (host,
+                    # user, database name...) goes to the log when the check starts failing
+                    result = {"ok": False, "error": type(e).__name__}
+                    if self.results.get(name, {}).get("ok", True):
+                        logger.warning("Readiness check %s failed", name, exc_info=e)
+                results[name] = {**result, "required": required}
+
+        warmup = self.app.extensions.get("warmup") or {}
+        results["warmup"] = {
+            "ok": bool(warmup.get("done")),
+            "duration_ms": warmup.get("duration_ms"),
+            "required": bool(self.app.config.get("HEALTH_REQUIRE_WARMUP", False)),
+        }
+
+        failed = [n for n, r in results.items() if r["required"] and not r["ok"]]
+        previous = [n for n, r in self.results.items() if r["required"] and not r["ok"]]
+        if failed and failed != previous:
+            logger.warning("Readiness checks failing: %s", ", ".join(failed))
+        elif previous and not failed:
+            logger.info("Readiness checks passing again")
+
+        self.results = results
+        self.checked_at = time.time()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception:  # keep probing; stale results turn the worker not ready
+                logger.exception("Health refresh failed")
+            self._refreshed.set()
+            if self._stop.wait(self.interval):
+                return
+
+    def ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="myapp-health", daemon=True)
+                self._thread.start()
+
+    def reset_after_fork(self) -> None:
+        # Results describe the parent's pool; the probe thread does not exist in the child
+        self.results = {}
+        self.checked_at = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._refreshed = threading.Event()
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # ----------------------------
+    # Reading (request path)
+    # ----------------------------
+    def report(self) -> tuple[bool, dict[str, object]]:
+        self.ensure_started()
+        if self.checked_at is None:
+            self._refreshed.wait(self.initial_wait)
+        if self.checked_at is None:
+            return False, {"status": "starting", "checks": {}}
+
+        age = time.time() - self.checked_at
+        results = self.results
+        ready = all(r["ok"] for r in results.values() if r["required"])
+        stale = age > 3 * self.interval
+        status = "stale" if stale else ("ready" if ready else "not_ready")
+        return ready and not stale, {
+            "status": status,
+            "checked_s_ago": round(age, 3),
+            "checks": results,
+        }
+
+
+_monitors: weakref.WeakSet[HealthMonitor] = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for monitor in list(_monitors):
+        monitor.reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def get_health_monitor() -> HealthMonitor:
+    return current_app.extensions[EXTENSION_KEY]
+
+
+def register_health(app: Flask) -> HealthMonitor:
+    monitor = HealthMonitor(app, interval=float(app.config.get("HEALTH_CHECK_INTERVAL", 5.0)))
+    app.extensions[EXTENSION_KEY] = monitor
+
+    @app.get("/health")
+    @query_budget(0)
+    def health():
+        return {"status": "ok"}
+
+    @app.get("/health/live")
+    @query_budget(0)
+    def health_live():
+        return {"status": "ok"}
+
+    @app.get("/health/ready")
+    @query_budget(0)
+    def health_ready():
+        ready, body = monitor.report()
+        return body, 200 if ready else 503
+
+    return monitor
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+from flask import Flask, g, has_request_context, request
+from flask.logging import default_handler
+
+ACCESS_LOGGER = "myapp.access"
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and is emitted as-is
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+_CONTEXT_ATTRS = ("request_id", "endpoint", "latency_ms")
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach request ID, endpoint and elapsed time. Runs on the calling thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if has_request_context():
+            started = g.get("request_started")
+            record.request_id = g.get("request_id")
+            record.endpoint = request.endpoint
+            record.latency_ms = (
+                round((time.perf_counter() - started) * 1000, 2) if started else None
+            )
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of records below WARNING for the configured loggers
+    (longest matching logger-name prefix wins). Warnings and errors always pass.
+    """
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        super().__init__()
+        self.rates = dict(sorted(rates.items(), key=lambda kv: len(kv[0]), reverse=True))
+
+    def rate_for(self, name: str) -> float:
+        for prefix, rate in self.rates.items():
+            if name == prefix or name.startswith(prefix + "."):
+                return rate
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data: dict[str, object] = {
+            "ts": datetime.fromtimestamp(record.created, UTC).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+        }
+        for attr in _CONTEXT_ATTRS:
+            value = getattr(record, attr, None)
+            if value is not None:
+                data[attr] = value
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in _CONTEXT_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(data, default=str)
+
+
+class _ContextQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Interpolate args now (they may change after the call) but leave traceback
+        # formatting and JSON encoding to the listener thread.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class _LogPipeline:
+    """Owns the QueueHandler/QueueListener pair and rebuilds it after fork()."""
+
+    def __init__(self, handlers: list[logging.Handler], filters: list[logging.Filter]) -> None:
+        self.handlers = handlers
+        self.queue_handler = _ContextQueueHandler(queue.SimpleQueue())
+        for f in filters:
+            self.queue_handler.addFilter(f)
+        self.listener: QueueListener | None = None
+
+    def start(self) -> None:
+        self.listener = QueueListener(
+            self.queue_handler.queue, *self.handlers, respect_handler_level=True
+        )
+        self.listener.start()
+
+    def stop(self) -> None:
+        if self.listener is not None:
+            self.listener.stop()  # drains the queue
+            self.listener = None
+
+    def after_fork_in_child(self) -> None:
+        # The listener thread does not exist in the child; start a fresh one on a new queue
+        self.listener = None
+        self.queue_handler.queue = queue.SimpleQueue()
+        self.start()
+
+
+_pipeline: _LogPipeline | None = None
+
+
+def _after_fork_in_child() -> None:
+    if _pipeline is not None:
+        _pipeline.after_fork_in_child()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+@atexit.register
+def shutdown_logging() -> None:
+    global _pipeline
+    if _pipeline is not None:
+        logging.getLogger().removeHandler(_pipeline.queue_handler)
+        _pipeline.stop()
+        _pipeline = None
+
+
+def _build_handlers(app: Flask) -> list[logging.Handler]:
+    formatter = JsonFormatter()
+    handlers: list[logging.Handler] = [logging.StreamHandler(sys.stderr)]
+    if app.config.get("LOG_FILE"):
+        handlers.append(WatchedFileHandler(app.config["LOG_FILE"], encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def configure_logging(app: Flask) -> None:
+    """
+    Route all logging through a queue so stream/file I/O happens on a background
+    listener thread, with JSON records carrying request context.
+    """
+    global _pipeline
+    if not app.config.get("LOG_JSON", False):
+        return
+
+    shutdown_logging()  # idempotent across create_app() calls
+
+    rates = {name: float(rate) for name, rate in app.config.get("LOG_SAMPLING", {}).items()}
+    _pipeline = _LogPipeline(_build_handlers(app), [SamplingFilter(rates), RequestContextFilter()])
+    _pipeline.start()
+
+    root = logging.getLogger()
+    root.addHandler(_pipeline.queue_handler)
+    root.setLevel(app.config.get("LOG_LEVEL", "INFO"))
+    app.logger.removeHandler(default_handler)
+    app.logger.setLevel(app.config.get("LOG_LEVEL", "INFO"))
+    for name, level in app.config.get("LOG_LEVELS", {}).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    if app.config.get("LOG_ACCESS", False):
+        access = logging.getLogger(ACCESS_LOGGER)
+
+        @app.after_request
+        def _log_access(response):
+            if access.isEnabledFor(logging.INFO):
+                access.info(
+                    "%s %s %s",
+                    request.method,
+                    request.path,
+                    response.status_code,
+                    extra={"status": response.status_code, "method": request.method},
+                )
+            return response
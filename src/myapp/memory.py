@@ -0,0 +1,163 @@
+"""
+Memory introspection for the current worker: tracemalloc snapshots, top
+allocation sites, snapshot diffs, ORM identity-map sizes and gc counters.
+
+All state is per process. With several gunicorn workers the admin pages show
+the pid of the worker that answered, so compare snapshots from the same pid.
+"""
+
+from __future__ import annotations
+
+import gc
+import os
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from flask import Flask, current_app
+from sqlalchemy.orm import Session
+
+EXTENSION_KEY = "memory"
+GROUPINGS = ("lineno", "filename")
+
+# tracemalloc's own bookkeeping and the import machinery are never interesting here
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class SnapshotError(LookupError):
+    pass
+
+
+class MemoryInspector:
+    def __init__(self, frames: int = 1, max_snapshots: int = 10) -> None:
+        self.frames = frames
+        self.max_snapshots = max_snapshots
+        self._snapshots: OrderedDict[str, tuple[float, tracemalloc.Snapshot]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self) -> None:
+        # Snapshots stay available; tracing overhead and its memory go away
+        tracemalloc.stop()
+
+    def snapshot(self, name: str | None = None) -> str:
+        if not tracemalloc.is_tracing():
+            raise SnapshotError("tracemalloc is not running")
+        snap = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+        name = name or time.strftime("%H:%M:%S")
+        with self._lock:
+            self._snapshots.pop(name, None)
+            self._snapshots[name] = (time.time(), snap)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return name
+
+    def snapshots(self) -> list[dict[str, object]]:
+        with self._lock:
+            items = list(self._snapshots.items())
+        return [
+            {
+                "name": name,
+                "taken_at": taken_at,
+                "size_kib": round(sum(t.size for t in snap.traces) / 1024, 1),
+            }
+            for name, (taken_at, snap) in items
+        ]
+
+    def _get(self, name: str) -> tracemalloc.Snapshot:
+        with self._lock:
+            try:
+                return self._snapshots[name][1]
+            except KeyError:
+                raise SnapshotError(f"Unknown snapshot {name!r}") from None
+
+    def top(self, name: str, *, group: str = "lineno", limit: int = 25) -> list[dict]:
+        stats = self._get(name).statistics(_grouping(group))
+        return [
+            {
+                "where": _where(stat.traceback, group),
+                "size_kib": round(stat.size / 1024, 1),
+                "count": stat.count,
+            }
+            for stat in stats[:limit]
+        ]
+
+    def diff(self, old: str, new: str, *, group: str = "lineno", limit: int = 25) -> list[dict]:
+        stats = self._get(new).compare_to(self._get(old), _grouping(group))
+        return [
+            {
+                "where": _where(stat.traceback, group),
+                "size_diff_kib": round(stat.size_diff / 1024, 1),
+                "count_diff": stat.count_diff,
+                "size_kib": round(stat.size / 1024, 1),
+            }
+            for stat in stats[:limit]
+        ]
+
+
+def _grouping(group: str) -> str:
+    if group not in GROUPINGS:
+        raise ValueError(f"Unknown grouping {group!r}. Use one of: {', '.join(GROUPINGS)}")
+    return group
+
+
+def _where(traceback: tracemalloc.Traceback, group: str) -> str:
+    frame = traceback[0]
+    return frame.filename if group == "filename" else f"{frame.filename}:{frame.lineno}"
+
+
+def _rss_kib() -> int | None:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return None
+
+
+def process_stats() -> dict[str, object]:
+    """gc counters plus identity-map sizes of every live ORM session in this process."""
+    sessions = [obj for obj in gc.get_objects() if isinstance(obj, Session)]
+    identity_maps = sorted((len(s.identity_map) for s in sessions), reverse=True)
+    traced = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else None
+    return {
+        "pid": os.getpid(),
+        "rss_kib": _rss_kib(),
+        "gc_counts": list(gc.get_count()),
+        "gc_thresholds": list(gc.get_threshold()),
+        "gc_collections": [s["collections"] for s in gc.get_stats()],
+        "gc_uncollectable": len(gc.garbage),
+        "sessions": len(sessions),
+        "identity_map_sizes": identity_maps,
+        "identity_map_total": sum(identity_maps),
+        "tracing": traced is not None,
+        "traced_kib": round(traced[0] / 1024, 1) if traced else None,
+        "traced_peak_kib": round(traced[1] / 1024, 1) if traced else None,
+    }
+
+
+def get_memory_inspector() -> MemoryInspector | None:
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def init_memory_inspector(app: Flask) -> MemoryInspector | None:
+    if not app.config.get("MEMORY_INSPECTOR_ENABLED", True):
+        return None
+    inspector = MemoryInspector(
+        frames=int(app.config.get("MEMORY_TRACE_FRAMES", 1)),
+        max_snapshots=int(app.config.get("MEMORY_MAX_SNAPSHOTS", 10)),
+    )
+    app.extensions[EXTENSION_KEY] = inspector
+    return inspector
@@ -0,0 +1,516 @@
+"""
+Prometheus text-format metrics that aggregate across gunicorn workers.
+
+Each process writes its samples into its own memory-mapped file in METRICS_DIR
+(``values_<pid>.db`` for counters/histograms, ``live_<pid>.db`` for gauges), so
+recording a sample is a dict lookup plus an 8-byte write, with no IPC. The
+/metrics view merges all files: counters and histograms of exited workers keep
+counting, gauges of exited workers are removed by the ``child_exit`` hook in
+docker/gunicorn.conf.py. Without METRICS_DIR samples stay in process memory.
+"""
+
+from __future__ import annotations
+
+import glob
+import hmac
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Iterable
+from functools import lru_cache
+
+from flask import Flask, Response, abort, current_app, g, request
+from sqlalchemy import event
+
+from .extensions import db
+
+logger = logging.getLogger("myapp.metrics")
+
+EXTENSION_KEY = "metrics"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONNECT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+# family -> (type, help)
+FAMILIES: dict[str, tuple[str, str]] = {
+    "myapp_http_requests_total": ("counter", "HTTP requests by method, endpoint and status."),
+    "myapp_http_request_duration_seconds": ("histogram", "Request latency by endpoint."),
+    "myapp_http_requests_in_flight": ("gauge", "Requests currently being handled."),
+    "myapp_db_pool_checkouts_total": ("counter", "Connections checked out of the pool."),
+    "myapp_db_connect_seconds": ("histogram", "Time spent opening new database connections."),
+    "myapp_db_pool_checked_out": ("gauge", "Connections currently checked out."),
+    "myapp_db_pool_overflow": ("gauge", "Overflow connections currently open."),
+    "myapp_db_pool_size": ("gauge", "Configured pool size."),
+    "myapp_user_cache_hits": ("gauge", "User loader cache hits since worker start."),
+    "myapp_user_cache_misses": ("gauge", "User loader cache misses since worker start."),
+    "myapp_user_cache_evictions": ("gauge", "User loader cache LRU evictions since worker start."),
+    "myapp_user_cache_size": ("gauge", "Users currently cached."),
+    "myapp_cache_hits": ("gauge", "Application cache hits since worker start."),
+    "myapp_cache_misses": ("gauge", "Application cache misses since worker start."),
+    "myapp_cache_coalesced": (
+        "gauge",
+        "Cache misses answered by a concurrent computation of the same key.",
+    ),
+    "myapp_cache_errors": ("gauge", "Cache backend errors since worker start."),
+    "myapp_password_hash_seconds": ("histogram", "Password hash/verify latency incl. queueing."),
+    "myapp_password_hash_rejections_total": (
+        "counter",
+        "Password hash/verify calls rejected because the hashing pool was saturated.",
+    ),
+    "myapp_oauth_circuit_open": (
+        "gauge",
+        "1 while the circuit breaker for an OAuth provider is open (or half-open).",
+    ),
+    "myapp_ratelimit_rejections_total": (
+        "counter",
+        "Requests rejected with 429 by scope (login, register) and limit kind (ip, email).",
+    ),
+}
+
+# histogram family -> upper bounds (+Inf is implicit)
+BUCKETS: dict[str, tuple[float, ...]] = {
+    "myapp_http_request_duration_seconds": DEFAULT_BUCKETS,
+    "myapp_db_connect_seconds": CONNECT_BUCKETS,
+    "myapp_password_hash_seconds": (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+}
+
+Labels = tuple[tuple[str, str], ...]
+
+
+@lru_cache(maxsize=4096)
+def _key(family: str, sample: str, labels: Labels) -> str:
+    return json.dumps([family, sample, labels])
+
+
+# ----------------------------
+# Storage
+# ----------------------------
+_HEADER = struct.Struct("<I4x")  # bytes used
+_KEYLEN = struct.Struct("<I")
+_VALUE = struct.Struct("<d")
+_INITIAL_SIZE = 64 * 1024
+
+
+class DictStore:
+    """Process-local storage (no METRICS_DIR)."""
+
+    def __init__(self) -> None:
+        self._values: dict[str, float] = {}
+
+    def add(self, key: str, amount: float) -> None:
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, key: str, value: float) -> None:
+        self._values[key] = value
+
+    def items(self) -> Iterable[tuple[str, float]]:
+        return list(self._values.items())
+
+    def close(self) -> None:
+        pass
+
+
+class MmapStore:
+    """
+    Append-only key/value file: a header with the used size, then entries of
+    (key length, utf-8 key padded to 8 bytes, float64 value). Only the owning
+    process writes; the value is written before the header moves, so readers
+    never see a half-written entry.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._positions: dict[str, int] = {}
+        self._file = open(path, "a+b")
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(_INITIAL_SIZE)
+        self._capacity = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._used = _HEADER.unpack_from(self._map, 0)[0] or _HEADER.size
+        for key, _, pos in _read_entries(self._map, self._used):
+            self._positions[key] = pos
+
+    def add(self, key: str, amount: float) -> None:
+        pos = self._positions.get(key)
+        if pos is None:
+            pos = self._append(key)
+        _VALUE.pack_into(self._map, pos, _VALUE.unpack_from(self._map, pos)[0] + amount)
+
+    def set(self, key: str, value: float) -> None:
+        pos = self._positions.get(key)
+        if pos is None:
+            pos = self._append(key)
+        _VALUE.pack_into(self._map, pos, value)
+
+    def items(self) -> Iterable[tuple[str, float]]:
+        return [(key, value) for key, value, _ in _read_entries(self._map, self._used)]
+
+    def _append(self, key: str) -> int:
+        encoded = key.encode()
+        padded = len(encoded) + (-(_KEYLEN.size + len(encoded)) % 8)
+        entry_size = _KEYLEN.size + padded + _VALUE.size
+        if self._used + entry_size > self._capacity:
+            self._grow(self._used + entry_size)
+        start = self._used
+        _KEYLEN.pack_into(self._map, start, len(encoded))
+        self._map[start + _KEYLEN.size : start + _KEYLEN.size + len(encoded)] = encoded
+        pos = start + _KEYLEN.size + padded
+        _VALUE.pack_into(self._map, pos, 0.0)
+        self._used += entry_size
+        _HEADER.pack_into(self._map, 0, self._used)
+        self._positions[key] = pos
+        return pos
+
+    def _grow(self, needed: int) -> None:
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        self._map.close()
+        self._file.truncate(capacity)
+        self._capacity = capacity
+        self._map = mmap.mmap(self._file.fileno(), capacity)
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+
+def _read_entries(buf, used: int) -> Iterable[tuple[str, float, int]]:
+    pos = _HEADER.size
+    while pos < used:
+        (length,) = _KEYLEN.unpack_from(buf, pos)
+        key = bytes(buf[pos + _KEYLEN.size : pos + _KEYLEN.size + length]).decode()
+        value_pos = pos + _KEYLEN.size + length + (-(_KEYLEN.size + length) % 8)
+        yield key, _VALUE.unpack_from(buf, value_pos)[0], value_pos
+        pos = value_pos + _VALUE.size
+
+
+def read_file(path: str) -> list[tuple[str, float]]:
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        return []
+    used = _HEADER.unpack_from(data, 0)[0]
+    return [(key, value) for key, value, _ in _read_entries(data, min(used, len(data)))]
+
+
+def mark_process_dead(pid: int, directory: str | None = None) -> None:
+    """Drop the gauges of an exited worker (counters/histograms are kept)."""
+    directory = directory or os.getenv("METRICS_DIR", "")
+    if directory:
+        try:
+            os.remove(os.path.join(directory, f"live_{pid}.db"))
+        except FileNotFoundError:
+            pass
+
+
+def clear_directory(directory: str) -> None:
+    """Remove samples left by a previous server run (call from the master)."""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.db")):
+        os.remove(path)
+
+
+# ----------------------------
+# Registry
+# ----------------------------
+class Metrics:
+    """Records samples for the current process and merges all processes on collect()."""
+
+    def __init__(self, directory: str | None = None) -> None:
+        self.directory = directory or None
+        self._lock = threading.Lock()
+        self._values = None
+        self._live = None
+        _instances.add(self)
+
+    def _stores(self):
+        if self._values is None:
+            self._open()
+        return self._values, self._live
+
+    def _open(self) -> None:
+        if self.directory:
+            pid = os.getpid()
+            os.makedirs(self.directory, exist_ok=True)
+            self._values = MmapStore(os.path.join(self.directory, f"values_{pid}.db"))
+            self._live = MmapStore(os.path.join(self.directory, f"live_{pid}.db"))
+        else:
+            self._values, self._live = DictStore(), DictStore()
+
+    def reset_after_fork(self) -> None:
+        # Inherited maps point at the parent's files; the child opens its own lazily
+        self._lock = threading.Lock()
+        self._values = self._live = None
+
+    def inc(self, family: str, labels: Labels = (), amount: float = 1.0) -> None:
+        with self._lock:
+            values, _ = self._stores()
+            values.add(_key(family, family, labels), amount)
+
+    def observe(self, family: str, value: float, labels: Labels = ()) -> None:
+        # Only the matching bucket is incremented; buckets are made cumulative in render()
+        buckets = BUCKETS.get(family, DEFAULT_BUCKETS)
+        index = bisect_left(buckets, value)
+        le = str(buckets[index]) if index < len(buckets) else "+Inf"
+        with self._lock:
+            values, _ = self._stores()
+            values.add(_key(family, family + "_bucket", labels + (("le", le),)), 1.0)
+            values.add(_key(family, family + "_sum", labels), value)
+            values.add(_key(family, family + "_count", labels), 1.0)
+
+    def set_gauge(self, family: str, value: float, labels: Labels = ()) -> None:
+        with self._lock:
+            _, live = self._stores()
+            live.set(_key(family, family, labels), value)
+
+    def add_gauge(self, family: str, amount: float, labels: Labels = ()) -> None:
+        with self._lock:
+            _, live = self._stores()
+            live.add(_key(family, family, labels), amount)
+
+    def collect(self) -> dict[str, float]:
+        totals: dict[str, float] = defaultdict(float)
+        if self.directory:
+            with self._lock:
+                self._stores()  # make sure this process' files exist
+            for path in glob.glob(os.path.join(self.directory, "*.db")):
+                try:
+                    samples = read_file(path)
+                except FileNotFoundError:  # worker exited while we were listing
+                    continue
+                for key, value in samples:
+                    totals[key] += value
+        else:
+            with self._lock:
+                for store in self._stores():
+                    for key, value in store.items():
+                        totals[key] += value
+        return totals
+
+
+_instances: weakref.WeakSet[Metrics] = weakref.WeakSet()
+# One writer per file: apps created in the same process share the directory's Metrics
+_by_directory: dict[str, Metrics] = {}
+
+
+def metrics_for(directory: str | None) -> Metrics:
+    if not directory:
+        return Metrics()
+    if directory not in _by_directory:
+        _by_directory[directory] = Metrics(directory)
+    return _by_directory[directory]
+
+
+def _after_fork_in_child() -> None:
+    for metrics in list(_instances):
+        metrics.reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value) if value != int(value) else f"{int(value)}.0"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Iterable[tuple[str, str]]) -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in labels]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _histogram_samples(family: str, samples: list[tuple[str, Labels, float]]):
+    """Emit every bucket of every series, cumulative and in bound order."""
+    per_bucket: dict[Labels, dict[str, float]] = defaultdict(dict)
+    totals = []
+    for sample, labels, value in samples:
+        if sample == family + "_bucket":
+            rest = tuple(kv for kv in labels if kv[0] != "le")
+            per_bucket[rest][dict(labels)["le"]] = value
+        else:
+            totals.append((sample, labels, value))
+
+    bounds = [str(b) for b in BUCKETS.get(family, DEFAULT_BUCKETS)] + ["+Inf"]
+    out = []
+    for rest in sorted(per_bucket):
+        running = 0.0
+        for le in bounds:
+            running += per_bucket[rest].get(le, 0.0)
+            out.append((family + "_bucket", rest + (("le", le),), running))
+    return out + sorted(totals)
+
+
+def render(totals: dict[str, float]) -> str:
+    families: dict[str, list[tuple[str, Labels, float]]] = defaultdict(list)
+    for key, value in totals.items():
+        family, sample, labels = json.loads(key)
+        families[family].append((sample, tuple(tuple(kv) for kv in labels), value))
+
+    lines = []
+    for family in sorted(families):
+        kind, help_text = FAMILIES.get(family, ("untyped", ""))
+        if kind == "histogram":
+            samples = _histogram_samples(family, families[family])
+        else:
+            samples = sorted(families[family])
+        lines.append(f"# HELP {family} {help_text}")
+        lines.append(f"# TYPE {family} {kind}")
+        for sample, labels, value in samples:
+            lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------
+# Flask / SQLAlchemy integration
+# ----------------------------
+def get_metrics() -> Metrics | None:
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def _bind_label(bind_key: str | None) -> Labels:
+    return (("bind", bind_key or "default"),)
+
+
+def _instrument_engine(metrics: Metrics, engine, bind_key: str | None) -> None:
+    labels = _bind_label(bind_key)
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.inc("myapp_db_pool_checkouts_total", labels)
+
+    # A new DBAPI connection is opened between the dialect's do_connect and the
+    # pool's connect event; both are registered on the engine, so they carry over
+    # to the pool engine.dispose() creates.
+    opening = threading.local()
+
+    @event.listens_for(engine, "do_connect")
+    def _on_do_connect(dialect, conn_rec, cargs, cparams):
+        opening.started = time.perf_counter()
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        started = getattr(opening, "started", None)
+        if started is not None:
+            opening.started = None
+            metrics.observe("myapp_db_connect_seconds", time.perf_counter() - started, labels)
+
+
+def sync_collectors(app: Flask, metrics: Metrics) -> None:
+    """Copy pool, cache and circuit breaker state of this process into its gauges."""
+    for bind_key, engine in db.engines.items():
+        pool = engine.pool
+        labels = _bind_label(bind_key)
+        for family, getter in (
+            ("myapp_db_pool_checked_out", "checkedout"),
+            ("myapp_db_pool_overflow", "overflow"),
+            ("myapp_db_pool_size", "size"),
+        ):
+            if hasattr(pool, getter):
+                metrics.set_gauge(family, getattr(pool, getter)(), labels)
+
+    cache = app.extensions.get("user_cache")
+    if cache is not None:
+        stats = cache.stats()
+        for name in ("hits", "misses", "evictions", "size"):
+            metrics.set_gauge(f"myapp_user_cache_{name}", stats[name])
+
+    app_cache = app.extensions.get("cache")
+    if app_cache is not None:
+        stats = app_cache.stats()
+        for name in ("hits", "misses", "coalesced", "errors"):
+            metrics.set_gauge(f"myapp_cache_{name}", stats[name])
+
+    outbound = app.extensions.get("oauth_http")
+    if outbound is not None:
+        for provider, breaker in list(outbound.breakers.items()):
+            metrics.set_gauge(
+                "myapp_oauth_circuit_open",
+                int(breaker.state != "closed"),
+                (("provider", provider),),
+            )
+
+
+def register_metrics(app: Flask) -> Metrics | None:
+    if not app.config.get("METRICS_ENABLED", True):
+        return None
+
+    metrics = metrics_for(app.config.get("METRICS_DIR"))
+    app.extensions[EXTENSION_KEY] = metrics
+    sync_interval = float(app.config.get("METRICS_SYNC_INTERVAL", 1.0))
+    next_sync = [0.0]
+
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            _instrument_engine(metrics, engine, bind_key)
+
+    @app.before_request
+    def _metrics_start():
+        metrics.add_gauge("myapp_http_requests_in_flight", 1)
+        g.metrics_in_flight = True
+
+    @app.after_request
+    def _metrics_record(response):
+        started = g.get("request_started")
+        endpoint = request.url_rule.endpoint if request.url_rule else "unmatched"
+        metrics.inc(
+            "myapp_http_requests_total",
+            (
+                ("method", request.method),
+                ("endpoint", endpoint),
+                ("status", str(response.status_code)),
+            ),
+        )
+        if started is not None:
+            metrics.observe(
+                "myapp_http_request_duration_seconds",
+                time.perf_counter() - started,
+                (("endpoint", endpoint),),
+            )
+
+        now = time.monotonic()
+        if now >= next_sync[0]:
+            next_sync[0] = now + sync_interval
+            sync_collectors(app, metrics)
+        return response
+
+    @app.teardown_request
+    def _metrics_finish(exc):
+        if g.pop("metrics_in_flight", False):
+            metrics.add_gauge("myapp_http_requests_in_flight", -1)
+
+    token = app.config.get("METRICS_TOKEN")
+    if not token and not (app.debug or app.testing):
+        logger.warning("METRICS_TOKEN is not set, /metrics answers 404 outside debug/testing")
+
+    @app.get("/metrics")
+    def metrics_view():
+        # Pool, cache and auth counters are not for the public: a token is required
+        # unless the app runs in debug or testing mode
+        supplied = request.headers.get("Authorization", "")
+        if token:
+            if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+                abort(404)
+        elif not (app.debug or app.testing):
+            abort(404)
+        sync_collectors(app, metrics)
+        return Response(render(metrics.collect()), mimetype="text/plain; version=0.0.4")
+
+    return metrics
@@ -1,4 +1,5 @@
 from .auth_identity import AuthIdentity
+from .revoked_token import RevokedToken
 from .user import User
 
-__all__ = ["User", "AuthIdentity"]
+__all__ = ["User", "AuthIdentity", "RevokedToken"]
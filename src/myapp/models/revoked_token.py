@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from ..extensions import db
+
+
+class RevokedToken(db.Model):
+    """Deny-list for API bearer tokens; rows are only needed until the token expires."""
+
+    __tablename__ = "revoked_tokens"
+
+    jti = db.Column(db.String(64), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
@@ -3,9 +3,10 @@ from __future__ import annotations
 from datetime import datetime
 
 from flask_login import UserMixin
-from werkzeug.security import check_password_hash, generate_password_hash
 
+from ..auth.hashing import hash_password, rehash_if_needed, verify_password
 from ..extensions import db
+from ..timing import span
 
 
 class User(db.Model, UserMixin):
@@ -24,9 +25,20 @@ class User(db.Model, UserMixin):
     created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
 
     def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password)
+        with span("hash"):
+            self.password_hash = hash_password(password)
 
     def check_password(self, password: str) -> bool:
+        """
+        Verify `password`. On success a hash made with other parameters than
+        PASSWORD_HASH_METHOD is replaced in place; the caller commits.
+        """
         if not self.password_hash:
             return False
-        return check_password_hash(self.password_hash, password)
+        with span("hash"):
+            if not verify_password(self.password_hash, password):
+                return False
+            upgraded = rehash_if_needed(self.password_hash, password)
+        if upgraded is not None:
+            self.password_hash = upgraded
+        return True
@@ -0,0 +1,266 @@
+"""
+On-demand profiling of live requests.
+
+A request is profiled when an admin adds ``?_profile=1`` (``=cprofile`` for a
+deterministic profile) or when it carries an ``X-Profile`` header with a token
+from ``flask profile-token`` (for clients without an admin session). The
+default sampler is a background thread that reads ``sys._current_frames()``
+every PROFILE_INTERVAL seconds, so the profiled request itself runs at full
+speed. A sampling window covers all threads of one worker for a few seconds.
+
+Results go to PROFILE_DIR (default <instance>/profiles) as collapsed stacks
+(``*.collapsed``, input for flamegraph.pl / speedscope) or pstats
+(``*.pstats``) and are listed under /admin/profiles/.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import logging
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import UTC, datetime
+from functools import lru_cache
+
+from flask import Flask, current_app, g, request
+from flask_login import current_user
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+logger = logging.getLogger("myapp.profiling")
+
+EXTENSION_KEY = "profiling"
+QUERY_FLAG = "_profile"
+HEADER = "X-Profile"
+RESPONSE_HEADER = "X-Profile-File"
+MODES = ("sample", "cprofile")
+
+_SALT = "myapp.profile"
+_SAFE_NAME = re.compile(r"^[\w.-]+\.(collapsed|pstats)$")
+
+
+@lru_cache(maxsize=8192)
+def _frame_label(code) -> str:
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_qualname}"
+
+
+def collapse(frame) -> str:
+    """Root-to-leaf "a;b;c" stack, the collapsed-stack format used by flame graph tools."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Samples the stacks of some (or all other) threads from a daemon thread."""
+
+    def __init__(self, interval: float = 0.005, thread_ids: set[int] | None = None) -> None:
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> StackSampler:
+        self._thread = threading.Thread(target=self._run, name="myapp-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                if self.thread_ids is not None and thread_id not in self.thread_ids:
+                    continue
+                self.stacks[collapse(frame)] += 1
+                self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# ----------------------------
+# Files
+# ----------------------------
+def profile_dir(app: Flask) -> str:
+    return app.config.get("PROFILE_DIR") or os.path.join(app.instance_path, "profiles")
+
+
+def _new_path(app: Flask, label: str, mode: str) -> str:
+    directory = profile_dir(app)
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%S%f")
+    label = re.sub(r"[^\w.-]+", "-", label).strip(".-") or "request"
+    ext = "pstats" if mode == "cprofile" else "collapsed"
+    return os.path.join(directory, f"{stamp}-{os.getpid()}-{label}.{ext}")
+
+
+def _prune(app: Flask) -> None:
+    keep = int(app.config.get("PROFILE_KEEP", 50))
+    files = list_profiles(app)
+    for entry in files[keep:]:
+        try:
+            os.remove(os.path.join(profile_dir(app), entry["name"]))
+        except FileNotFoundError:
+            pass
+
+
+def list_profiles(app: Flask) -> list[dict[str, object]]:
+    """Profile files, newest first."""
+    directory = profile_dir(app)
+    try:
+        names = [n for n in os.listdir(directory) if _SAFE_NAME.match(n)]
+    except FileNotFoundError:
+        return []
+    entries = []
+    for name in names:
+        st = os.stat(os.path.join(directory, name))
+        entries.append({"name": name, "size": st.st_size, "mtime": st.st_mtime})
+    return sorted(entries, key=lambda e: e["name"], reverse=True)
+
+
+def is_profile_name(name: str) -> bool:
+    return bool(_SAFE_NAME.match(name))
+
+
+# ----------------------------
+# Triggers
+# ----------------------------
+def _serializer(app: Flask) -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(app.config["SECRET_KEY"], salt=_SALT)
+
+
+def make_profile_token(app: Flask, mode: str = "sample") -> str:
+    if mode not in MODES:
+        raise ValueError(f"Unknown profile mode {mode!r}. Use one of: {', '.join(MODES)}")
+    return _serializer(app).dumps({"mode": mode})
+
+
+def requested_mode() -> str | None:
+    """Profiling mode asked for by this request, if the caller is allowed to ask."""
+    token = request.headers.get(HEADER)
+    if token:
+        max_age = int(current_app.config.get("PROFILE_TOKEN_MAX_AGE", 900))
+        try:
+            mode = _serializer(current_app).loads(token, max_age=max_age).get("mode")
+        except BadSignature:
+            return None
+        return mode if mode in MODES else None
+
+    flag = request.args.get(QUERY_FLAG)
+    if not flag:
+        return None
+    if not (current_user.is_authenticated and getattr(current_user, "is_admin", False)):
+        return None
+    return "cprofile" if flag == "cprofile" else "sample"
+
+
+# ----------------------------
+# Worker-wide window
+# ----------------------------
+class WindowProfiler:
+    """At most one sampling window per worker; the file is written when it ends."""
+
+    def __init__(self, app: Flask) -> None:
+        self.app = app
+        self._lock = threading.Lock()
+        self.running: str | None = None
+
+    def start(self, seconds: float) -> str | None:
+        """Start a window; returns the file name, or None if one is already running."""
+        seconds = min(seconds, float(self.app.config.get("PROFILE_MAX_WINDOW", 60)))
+        with self._lock:
+            if self.running is not None:
+                return None
+            path = _new_path(self.app, "window", "sample")
+            self.running = os.path.basename(path)
+
+        sampler = StackSampler(float(self.app.config.get("PROFILE_INTERVAL", 0.005))).start()
+        timer = threading.Timer(seconds, self._finish, args=(sampler, path))
+        timer.daemon = True
+        timer.start()
+        return self.running
+
+    def _finish(self, sampler: StackSampler, path: str) -> None:
+        sampler.stop()
+        try:
+            _write(path, sampler.collapsed())
+            _prune(self.app)
+        finally:
+            with self._lock:
+                self.running = None
+
+
+def _write(path: str, text: str) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def get_window_profiler() -> WindowProfiler | None:
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def register_profiling(app: Flask) -> None:
+    if not app.config.get("PROFILING_ENABLED", True):
+        return
+
+    app.extensions[EXTENSION_KEY] = WindowProfiler(app)
+    interval = float(app.config.get("PROFILE_INTERVAL", 0.005))
+
+    @app.before_request
+    def _start_profile():
+        if QUERY_FLAG not in request.args and HEADER not in request.headers:
+            return
+        mode = requested_mode()
+        if mode is None:
+            return
+
+        g.profile_path = _new_path(app, request.endpoint or "unmatched", mode)
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # another profiler is active in this thread
+                logger.warning("cProfile unavailable, falling back to sampling")
+                g.profile_path = _new_path(app, request.endpoint or "unmatched", "sample")
+            else:
+                g.profiler = profiler
+                return
+        g.profiler = StackSampler(interval, {threading.get_ident()}).start()
+
+    @app.after_request
+    def _announce_profile(response):
+        path = g.get("profile_path")
+        if path:
+            response.headers[RESPONSE_HEADER] = os.path.basename(path)
+        return response
+
+    @app.teardown_request
+    def _finish_profile(exc):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return
+        path = g.pop("profile_path")
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+            profiler.dump_stats(path)
+        else:
+            profiler.stop()
+            _write(path, profiler.collapsed())
+        _prune(app)
+        logger.info("Profile written to %s", path)
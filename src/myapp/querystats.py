@@ -0,0 +1,159 @@
+"""
+Per-request SQL statement counts, DB time, N+1 detection and query budgets.
+
+Statements are counted from cursor events, so lazy loads, flushes and the
+user_loader count as well. A statement text (parameters are bound separately,
+so it is the same for every row of an N+1 loop) that runs at least
+SQL_N_PLUS_ONE_THRESHOLD times in one request is logged as a suspected N+1.
+
+Views declare a budget with ``@query_budget(n)``. Exceeding it raises
+QueryBudgetExceeded when SQL_BUDGET_STRICT is on (as in TestingConfig,
+so the test suite fails), otherwise it is logged.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from flask import Flask, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from .extensions import db
+
+logger = logging.getLogger("myapp.sql")
+
+BUDGET_ATTR = "_query_budget"
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    statements: Counter[str] = field(default_factory=Counter)
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [(s, n) for s, n in self.statements.most_common() if n >= threshold]
+
+
+# Stats objects receiving statements outside a request (see capture_queries)
+_captures: list[QueryStats] = []
+
+
+def _targets() -> list[QueryStats]:
+    targets = list(_captures)
+    if has_request_context():
+        stats = g.get("query_stats")
+        if stats is not None:
+            targets.append(stats)
+    return targets
+
+
+def _instrument_engine(engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        targets = _targets()
+        if targets:
+            elapsed = time.perf_counter() - started
+            for stats in targets:
+                stats.record(statement, elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryStats]:
+    """Collect statements run in the block, e.g. to assert a count in a service test."""
+    stats = QueryStats()
+    _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        _captures.remove(stats)
+
+
+def query_budget(limit: int) -> Callable:
+    """Declare the maximum number of SQL statements a view may run per request."""
+
+    def decorator(view):
+        # functools.wraps copies __dict__, so the budget survives outer decorators
+        setattr(view, BUDGET_ATTR, limit)
+        return view
+
+    return decorator
+
+
+def current_budget() -> int | None:
+    view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+    return getattr(view, BUDGET_ATTR, None)
+
+
+def register_query_stats(app: Flask) -> None:
+    if not app.config.get("SQL_STATS_ENABLED", False):
+        return
+
+    threshold = int(app.config.get("SQL_N_PLUS_ONE_THRESHOLD", 5))
+    strict = bool(app.config.get("SQL_BUDGET_STRICT", False))
+
+    with app.app_context():
+        for engine in db.engines.values():
+            _instrument_engine(engine)
+
+    @app.before_request
+    def _start_query_stats():
+        g.query_stats = QueryStats()
+
+    @app.after_request
+    def _check_query_stats(response):
+        stats = g.get("query_stats")
+        if stats is None:
+            return response
+
+        for statement, times in stats.repeated(threshold):
+            logger.warning(
+                "Suspected N+1 on %s: %d x %s",
+                request.endpoint,
+                times,
+                " ".join(statement.split())[:200],
+            )
+
+        budget = current_budget()
+        if budget is not None and stats.count > budget:
+            message = (
+                f"{request.endpoint} ran {stats.count} SQL statements, budget is {budget}: "
+                + "; ".join(f"{n} x {s}" for s, n in stats.statements.most_common(5))
+            )
+            if strict:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        logger.debug(
+            "%s: %d statements in %.1f ms",
+            request.endpoint,
+            stats.count,
+            stats.seconds * 1000,
+            extra={"sql_count": stats.count, "sql_ms": round(stats.seconds * 1000, 2)},
+        )
+        return response
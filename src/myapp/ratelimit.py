@@ -0,0 +1,365 @@
+"""
+Rate limits for expensive endpoints (login, registration).
+
+Limits are sliding-window counters: the hits of the current fixed window plus
+the previous window's hits weighted by how much of it still overlaps the
+sliding window. That needs two integers per key and window instead of a log of
+timestamps, and is exact enough for throttling.
+
+Counters live in a store shared by all workers on the host: by default a small
+SQLite file in the instance folder (WAL, one UPSERT per hit), or Redis via
+RATELIMIT_STORAGE_URL=redis://... for several hosts. ``memory://`` keeps them
+per process (tests, single worker). Keys are hashed, so no emails or addresses
+end up in the store.
+
+``@throttle(scope)`` marks a view; a before_request hook registered ahead of
+CSRF validation enforces its limits. The per-IP limit is checked before the
+form body is parsed. The per-email limit (the raw ``email`` form field) counts
+every attempt up front, in the same atomic store update as the check, and is
+refunded when the response is not an error, so successful logins never use up
+the owner's attempts while parallel guesses cannot slip past it. Rejected
+attempts never reach WTForms or a password hash and cost one store round-trip
+each. A failing store lets requests through and logs a warning.
+
+Behind a reverse proxy ``request.remote_addr`` is the proxy's address, which
+would turn the per-IP limits into site-wide ones; set TRUSTED_PROXY_COUNT so
+the client address is taken from X-Forwarded-For (see create_app).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Protocol
+
+from flask import Flask, current_app, g, has_app_context, request
+from werkzeug.exceptions import TooManyRequests
+
+from .metrics import get_metrics
+
+logger = logging.getLogger("myapp.ratelimit")
+
+EXTENSION_KEY = "ratelimit"
+THROTTLE_ATTR = "_throttle_scope"
+_LIMIT_KEY = re.compile(r"^RATELIMIT_\w+_PER_(IP|EMAIL)$")
+
+_UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class RateLimited(TooManyRequests):
+    description = "Too many attempts. Please wait a moment and try again."
+
+
+@dataclass(frozen=True)
+class Limit:
+    count: int
+    period: int  # seconds
+
+    def __str__(self) -> str:
+        return f"{self.count}/{self.period}"
+
+
+def parse_limit(spec: str) -> Limit | None:
+    """Parse "5/60", "5/minute" or "100/hour"; an empty spec means no limit."""
+    spec = (spec or "").strip()
+    if not spec:
+        return None
+    try:
+        count, period = spec.split("/", 1)
+        period = period.strip().lower().rstrip("s")
+        seconds = _UNITS[period] if period in _UNITS else int(period)
+        limit = Limit(int(count), seconds)
+    except (ValueError, KeyError):
+        raise ValueError(
+            f"Invalid rate limit {spec!r}, expected e.g. '5/60' or '5/minute'"
+        ) from None
+    if limit.count < 1 or limit.period < 1:
+        raise ValueError(f"Invalid rate limit {spec!r}, count and period must be positive")
+    return limit
+
+
+# ----------------------------
+# Stores
+# ----------------------------
+class Store(Protocol):
+    def hit(self, key: str, window: int, period: int) -> tuple[int, int]:
+        """Count a hit in `window`; returns (hits in window, hits in window - 1)."""
+        ...
+
+    def refund(self, key: str, window: int) -> None:
+        """Take back one hit counted in `window`."""
+        ...
+
+
+class MemoryStore:
+    """Per-process counters; fine for tests and single-process servers."""
+
+    def __init__(self) -> None:
+        self._counts: dict[tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, window: int, period: int) -> tuple[int, int]:
+        with self._lock:
+            current = self._counts.get((key, window), 0) + 1
+            self._counts[(key, window)] = current
+            previous = self._counts.get((key, window - 1), 0)
+            if len(self._counts) > 10_000:
+                self._counts = {k: v for k, v in self._counts.items() if k[1] >= window - 1}
+        return current, previous
+
+    def refund(self, key: str, window: int) -> None:
+        with self._lock:
+            if self._counts.get((key, window), 0) > 0:
+                self._counts[(key, window)] -= 1
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ratelimit (
+    key TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    hits INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (key, bucket)
+) WITHOUT ROWID
+"""
+
+
+class SQLiteStore:
+    """
+    Counters in a SQLite file shared by the workers of one host. Each thread gets
+    its own connection; expired rows are deleted every `prune_every` hits.
+    """
+
+    def __init__(self, path: str, *, busy_timeout: float = 1.0, prune_every: int = 1000) -> None:
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._hits = 0
+        _sqlite_stores.add(self)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened on first use, so processes that never serve a login never create the file
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Losing a few counts on power failure is fine; an fsync per login attempt is not
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute(_SCHEMA)
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def reset_after_fork(self) -> None:
+        # Never share a SQLite connection with the parent process
+        self._local = threading.local()
+
+    def hit(self, key: str, window: int, period: int) -> tuple[int, int]:
+        conn = self._conn()
+        # Autocommit: the UPSERT is atomic on its own, the previous window is read-only
+        (current,) = conn.execute(
+            "INSERT INTO ratelimit (key, bucket, hits, expires) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT (key, bucket) DO UPDATE SET hits = hits + 1 RETURNING hits",
+            (key, window, (window + 2) * period),
+        ).fetchone()
+        row = conn.execute(
+            "SELECT hits FROM ratelimit WHERE key = ? AND bucket = ?", (key, window - 1)
+        ).fetchone()
+        self._hits += 1
+        if self._hits % self.prune_every == 0:
+            conn.execute("DELETE FROM ratelimit WHERE expires < ?", (time.time(),))
+        return current, row[0] if row else 0
+
+    def refund(self, key: str, window: int) -> None:
+        self._conn().execute(
+            "UPDATE ratelimit SET hits = hits - 1 WHERE key = ? AND bucket = ? AND hits > 0",
+            (key, window),
+        )
+
+
+_sqlite_stores: weakref.WeakSet[SQLiteStore] = weakref.WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for store in list(_sqlite_stores):
+        store.reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class RedisStore:
+    """Counters in Redis, for limits shared across hosts. `client` is a redis.Redis."""
+
+    def __init__(self, client, prefix: str = "myapp:rl:") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    def hit(self, key: str, window: int, period: int) -> tuple[int, int]:
+        name = f"{self.prefix}{key}:{window}"
+        pipe = self.client.pipeline()
+        pipe.incr(name)
+        pipe.expire(name, 2 * period)
+        pipe.get(f"{self.prefix}{key}:{window - 1}")
+        current, _, previous = pipe.execute()
+        return int(current), int(previous or 0)
+
+    def refund(self, key: str, window: int) -> None:
+        # DECR on an expired key would recreate it without a TTL
+        self.client.eval(_REDIS_REFUND, 1, f"{self.prefix}{key}:{window}")
+
+
+_REDIS_REFUND = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') > 0 then
+    return redis.call('DECR', KEYS[1])
+end
+return 0
+"""
+
+
+def store_from_url(url: str, app: Flask) -> Store:
+    """Empty (SQLite in the instance folder), sqlite:///path, memory:// or redis://..."""
+    if not url:
+        return SQLiteStore(os.path.join(app.instance_path, "ratelimit.sqlite3"))
+    if url.startswith("memory://"):
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url.removeprefix("sqlite:///"))
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ModuleNotFoundError as e:
+            raise RuntimeError(
+                "RATELIMIT_STORAGE_URL points at Redis but 'redis' is not installed. "
+                "Install with: pip install -e '.[redis]'"
+            ) from e
+        return RedisStore(redis.Redis.from_url(url, socket_timeout=0.5))
+    raise ValueError(f"Unsupported RATELIMIT_STORAGE_URL {url!r}")
+
+
+# ----------------------------
+# Limiter
+# ----------------------------
+class RateLimiter:
+    def __init__(self, store: Store, *, clock: Callable[[], float] = time.time) -> None:
+        self.store = store
+        self.clock = clock
+
+    def _key(self, scope: str, kind: str, value: str, limit: Limit) -> str:
+        digest = hashlib.blake2b(value.encode(), digest_size=16).hexdigest()
+        return f"{scope}:{kind}:{limit.period}:{digest}"
+
+    def check(self, scope: str, kind: str, value: str, limit: Limit) -> int | None:
+        """
+        Count one hit for `value`; raises RateLimited when over `limit`. Returns the
+        window the hit was counted in (for refund()), None if the store failed.
+        """
+        key = self._key(scope, kind, value, limit)
+        now = self.clock()
+        window, offset = divmod(now, limit.period)
+        try:
+            current, previous = self.store.hit(key, int(window), limit.period)
+        except Exception:
+            logger.warning("Rate limit store failed, letting the request through", exc_info=True)
+            return None
+
+        overlap = 1 - offset / limit.period
+        if current + previous * overlap <= limit.count:
+            return int(window)
+
+        metrics = get_metrics() if has_app_context() else None
+        if metrics is not None:
+            metrics.inc("myapp_ratelimit_rejections_total", (("scope", scope), ("kind", kind)))
+        # Once this window ends the estimate is at most `current`, so the next attempt
+        # fits if `current` leaves room for it; otherwise wait out the next window too.
+        retry_after = limit.period - offset
+        if current >= limit.count:
+            retry_after += limit.period
+        raise RateLimited(retry_after=max(1, math.ceil(retry_after)))
+
+    def refund(self, scope: str, kind: str, value: str, limit: Limit, window: int) -> None:
+        """Take back a hit counted by check() in `window`."""
+        try:
+            self.store.refund(self._key(scope, kind, value, limit), window)
+        except Exception:
+            logger.warning("Rate limit store failed, attempt not refunded", exc_info=True)
+
+
+def _limit_for(scope: str, kind: str) -> Limit | None:
+    return parse_limit(current_app.config.get(f"RATELIMIT_{scope.upper()}_PER_{kind.upper()}", ""))
+
+
+def throttle(scope: str) -> Callable:
+    """
+    Apply the RATELIMIT_<SCOPE>_PER_IP and RATELIMIT_<SCOPE>_PER_EMAIL limits to a
+    view. Put it below the route decorator; the limits are enforced before the
+    request reaches CSRF validation or the view.
+    """
+
+    def decorator(view):
+        # functools.wraps copies __dict__, so the scope survives outer decorators
+        setattr(view, THROTTLE_ATTR, scope)
+        return view
+
+    return decorator
+
+
+def current_scope() -> str | None:
+    view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+    return getattr(view, THROTTLE_ATTR, None)
+
+
+def get_rate_limiter() -> RateLimiter | None:
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def init_rate_limiter(app: Flask) -> RateLimiter | None:
+    for key, value in app.config.items():
+        if _LIMIT_KEY.match(key):
+            parse_limit(value)  # fail at startup, not on the first login
+    if not app.config.get("RATELIMIT_ENABLED", True):
+        return None
+    limiter = RateLimiter(store_from_url(app.config.get("RATELIMIT_STORAGE_URL", ""), app))
+    app.extensions[EXTENSION_KEY] = limiter
+
+    def _throttle():
+        scope = current_scope()
+        if scope is None:
+            return
+        ip_limit = _limit_for(scope, "ip")
+        if ip_limit is not None:
+            limiter.check(scope, "ip", request.remote_addr or "unknown", ip_limit)
+        email_limit = _limit_for(scope, "email")
+        if email_limit is None:
+            return
+        email = request.form.get("email", "").strip().lower()
+        if email:
+            window = limiter.check(scope, "email", email, email_limit)
+            if window is not None:
+                g.ratelimit_refund = (scope, "email", email, email_limit, window)
+
+    # First in line, so rejected requests skip CSRFProtect's form parsing too
+    app.before_request_funcs.setdefault(None, []).insert(0, _throttle)
+
+    @app.after_request
+    def _refund_successful(response):
+        pending = g.pop("ratelimit_refund", None)
+        if pending is not None and response.status_code < 400:
+            limiter.refund(*pending)  # only failed attempts count against the email
+        return response
+
+    return limiter
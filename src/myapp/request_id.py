@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import time
 import uuid
 
 from flask import g, request
@@ -10,6 +11,7 @@ HEADER = "X-Request-ID"
 def register_request_id(app):
     @app.before_request
     def _set_request_id():
+        g.request_started = time.perf_counter()
         rid = request.headers.get(HEADER)
         if not rid:
             rid = uuid.uuid4().hex
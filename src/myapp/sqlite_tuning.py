@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .extensions import db
+
+_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+_SYNCHRONOUS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+_TEMP_STORE = {"DEFAULT", "FILE", "MEMORY"}
+
+
+def _choice(name: str, value: object, allowed: set[str]) -> str:
+    val = str(value).strip().upper()
+    if val not in allowed:
+        raise ValueError(f"Invalid {name}={value!r}. Use one of: {', '.join(sorted(allowed))}")
+    return val
+
+
+def sqlite_pragmas(config: Mapping[str, object], *, in_memory: bool = False) -> list[str]:
+    """
+    Translate the SQLITE_* config values into PRAGMA statements.
+    Values are validated here because PRAGMA arguments cannot be bound parameters.
+    """
+    synchronous = _choice(
+        "SQLITE_SYNCHRONOUS", config.get("SQLITE_SYNCHRONOUS", "NORMAL"), _SYNCHRONOUS
+    )
+    temp_store = _choice(
+        "SQLITE_TEMP_STORE", config.get("SQLITE_TEMP_STORE", "MEMORY"), _TEMP_STORE
+    )
+
+    # busy_timeout first: switching to WAL itself needs a lock other workers may hold
+    pragmas = [f"PRAGMA busy_timeout = {int(config.get('SQLITE_BUSY_TIMEOUT', 5000))}"]
+    if not in_memory:
+        journal = _choice(
+            "SQLITE_JOURNAL_MODE", config.get("SQLITE_JOURNAL_MODE", "WAL"), _JOURNAL_MODES
+        )
+        pragmas.append(f"PRAGMA journal_mode = {journal}")
+        pragmas.append(f"PRAGMA mmap_size = {int(config.get('SQLITE_MMAP_SIZE', 268435456))}")
+
+    pragmas += [
+        f"PRAGMA synchronous = {synchronous}",
+        f"PRAGMA cache_size = {int(config.get('SQLITE_CACHE_SIZE', -64000))}",
+        f"PRAGMA temp_store = {temp_store}",
+    ]
+    return pragmas
+
+
+def install_sqlite_pragmas(engine: Engine, pragmas: list[str]) -> None:
+    """Run the given PRAGMAs on every new DBAPI connection of the engine."""
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def register_sqlite_pragmas(app: Flask) -> None:
+    if not app.config.get("SQLITE_PERFORMANCE_MODE", False):
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name != "sqlite":
+                continue
+            in_memory = engine.url.database in (None, "", ":memory:")
+            install_sqlite_pragmas(engine, sqlite_pragmas(app.config, in_memory=in_memory))
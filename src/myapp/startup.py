@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+
+# Runs in a fresh interpreter so module caches of the current process don't hide import costs
+_PROBE = """
+import json, time
+t0 = time.perf_counter()
+from myapp import create_app
+app = create_app()
+print(json.dumps({
+    "total_ms": (time.perf_counter() - t0) * 1000,
+    "create_app_ms": app.extensions["startup"]["create_app_ms"],
+}))
+"""
+
+
+@dataclass(frozen=True)
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+@dataclass(frozen=True)
+class StartupReport:
+    total_ms: float
+    create_app_ms: float
+    imports: list[ImportTiming]
+
+    def top(self, n: int = 15, prefix: str | None = None) -> list[ImportTiming]:
+        rows = [t for t in self.imports if prefix is None or t.module.startswith(prefix)]
+        return sorted(rows, key=lambda t: t.cumulative_us, reverse=True)[:n]
+
+
+def parse_importtime(output: str) -> list[ImportTiming]:
+    """Parse `python -X importtime` stderr lines: 'import time: self | cumulative | name'."""
+    timings = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = (p.strip() for p in parts)
+        if not self_us.isdigit():  # header line
+            continue
+        timings.append(ImportTiming(name, int(self_us), int(cumulative_us)))
+    return timings
+
+
+def measure_startup(env: dict[str, str] | None = None, timeout: float = 60.0) -> StartupReport:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE],
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+        env={**os.environ, **(env or {})},
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Startup probe failed:\n{proc.stderr[-2000:]}")
+
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return StartupReport(
+        total_ms=result["total_ms"],
+        create_app_ms=result["create_app_ms"],
+        imports=parse_importtime(proc.stderr),
+    )
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import os
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+from flask import Flask
+from jinja2 import FileSystemBytecodeCache
+from jinja2.bccache import Bucket
+
+
+def _package_version(name: str) -> str:
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return "0"
+
+
+class SharedBytecodeCache(FileSystemBytecodeCache):
+    """
+    On-disk Jinja bytecode cache shared by all workers.
+
+    Jinja already writes cache files atomically (temp file + rename) and
+    recompiles when a template's source checksum changes. A read-only or full
+    cache directory must never break rendering, so write errors are ignored.
+    """
+
+    def dump_bytecode(self, bucket: Bucket) -> None:
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+
+def template_cache_dir(app: Flask) -> Path:
+    base = app.config.get("JINJA_BYTECODE_CACHE_DIR") or os.path.join(
+        app.instance_path, "jinja-cache"
+    )
+    # A new release or Jinja upgrade starts from an empty directory
+    tag = f"myapp-{_package_version('myapp')}-jinja2-{_package_version('jinja2')}"
+    return Path(base) / tag
+
+
+def install_template_cache(app: Flask) -> Path:
+    directory = template_cache_dir(app)
+    directory.mkdir(parents=True, exist_ok=True)
+    app.jinja_env.bytecode_cache = SharedBytecodeCache(str(directory))
+    return directory
+
+
+def init_template_cache(app: Flask) -> None:
+    if app.config.get("JINJA_BYTECODE_CACHE", False):
+        install_template_cache(app)
+
+
+def compile_templates(app: Flask) -> int:
+    """Load every template once; fills both the in-memory and the bytecode cache."""
+    env = app.jinja_env
+    names = env.list_templates()
+    for name in names:
+        env.get_template(name)
+    return len(names)
@@ -0,0 +1,173 @@
+"""
+Per-request latency breakdown in a ``Server-Timing`` header (and optionally a log line).
+
+Time is attributed to the innermost active span, so a query issued while a
+template renders counts as db, not tpl. Whatever is not covered by a span is
+reported as ``app``; ``total`` starts at the request_id before_request hook.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from flask import (
+    Flask,
+    before_render_template,
+    g,
+    has_request_context,
+    request,
+    template_rendered,
+)
+from flask_login import current_user
+from sqlalchemy import event
+
+from .extensions import db
+
+HEADER = "Server-Timing"
+# Sent by an admin to get the header for a single request while it is disabled globally
+REQUEST_HEADER = "X-Server-Timing"
+
+logger = logging.getLogger("myapp.timing")
+
+# bucket -> description in the header
+BUCKETS = {
+    "db": "Database",
+    "tpl": "Templates",
+    "hash": "Password hashing",
+    "oauth": "OAuth HTTP",
+}
+
+
+class RequestTimings:
+    """Exclusive time per bucket for one request (not thread-safe, lives in `g`)."""
+
+    def __init__(self) -> None:
+        self.totals: dict[str, float] = defaultdict(float)
+        self.counts: dict[str, int] = defaultdict(int)
+        self._stack: list[list] = []  # [bucket, started, time spent in nested spans]
+
+    def start(self, bucket: str) -> None:
+        self._stack.append([bucket, time.perf_counter(), 0.0])
+
+    def stop(self, bucket: str) -> None:
+        # Ignore unbalanced stops (e.g. an error skipped the matching start)
+        if not self._stack or self._stack[-1][0] != bucket:
+            return
+        _, started, nested = self._stack.pop()
+        elapsed = time.perf_counter() - started
+        self.totals[bucket] += elapsed - nested
+        self.counts[bucket] += 1
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def header(self, total: float) -> str:
+        parts = []
+        for bucket, desc in BUCKETS.items():
+            if self.counts.get(bucket):
+                parts.append(
+                    f'{bucket};dur={self.totals[bucket] * 1000:.2f};desc="{desc} '
+                    f'({self.counts[bucket]}x)"'
+                )
+        spent = sum(self.totals.values())
+        parts.append(f"app;dur={max(total - spent, 0.0) * 1000:.2f}")
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+def current_timings() -> RequestTimings | None:
+    if not has_request_context():
+        return None
+    return g.get("server_timing")
+
+
+@contextmanager
+def span(bucket: str) -> Iterator[None]:
+    """Attribute the enclosed block to `bucket` (no-op unless timing this request)."""
+    timings = current_timings()
+    if timings is None:
+        yield
+        return
+    timings.start(bucket)
+    try:
+        yield
+    finally:
+        timings.stop(bucket)
+
+
+def _instrument_engine(engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        timings = current_timings()
+        if timings is not None:
+            timings.start("db")
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        timings = current_timings()
+        if timings is not None:
+            timings.stop("db")
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        timings = current_timings()
+        if timings is not None:
+            timings.stop("db")
+
+
+def _admin_asked() -> bool:
+    if request.headers.get(REQUEST_HEADER) != "1":
+        return False
+    return bool(current_user.is_authenticated and getattr(current_user, "is_admin", False))
+
+
+def register_server_timing(app: Flask) -> None:
+    enabled = bool(app.config.get("SERVER_TIMING_ENABLED", False))
+    log_enabled = bool(app.config.get("SERVER_TIMING_LOG", False))
+    allow_admin = bool(app.config.get("SERVER_TIMING_ADMIN", True))
+    if not (enabled or log_enabled or allow_admin):
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            _instrument_engine(engine)
+
+    def _template_started(sender, template, context, **extra):
+        timings = current_timings()
+        if timings is not None:
+            timings.start("tpl")
+
+    def _template_done(sender, template, context, **extra):
+        timings = current_timings()
+        if timings is not None:
+            timings.stop("tpl")
+
+    before_render_template.connect(_template_started, app, weak=False)
+    template_rendered.connect(_template_done, app, weak=False)
+
+    @app.before_request
+    def _start_timing():
+        asked = allow_admin and _admin_asked()
+        if enabled or log_enabled or asked:
+            g.server_timing = RequestTimings()
+            g.server_timing_header = enabled or asked
+
+    @app.after_request
+    def _emit_timing(response):
+        timings = g.pop("server_timing", None)
+        if timings is None:
+            return response
+        total = time.perf_counter() - g.get("request_started", time.perf_counter())
+        value = timings.header(total)
+        if g.get("server_timing_header"):
+            response.headers[HEADER] = value
+        if log_enabled:
+            logger.info(
+                "Server timing %s",
+                value,
+                extra={f"{b}_ms": round(t * 1000, 2) for b, t in timings.totals.items()},
+            )
+        return response
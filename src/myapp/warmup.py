@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import time
+
+from flask import Flask
+from sqlalchemy import text
+
+from .extensions import db
+from .templating import compile_templates
+
+EXTENSION_KEY = "warmup"
+
+
+def _warm_routing(app: Flask) -> int:
+    adapter = app.url_map.bind("localhost")
+    adapter.match("/")  # compiles the matcher
+    built = 0
+    for rule in app.url_map.iter_rules():
+        if rule.arguments or "GET" not in (rule.methods or ()):
+            continue
+        adapter.build(rule.endpoint)
+        built += 1
+
+    # The JSON provider and request context machinery are set up lazily as well
+    with app.test_request_context("/"):
+        app.json.response({"status": "ok"})
+    return built
+
+
+def _warm_db(app: Flask, connections: int) -> int:
+    opened = 0
+    with app.app_context():
+        for engine in db.engines.values():
+            size = getattr(engine.pool, "size", lambda: connections)()
+            conns = []
+            try:
+                for _ in range(max(0, min(connections, size))):
+                    conn = engine.connect()
+                    conns.append(conn)
+                    conn.execute(text("SELECT 1"))
+            finally:
+                for conn in conns:
+                    conn.close()  # returns the connection to the pool, still open
+            opened += len(conns)
+    return opened
+
+
+def warmup(app: Flask, *, db_connections: int | None = None) -> dict[str, object]:
+    """
+    Do the lazy per-process work up front so the first real request doesn't pay for it:
+    compile all templates, build the URL matcher and open pool connections.
+    Failures are logged, never raised, so warm-up can't keep a worker from booting.
+    """
+    if db_connections is None:
+        db_connections = int(app.config.get("WARMUP_DB_CONNECTIONS", 1))
+
+    steps = (
+        ("templates", lambda: compile_templates(app)),
+        ("routes", lambda: _warm_routing(app)),
+        ("db_connections", lambda: _warm_db(app, db_connections)),
+    )
+
+    report: dict[str, object] = {}
+    started = time.perf_counter()
+    for name, step in steps:
+        t0 = time.perf_counter()
+        try:
+            report[name] = step()
+        except Exception:
+            app.logger.warning("Warm-up step %r failed", name, exc_info=True)
+            report[name] = None
+        report[f"{name}_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+
+    report["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    report["done"] = True
+    app.extensions[EXTENSION_KEY] = report
+
+    app.logger.info(
+        "Warm-up finished in %.1f ms (templates=%s, routes=%s, db_connections=%s)",
+        report["duration_ms"],
+        report["templates"],
+        report["routes"],
+        report["db_connections"],
+    )
+    return report
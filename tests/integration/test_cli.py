@@ -0,0 +1,26 @@
+from myapp.models import User
+
+
+def test_create_admin_creates_admin_user(app):
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(
+        args=["create-admin", "cli-admin@example.com"], input="pw123456\npw123456\n"
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Admin created." in result.output
+    with app.app_context():
+        user = User.query.filter_by(email="cli-admin@example.com").one()
+        assert user.is_admin
+        assert user.check_password("pw123456")
+
+
+def test_create_admin_rejects_existing_user(app):
+    runner = app.test_cli_runner()
+    runner.invoke(args=["create-admin", "dup@example.com"], input="pw123456\npw123456\n")
+
+    result = runner.invoke(args=["create-admin", "dup@example.com"], input="pw123456\npw123456\n")
+
+    assert result.exit_code != 0
+    assert "User already exists." in result.output
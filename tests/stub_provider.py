@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        pass  # clients that timed out on purpose close the socket before we answer
+
+
+class StubProvider:
+    """
+    A GitHub-like OAuth provider on 127.0.0.1 for tests.
+
+    Serves the token endpoint and the ``user`` / ``user/emails`` API with
+    keep-alive. `responses` maps a path to (status, body), `headers` to extra
+    response headers and `delays` to seconds slept before answering. It
+    records hits per path, the client ports seen (one per TCP connection) and
+    the most requests it had in flight at once.
+    """
+
+    def __init__(self) -> None:
+        self.responses: dict[str, tuple[int, object]] = {
+            "/login/oauth/access_token": (200, {"access_token": "t0k", "token_type": "bearer"}),
+            "/user": (200, {"id": 4242, "login": "octo"}),
+            "/user/emails": (
+                200,
+                [{"email": "octo@example.com", "primary": True, "verified": True}],
+            ),
+        }
+        self.headers: dict[str, dict[str, str]] = {}
+        self.delays: dict[str, float] = {}
+        self.hits: Counter[str] = Counter()
+        self.connections: set[int] = set()
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = _QuietServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> StubProvider:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def _answer(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                path = self.path.split("?")[0]
+                with stub._lock:
+                    stub.hits[path] += 1
+                    stub.connections.add(self.client_address[1])
+                    stub._in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub._in_flight)
+                try:
+                    time.sleep(stub.delays.get(path, 0))
+                    status, body = stub.responses.get(path, (404, {"message": "Not Found"}))
+                    payload = json.dumps(body).encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    for name, value in stub.headers.get(path, {}).items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with stub._lock:
+                        stub._in_flight -= 1
+
+            do_GET = do_POST = _answer
+
+        return Handler
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from contextvars import ContextVar
+
+from myapp import create_app
+from myapp.asgi import ThreadedWsgiToAsgi
+
+
+def http_scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"testserver")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+
+
+async def get(asgi, path: str) -> tuple[int, bytes]:
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi(http_scope(path), receive, send)
+    body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+    return messages[0]["status"], body
+
+
+def test_requests_run_concurrently_on_their_own_threads(app):
+    flask_app = create_app("testing")
+    flask_app.add_url_rule("/slow", "slow", lambda: time.sleep(0.2) or "done")
+    asgi = ThreadedWsgiToAsgi(flask_app, threads=4, warmup=False)
+
+    async def burst():
+        return await asyncio.gather(*(get(asgi, "/slow") for _ in range(4)))
+
+    started = time.perf_counter()
+    assert asyncio.run(burst()) == [(200, b"done")] * 4
+    # asgiref's WsgiToAsgi would run them one after another (0.8s)
+    assert time.perf_counter() - started < 0.6
+    assert asyncio.run(get(asgi, "/health/live"))[0] == 200
+
+
+def test_threads_cap_requests_in_flight(app):
+    flask_app = create_app("testing")
+    flask_app.add_url_rule("/slow", "slow", lambda: time.sleep(0.2) or "done")
+    asgi = ThreadedWsgiToAsgi(flask_app, threads=2, warmup=False)
+
+    async def burst():
+        return await asyncio.gather(*(get(asgi, "/slow") for _ in range(4)))
+
+    started = time.perf_counter()
+    assert asyncio.run(burst()) == [(200, b"done")] * 4
+    assert time.perf_counter() - started >= 0.4  # two rounds of two
+
+
+def test_lifespan_warms_up_and_starts_background_work(app):
+    flask_app = create_app("testing")
+    asgi = ThreadedWsgiToAsgi(flask_app, threads=2)
+    sent = []
+
+    async def lifespan():
+        messages = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        await asgi({"type": "lifespan", "asgi": {"version": "3.0"}}, receive, send)
+
+    asyncio.run(lifespan())
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert "warmup" in flask_app.extensions
+    flask_app.extensions["health"].stop()
+
+
+def test_requests_do_not_share_context_variables(app):
+    # Like a keep-alive connection: one server task serves request after request
+    marker: ContextVar[str] = ContextVar("marker", default="unset")
+    flask_app = create_app("testing")
+    flask_app.add_url_rule("/mark", "mark", lambda: marker.get() + (marker.set("set") and ""))
+    asgi = ThreadedWsgiToAsgi(flask_app, threads=2, warmup=False)
+
+    async def connection():
+        return [await get(asgi, "/mark") for _ in range(2)]
+
+    assert asyncio.run(connection()) == [(200, b"unset")] * 2
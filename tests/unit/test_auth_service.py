@@ -1,48 +1,20 @@
 from __future__ import annotations
 
+import threading
 from dataclasses import dataclass
-from types import SimpleNamespace
 
 import pytest
+from sqlalchemy.dialects import postgresql
 
 import myapp.auth.service as svc
+from myapp.models import AuthIdentity, User
+from myapp.querystats import capture_queries
 
 # ----------------------------
-# Helpers (fakes/mocks)
+# Helpers
 # ----------------------------
 
 
-class FakeQuery:
-    """Very small query stub: filter_by(...).first()"""
-
-    def __init__(self, first_result=None):
-        self._first_result = first_result
-        self.last_filter_kwargs = None
-
-    def filter_by(self, **kwargs):
-        self.last_filter_kwargs = kwargs
-        return self
-
-    def first(self):
-        return self._first_result
-
-
-class FakeSession:
-    def __init__(self):
-        self.added = []
-        self.flushed = 0
-        self.committed = 0
-
-    def add(self, obj):
-        self.added.append(obj)
-
-    def flush(self):
-        self.flushed += 1
-
-    def commit(self):
-        self.committed += 1
-
-
 @dataclass
 class FakeUser:
     email: str | None = None
@@ -56,35 +28,18 @@ class FakeUser:
     is_admin: bool = False
 
 
-class FakeUserModel:
-    """Acts like the SQLAlchemy model class 'User' with .query"""
+def oauth_login(provider="google", subject="sub", email=None, verified=True, username=None):
+    return svc.get_or_create_user_from_oauth(
+        provider=provider,
+        subject=subject,
+        email=email,
+        email_verified=verified,
+        username_hint=username,
+    )
 
-    def __init__(self, existing_user_by_email: FakeUser | None = None):
-        self.query = FakeQuery(first_result=existing_user_by_email)
 
-    def __call__(self, email=None, username=None):
-        return FakeUser(email=email, username=username)
-
-
-class FakeIdentityRow:
-    """Represents an identity row returned by auth_identity.query.first()."""
-
-    def __init__(self, user: FakeUser):
-        self.user = user
-
-
-class FakeAuthIdentityModel:
-    """Acts like a SQLAlchemy model class 'AuthIdentity' with .query and callable constructor."""
-
-    def __init__(self, existing_identity: FakeIdentityRow | None = None):
-        self.query = FakeQuery(first_result=existing_identity)
-        self.created_rows = []
-
-    def __call__(self, **kwargs):
-        # return an object representing the created identity row
-        row = SimpleNamespace(**kwargs)
-        self.created_rows.append(row)
-        return row
+def identities(subject: str) -> list[AuthIdentity]:
+    return AuthIdentity.query.filter_by(subject=subject).all()
 
 
 # ----------------------------
@@ -113,179 +68,169 @@ def test_is_safe_next_url(url: str, expected: bool) -> None:
 # ----------------------------
 
 
-def test_get_or_create_user_identity_exists_returns_existing_user(app, monkeypatch):
+def test_get_or_create_user_identity_exists_returns_existing_user(app, db):
     with app.app_context():
-        existing_user = FakeUser(email="x@example.com", username="x", id=123)
-
-        fake_user_model = FakeUserModel(existing_user_by_email=None)
-        fake_ident_model = FakeAuthIdentityModel(existing_identity=FakeIdentityRow(existing_user))
-        fake_session = FakeSession()
-
-        monkeypatch.setattr(svc, "User", fake_user_model)
-        monkeypatch.setattr(svc, "auth_identity", fake_ident_model)
-        monkeypatch.setattr(svc, "db", SimpleNamespace(session=fake_session))
-
-        got = svc.get_or_create_user_from_oauth(
-            provider="google",
-            subject="sub-123",
-            email="x@example.com",
-            email_verified=True,
-            username_hint="ignored",
-        )
+        existing = User(email="x@example.com", username="x")
+        existing.identities.append(AuthIdentity(provider="google", subject="sub-123"))
+        db.session.add(existing)
+        db.session.commit()
+        existing_id = existing.id
+        db.session.expunge_all()
 
-        assert got is existing_user
-        # since identity existed, no writes:
-        assert fake_session.added == []
-        assert fake_session.committed == 0
+        with capture_queries() as stats:
+            got = oauth_login(subject="sub-123", email="x@example.com", username="ignored")
 
+        assert got.id == existing_id
+        assert got.username == "x"
+        # one joined query, no writes
+        assert stats.count == 1
+        assert "JOIN auth_identities" in next(iter(stats.statements))
 
-def test_get_or_create_user_creates_new_user_and_identity_when_no_linking(app, monkeypatch):
+
+def test_get_or_create_user_creates_new_user_and_identity_when_no_linking(app, db):
     with app.app_context():
         app.config["AUTH_LINK_BY_EMAIL"] = False
         app.config["AUTH_TRUSTED_EMAIL_PROVIDERS"] = ["google"]
 
-        fake_user_model = FakeUserModel(existing_user_by_email=None)
-        fake_ident_model = FakeAuthIdentityModel(existing_identity=None)
-        fake_session = FakeSession()
-
-        monkeypatch.setattr(svc, "User", fake_user_model)
-        monkeypatch.setattr(svc, "auth_identity", fake_ident_model)
-        monkeypatch.setattr(svc, "db", SimpleNamespace(session=fake_session))
-
-        # Make flush assign an id like SQLAlchemy would after INSERT
-        def flush_and_assign_id():
-            fake_session.flushed += 1
-            # first added object is the user we created
-            for obj in fake_session.added:
-                if isinstance(obj, FakeUser) and obj.id is None:
-                    obj.id = 1
-
-        fake_session.flush = flush_and_assign_id  # type: ignore[method-assign]
-
-        got = svc.get_or_create_user_from_oauth(
-            provider="google",
-            subject="sub-new",
-            email="new@example.com",
-            email_verified=True,
-            username_hint="newuser",
-        )
+        with capture_queries() as stats:
+            got = oauth_login(subject="sub-new", email="new@example.com", username="newuser")
 
-        assert isinstance(got, FakeUser)
-        assert got.id == 1
+        assert got.id is not None
         assert got.email == "new@example.com"
         assert got.username == "newuser"
+        # lookup, INSERT user, INSERT identity ... ON CONFLICT (one CTE on Postgres)
+        assert stats.count == 3
 
-        # Writes happened
-        assert fake_session.committed == 1
-        # identity row created with correct fields
-        assert len(fake_ident_model.created_rows) == 1
-        row = fake_ident_model.created_rows[0]
-        assert row.user_id == 1
+        db.session.expunge_all()
+        (row,) = identities("sub-new")
+        assert row.user_id == got.id
         assert row.provider == "google"
-        assert row.subject == "sub-new"
         assert row.email == "new@example.com"
         assert row.email_verified is True
 
 
-def test_get_or_create_user_does_not_link_if_provider_not_trusted(app, monkeypatch):
+def test_first_login_on_postgres_is_one_statement_after_the_lookup(app):
     with app.app_context():
-        existing = FakeUser(email="linkme@example.com", username="existing", id=10)
-
-        app.config["AUTH_LINK_BY_EMAIL"] = True
-        app.config["AUTH_TRUSTED_EMAIL_PROVIDERS"] = ["google"]  # github not trusted
-
-        fake_user_model = FakeUserModel(existing_user_by_email=existing)
-        fake_ident_model = FakeAuthIdentityModel(existing_identity=None)
-        fake_session = FakeSession()
+        stmt = svc._user_with_identity_statement(
+            "pg@example.com",
+            "pg",
+            {
+                "provider": "github",
+                "subject": "1",
+                "email": "pg@example.com",
+                "email_verified": True,
+            },
+        )
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
 
-        monkeypatch.setattr(svc, "User", fake_user_model)
-        monkeypatch.setattr(svc, "auth_identity", fake_ident_model)
-        monkeypatch.setattr(svc, "db", SimpleNamespace(session=fake_session))
+    assert sql.startswith("WITH new_user AS \n(INSERT INTO users")
+    assert "new_identity AS \n(INSERT INTO auth_identities" in sql
+    assert "ON CONFLICT (provider, subject) DO NOTHING RETURNING auth_identities.user_id" in sql
+    assert sql.rstrip().endswith("JOIN new_identity ON new_identity.user_id = new_user.id")
 
-        def flush_assign():
-            fake_session.flushed += 1
-            for obj in fake_session.added:
-                if isinstance(obj, FakeUser) and obj.id is None:
-                    obj.id = 2
 
-        fake_session.flush = flush_assign  # type: ignore[method-assign]
+def test_get_or_create_user_does_not_link_if_provider_not_trusted(app, db):
+    with app.app_context():
+        app.config["AUTH_LINK_BY_EMAIL"] = True
+        app.config["AUTH_TRUSTED_EMAIL_PROVIDERS"] = ["google"]  # github not trusted
+        existing = User(email="linkme@example.com", username="existing")
+        db.session.add(existing)
+        db.session.commit()
 
-        got = svc.get_or_create_user_from_oauth(
-            provider="github",
-            subject="sub-gh",
-            email="linkme@example.com",
-            email_verified=True,
-            username_hint="hint",
+        got = oauth_login(
+            provider="github", subject="sub-gh", email="linkme@example.com", username="hint"
         )
 
-        # provider not trusted => do NOT use existing
-        assert got.id == 2
-        assert got.email == "linkme@example.com"
+        # provider not trusted => do NOT use existing; the new user leaves its email alone
+        assert got.id != existing.id
+        assert got.email is None
+        assert got.username == "hint"
+        (row,) = identities("sub-gh")
+        assert row.user_id == got.id
+        assert row.email == "linkme@example.com"
 
 
-def test_get_or_create_user_does_not_link_if_email_not_verified(app, monkeypatch):
+def test_get_or_create_user_does_not_link_if_email_not_verified(app, db):
     with app.app_context():
-        existing = FakeUser(email="linkme2@example.com", username="existing2", id=11)
-
         app.config["AUTH_LINK_BY_EMAIL"] = True
         app.config["AUTH_TRUSTED_EMAIL_PROVIDERS"] = ["google"]
+        existing = User(email="linkme2@example.com", username="existing2")
+        db.session.add(existing)
+        db.session.commit()
 
-        fake_user_model = FakeUserModel(existing_user_by_email=existing)
-        fake_ident_model = FakeAuthIdentityModel(existing_identity=None)
-        fake_session = FakeSession()
-
-        monkeypatch.setattr(svc, "User", fake_user_model)
-        monkeypatch.setattr(svc, "auth_identity", fake_ident_model)
-        monkeypatch.setattr(svc, "db", SimpleNamespace(session=fake_session))
-
-        def flush_assign():
-            fake_session.flushed += 1
-            for obj in fake_session.added:
-                if isinstance(obj, FakeUser) and obj.id is None:
-                    obj.id = 3
-
-        fake_session.flush = flush_assign  # type: ignore[method-assign]
-
-        got = svc.get_or_create_user_from_oauth(
-            provider="google",
+        got = oauth_login(
             subject="sub-unverified",
             email="linkme2@example.com",
-            email_verified=False,  # key
-            username_hint="hint",
+            verified=False,
+            username="existing2",  # taken as well
         )
 
-        assert got.id == 3
-        assert got.email == "linkme2@example.com"
+        assert got.id != existing.id
+        assert (got.email, got.username) == (None, None)
+        (row,) = identities("sub-unverified")
+        assert row.user_id == got.id
+        assert row.email_verified is False
 
 
-def test_get_or_create_user_links_existing_user_by_email_when_allowed_and_trusted(app, monkeypatch):
+def test_get_or_create_user_links_existing_user_by_email_when_allowed_and_trusted(app, db):
     with app.app_context():
-        existing = FakeUser(email="trusted@example.com", username="existing3", id=12)
-
         app.config["AUTH_LINK_BY_EMAIL"] = True
         app.config["AUTH_TRUSTED_EMAIL_PROVIDERS"] = ["google"]
+        existing = User(email="trusted@example.com", username="existing3")
+        db.session.add(existing)
+        db.session.commit()
 
-        fake_user_model = FakeUserModel(existing_user_by_email=existing)
-        fake_ident_model = FakeAuthIdentityModel(existing_identity=None)
-        fake_session = FakeSession()
-
-        monkeypatch.setattr(svc, "User", fake_user_model)
-        monkeypatch.setattr(svc, "auth_identity", fake_ident_model)
-        monkeypatch.setattr(svc, "db", SimpleNamespace(session=fake_session))
-
-        got = svc.get_or_create_user_from_oauth(
-            provider="google",
-            subject="sub-linked",
-            email="trusted@example.com",
-            email_verified=True,
-            username_hint="ignored",
-        )
+        got = oauth_login(subject="sub-linked", email="trusted@example.com", username="ignored")
 
         # linked to existing user
-        assert got is existing
-        assert fake_session.committed == 1
-        assert len(fake_ident_model.created_rows) == 1
-        assert fake_ident_model.created_rows[0].user_id == 12
+        assert got.id == existing.id
+        (row,) = identities("sub-linked")
+        assert row.user_id == existing.id
+
+
+@pytest.mark.parametrize("email", [None, "racer@example.com"])
+def test_concurrent_first_logins_resolve_to_one_user(app, db, monkeypatch, email):
+    subject = f"sub-race-{email}"
+    racers = 4
+    everyone_looked = threading.Barrier(racers, timeout=5)
+    lookup = svc._user_for_identity
+    looked_up = threading.local()
+
+    def lookup_then_wait(provider, subject):
+        user = lookup(provider, subject)
+        if not getattr(looked_up, "done", False):
+            # Make every racer miss the identity before anyone inserts it
+            looked_up.done = True
+            everyone_looked.wait()
+        return user
+
+    monkeypatch.setattr(svc, "_user_for_identity", lookup_then_wait)
+    with app.app_context():
+        users_before = User.query.count()
+    results, errors = [], []
+
+    def first_login():
+        try:
+            with app.app_context():
+                results.append(oauth_login(subject=subject, email=email).id)
+        except Exception as e:  # pragma: no cover - reported by the assertion below
+            errors.append(e)
+
+    threads = [threading.Thread(target=first_login) for _ in range(racers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len(set(results)) == 1
+    with app.app_context():
+        (row,) = identities(subject)
+        assert row.user_id == results[0]
+        if email is not None:
+            assert User.query.filter_by(email=email).count() == 1
+        # the losers' users were rolled back, not left behind
+        assert User.query.count() == users_before + 1
 
 
 # ----------------------------
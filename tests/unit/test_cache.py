@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import fnmatch
+import threading
+import time
+
+import pytest
+
+from myapp import create_app
+from myapp.cache import (
+    Cache,
+    MemoryBackend,
+    RedisBackend,
+    SQLiteBackend,
+    cached,
+    cached_view,
+    get_cache,
+    init_cache,
+)
+
+
+class FakeRedis:
+    """The handful of redis.Redis methods RedisBackend uses."""
+
+    def __init__(self) -> None:
+        self.data: dict[str, tuple[float, bytes]] = {}
+        self.lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[0] <= time.time():
+            del self.data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self.lock:
+            entry = self._live(key)
+            return entry[1] if entry else None
+
+    def mget(self, keys):
+        return [self.get(k) for k in keys]
+
+    def set(self, key, value, px=None, nx=False):
+        with self.lock:
+            if nx and self._live(key):
+                return None
+            expires = time.time() + px / 1000 if px else float("inf")
+            self.data[key] = (expires, value)
+            return True
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.data.pop(key, None)
+
+    def incr(self, key):
+        with self.lock:
+            entry = self._live(key)
+            value = int(entry[1]) + 1 if entry else 1
+            self.data[key] = (float("inf"), str(value).encode())
+            return value
+
+    def scan_iter(self, match):
+        return [k for k in list(self.data) if fnmatch.fnmatch(k, match)]
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend()
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+    return RedisBackend(FakeRedis(), prefix="test:")
+
+
+def test_get_set_expiry_and_delete(backend):
+    cache = Cache(backend)
+    assert cache.get("a", "default") == "default"
+    cache.set("a", {"nested": [1, 2]})
+    assert cache.get("a") == {"nested": [1, 2]}
+
+    cache.set("short", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+
+    cache.delete("a")
+    assert cache.get("a") is None
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 3,
+        "stale": 0,
+        "coalesced": 0,
+        "errors": 0,
+        "hit_ratio": 0.25,
+    }
+
+    cache.set("b", 2)
+    cache.clear()
+    assert cache.get("b") is None
+
+
+def test_tag_invalidation_across_instances(backend):
+    # Two Cache objects on one backend stand in for two workers
+    first, second = Cache(backend, prefix="p:"), Cache(backend, prefix="p:")
+    first.set("user:1:profile", "old", tags=["user:1"])
+    first.set("user:2:profile", "other", tags=["user:2"])
+    first.set("untagged", "kept")
+
+    second.invalidate_tags("user:1")
+    assert first.get("user:1:profile") is None
+    assert first.stale == 1
+    assert first.get("user:2:profile") == "other"
+    assert first.get("untagged") == "kept"
+
+    first.set("user:1:profile", "new", tags=["user:1"])
+    assert second.get("user:1:profile") == "new"
+
+
+def test_memory_tag_versions_survive_eviction():
+    backend = MemoryBackend(maxsize=2)
+    cache = Cache(backend, prefix="p:")
+    cache.set("user:1:profile", "old", tags=["user:1"])
+    old = backend.get("p:v:user:1:profile")
+    cache.invalidate_tags("user:1")
+
+    for n in range(5):  # LRU pressure well past maxsize
+        cache.set(f"filler:{n}", n)
+    assert len(backend) == 2
+
+    # Written before the invalidation (e.g. by another worker): still stale
+    backend.set("p:v:user:1:profile", old, 60)
+    assert cache.get("user:1:profile") is None
+    assert cache.stale == 1
+
+
+def test_backend_add_is_set_if_absent(backend):
+    assert backend.add("lock", b"1", 10)
+    assert not backend.add("lock", b"2", 10)
+    backend.delete("lock")
+    assert backend.add("lock", b"3", 0.01)
+    time.sleep(0.02)
+    assert backend.add("lock", b"4", 10)  # expired entries can be taken over
+
+
+def test_concurrent_misses_compute_once(backend):
+    cache = Cache(backend)
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_set("k", compute)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+    assert cache.coalesced == 7
+    assert cache.get_or_set("k", compute) == "value"
+    assert len(calls) == 1
+
+
+def test_other_worker_waits_for_shared_computation(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    workers = [Cache(SQLiteBackend(path), poll_interval=0.01) for _ in range(2)]
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append("slow")
+        started.set()
+        release.wait(5)
+        return 42
+
+    leader = threading.Thread(target=lambda: workers[0].get_or_set("report", slow))
+    leader.start()
+    assert started.wait(5)
+    threading.Timer(0.05, release.set).start()
+
+    assert workers[1].get_or_set("report", lambda: calls.append("fast") or 0) == 42
+    leader.join()
+    assert calls == ["slow"]
+    assert workers[1].coalesced == 1
+
+
+def test_failing_backend_degrades_to_computing(caplog):
+    class Broken:
+        def __getattr__(self, name):
+            def fail(*args, **kwargs):
+                raise ConnectionError("cache down")
+
+            return fail
+
+    cache = Cache(Broken())
+    assert cache.get_or_set("k", lambda: "computed") == "computed"
+    cache.set("k", 1)
+    assert cache.get("k") is None
+    assert cache.stats()["errors"] == 4
+    assert "computing without it" in caplog.text
+
+
+def test_store_if_vetoes_results():
+    cache = Cache(MemoryBackend())
+    cache.get_or_set("k", lambda: None, store_if=lambda v: v is not None)
+    assert cache.get_or_set("k", lambda: "real") == "real"
+
+
+def test_cached_function_with_tags(app):
+    calls = []
+
+    @cached(ttl=60, tags=lambda user_id: [f"user:{user_id}"])
+    def profile(user_id):
+        calls.append(user_id)
+        return {"id": user_id}
+
+    assert profile(1) == {"id": 1}  # no app context: not cached
+    with app.app_context():
+        profile(1)
+        profile(1)
+        profile(2)
+        assert calls == [1, 1, 2]
+
+        get_cache().invalidate_tags("user:1")
+        profile(1)
+        profile(2)
+        assert calls == [1, 1, 2, 1]
+
+        profile.invalidate(2)
+        profile(2)
+        assert calls == [1, 1, 2, 1, 2]
+
+
+def test_cached_view():
+    app = create_app("testing")
+    renders = []
+
+    @app.get("/cached-page")
+    @cached_view(ttl=60, tags=["pages"])
+    def page():
+        renders.append(1)
+        return f"rendered {len(renders)}"
+
+    @app.get("/cached-missing")
+    @cached_view(ttl=60)
+    def missing():
+        renders.append(1)
+        return "nope", 404
+
+    client = app.test_client()
+    first = client.get("/cached-page?x=1")
+    assert first.headers["X-Cache"] == "MISS"
+    second = client.get("/cached-page?x=1")
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.get_data(as_text=True) == "rendered 1"
+    assert second.mimetype == "text/html"
+    assert client.get("/cached-page?x=2").get_data(as_text=True) == "rendered 2"
+
+    app.extensions["cache"].invalidate_tags("pages")
+    assert client.get("/cached-page?x=1").get_data(as_text=True) == "rendered 3"
+
+    client.get("/cached-missing")
+    assert client.get("/cached-missing").status_code == 404
+    assert len(renders) == 5  # error responses are not cached
+
+
+def test_cache_invalidate_cli(app):
+    with app.app_context():
+        get_cache().set("tagged", 1, tags=["cli"])
+    result = app.test_cli_runner().invoke(args=["cache-invalidate", "cli"])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert get_cache().get("tagged") is None
+
+
+def test_disabled_and_unknown_urls(monkeypatch):
+    monkeypatch.setenv("CACHE_ENABLED", "0")
+    app = create_app("testing")
+    assert init_cache(app) is None
+    result = app.test_cli_runner().invoke(args=["cache-invalidate", "x"])
+    assert "disabled" in result.output
+
+    monkeypatch.setenv("CACHE_ENABLED", "1")
+    monkeypatch.setenv("CACHE_URL", "memcached://localhost")
+    with pytest.raises(ValueError, match="memcached"):
+        create_app("testing")
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import pytest
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
+
+from myapp import config
+
+
+@pytest.fixture(autouse=True)
+def _clean_pool_env(monkeypatch):
+    for name in (
+        "DB_POOL_SIZE",
+        "DB_MAX_OVERFLOW",
+        "DB_POOL_TIMEOUT",
+        "DB_POOL_RECYCLE",
+        "DB_POOL_PRE_PING",
+        "DB_PGBOUNCER",
+    ):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_postgres_defaults_use_queue_pool_with_pre_ping():
+    opts = config._engine_options("postgresql+psycopg://u:p@localhost/db")
+    assert opts["poolclass"] is QueuePool
+    assert opts["pool_pre_ping"] is True
+    assert opts["pool_recycle"] == 1800
+    assert opts["pool_size"] == 10
+
+
+def test_postgres_pool_settings_from_env(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("DB_POOL_TIMEOUT", "2.5")
+    monkeypatch.setenv("DB_POOL_RECYCLE", "300")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "0")
+
+    opts = config._engine_options("postgresql+psycopg://u:p@localhost/db")
+    assert opts["pool_size"] == 20
+    assert opts["max_overflow"] == 0
+    assert opts["pool_timeout"] == 2.5
+    assert opts["pool_recycle"] == 300
+    assert opts["pool_pre_ping"] is False
+
+
+def test_pgbouncer_mode_disables_pooling_and_prepared_statements(monkeypatch):
+    monkeypatch.setenv("DB_PGBOUNCER", "1")
+    opts = config._engine_options("postgresql+psycopg://u:p@localhost/db")
+    assert opts == {"poolclass": NullPool, "connect_args": {"prepare_threshold": None}}
+
+
+@pytest.mark.parametrize("url", ["sqlite://", "sqlite:///:memory:"])
+def test_sqlite_memory_uses_static_pool(url):
+    opts = config._engine_options(url)
+    assert opts["poolclass"] is StaticPool
+    assert opts["connect_args"] == {"check_same_thread": False}
+
+
+def test_sqlite_file_uses_queue_pool():
+    opts = config._engine_options("sqlite:////tmp/app.sqlite3")
+    assert opts["poolclass"] is QueuePool
+    assert "pool_recycle" not in opts
+
+
+def test_build_config_fills_engine_options(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgresql+psycopg://u:p@localhost/db")
+    d = config.build_config("production")
+    assert d["SQLALCHEMY_ENGINE_OPTIONS"]["poolclass"] is QueuePool
@@ -1,6 +1,8 @@
 import pytest
+from flask import abort, jsonify
 
 from myapp import create_app
+from myapp.errors import _accept_prefers_html
 
 
 @pytest.fixture()
@@ -12,6 +14,10 @@ def app():
     def boom():
         raise RuntimeError("boom")
 
+    @app.get("/custom-404")
+    def custom_404():
+        abort(404, description="No such widget")
+
     return app
 
 
@@ -50,3 +56,59 @@ def test_json_500_returns_json(client):
     assert data["error"] == "internal_server_error"
     assert "request_id" in data
     assert r.headers.get("X-Request-ID")
+
+
+def test_html_error_page_urls_follow_the_mount_point(client):
+    # Mounted under a prefix by the WSGI server or a dispatcher
+    r = client.get(
+        "/nope", headers={"Accept": "text/html"}, environ_overrides={"SCRIPT_NAME": "/shop"}
+    )
+    assert r.status_code == 404
+    assert b'href="/shop/static/css/errors.css"' in r.data
+    assert b'href="/shop/">Back to home' in r.data
+
+    r = client.get("/nope", headers={"Accept": "text/html"})
+    assert b'href="/static/css/errors.css"' in r.data
+
+
+def test_html_error_page_escapes_request_id(client):
+    r = client.get("/nope", headers={"Accept": "text/html", "X-Request-ID": "<b>rid</b>"})
+    assert r.status_code == 404
+    assert b"&lt;b&gt;rid&lt;/b&gt;" in r.data
+    assert b"<b>rid</b>" not in r.data
+
+
+def test_html_error_page_does_not_touch_session(client):
+    r = client.get("/nope", headers={"Accept": "text/html"})
+    assert "Set-Cookie" not in r.headers
+
+
+def test_prebuilt_json_matches_dynamic_format(app, client):
+    r = client.get("/nope", headers={"Accept": "application/json", "X-Request-ID": 'a"b'})
+    assert r.mimetype == "application/json"
+    assert r.get_json() == {
+        "error": "not_found",
+        "message": (
+            "The requested URL was not found on the server. If you entered the URL manually "
+            "please check your spelling and try again."
+        ),
+        "request_id": 'a"b',
+    }
+    with app.test_request_context():
+        expected = jsonify(r.get_json()).get_data()
+    assert r.data == expected
+
+
+def test_custom_description_is_not_served_from_prebuilt_body(client):
+    r = client.get("/custom-404", headers={"Accept": "application/json"})
+    assert r.status_code == 404
+    assert r.get_json()["message"] == "No such widget"
+
+
+def test_accept_negotiation_is_memoized(client):
+    accept = "text/html;q=0.9, application/json;q=0.8, */*;q=0.1"
+    before = _accept_prefers_html.cache_info().hits
+    client.get("/nope", headers={"Accept": accept})
+    client.get("/nope", headers={"Accept": accept})
+    assert _accept_prefers_html.cache_info().hits > before
+    assert _accept_prefers_html(accept) is True
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import logging
+
+import pytest
+
+import myapp.errors as errors
+from myapp import create_app
+from myapp.errors import ExceptionLogLimiter, exception_fingerprint
+
+
+def _raise(exc_type=RuntimeError):
+    try:
+        raise exc_type("boom")
+    except Exception as e:
+        return e
+
+
+def _raise_elsewhere():
+    try:
+        raise RuntimeError("boom")
+    except Exception as e:
+        return e
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(errors.time, "monotonic", clock)
+    return clock
+
+
+def test_fingerprint_depends_on_type_and_raise_site():
+    assert exception_fingerprint(_raise()) == exception_fingerprint(_raise())
+    assert exception_fingerprint(_raise()) != exception_fingerprint(_raise(ValueError))
+    assert exception_fingerprint(_raise()) != exception_fingerprint(_raise_elsewhere())
+
+
+def test_burst_logged_in_full_rest_counted(caplog, clock):
+    logger = logging.getLogger("test.limiter")
+    limiter = ExceptionLogLimiter(logger, window=60, burst=2)
+
+    with caplog.at_level(logging.WARNING, logger="test.limiter"):
+        logged = [limiter.log(_raise(), f"rid-{i}") for i in range(5)]
+
+    assert logged == [True, True, False, False, False]
+    full = [r for r in caplog.records if r.exc_info]
+    assert len(full) == 2
+    assert limiter.suppressed_total == 3
+
+
+def test_summary_emitted_when_window_closes(caplog, clock):
+    logger = logging.getLogger("test.limiter")
+    limiter = ExceptionLogLimiter(logger, window=60, burst=1, sample_ids=2)
+    for i in range(4):
+        limiter.log(_raise(), f"rid-{i}")
+    caplog.clear()
+
+    with caplog.at_level(logging.WARNING, logger="test.limiter"):
+        limiter.flush()
+        assert not caplog.records  # window still open
+
+        clock.now += 61
+        limiter.flush()
+
+    [summary] = caplog.records
+    message = summary.getMessage()
+    assert "Suppressed 3 duplicate RuntimeError exceptions" in message
+    assert "rid-1,rid-2" in message
+    assert "rid-3" not in message
+
+
+def test_new_window_logs_in_full_again(clock):
+    limiter = ExceptionLogLimiter(logging.getLogger("test.limiter"), window=10, burst=1)
+    assert limiter.log(_raise(), None) is True
+    assert limiter.log(_raise(), None) is False
+
+    clock.now += 11
+    assert limiter.log(_raise(), None) is True
+
+
+def test_app_rate_limits_unhandled_exception_logs(monkeypatch, caplog):
+    monkeypatch.setenv("ERROR_LOG_BURST", "1")
+    app = create_app("testing")
+    app.config["PROPAGATE_EXCEPTIONS"] = False
+
+    @app.get("/boom")
+    def boom():
+        raise RuntimeError("boom")
+
+    client = app.test_client()
+    with caplog.at_level(logging.ERROR, logger=app.logger.name):
+        for _ in range(3):
+            assert client.get("/boom").status_code == 500
+
+    assert len([r for r in caplog.records if r.exc_info]) == 1
+    assert app.extensions["exception_log_limiter"].suppressed_total == 2
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import runpy
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from myapp.extensions import db
+
+CONF = Path(__file__).resolve().parents[2] / "docker" / "gunicorn.conf.py"
+
+
+def _load(monkeypatch, **env):
+    for name in ("GUNICORN_WORKERS", "GUNICORN_WORKER_CLASS", "GUNICORN_THREADS"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return runpy.run_path(str(CONF))
+
+
+def test_defaults_size_sync_workers_from_cpu(monkeypatch):
+    conf = _load(monkeypatch)
+    assert conf["worker_class"] == "sync"
+    assert conf["workers"] == 2 * conf["_cpu_count"]() + 1
+    assert conf["preload_app"] is True
+    assert 0 < conf["max_requests_jitter"] < conf["max_requests"]
+
+
+def test_gthread_and_env_overrides(monkeypatch):
+    conf = _load(
+        monkeypatch,
+        GUNICORN_WORKER_CLASS="gthread",
+        GUNICORN_WORKERS="3",
+        GUNICORN_THREADS="8",
+    )
+    assert conf["worker_class"] == "gthread"
+    assert conf["workers"] == 3
+    assert conf["threads"] == 8
+
+
+def test_unknown_worker_class_rejected(monkeypatch):
+    with pytest.raises(RuntimeError, match="GUNICORN_WORKER_CLASS"):
+        _load(monkeypatch, GUNICORN_WORKER_CLASS="eventlet")
+
+
+def test_post_fork_disposes_inherited_pool(app, monkeypatch):
+    conf = _load(monkeypatch)
+    with app.app_context():
+        old_pool = db.engine.pool
+
+    server = SimpleNamespace(
+        cfg=SimpleNamespace(preload_app=True),
+        app=SimpleNamespace(wsgi=lambda: app),
+    )
+    worker = SimpleNamespace()
+    conf["post_fork"](server, worker)
+
+    assert worker.boot_started > 0
+    with app.app_context():
+        assert db.engine.pool is not old_pool
+
+
+def test_metrics_dir_cleared_at_start_and_dead_worker_gauges_dropped(monkeypatch, tmp_path):
+    conf = _load(monkeypatch, METRICS_DIR=str(tmp_path))
+    (tmp_path / "values_1.db").write_bytes(b"")
+    conf["on_starting"](SimpleNamespace())
+    assert not list(tmp_path.iterdir())
+
+    (tmp_path / "values_42.db").write_bytes(b"")
+    (tmp_path / "live_42.db").write_bytes(b"")
+    conf["child_exit"](SimpleNamespace(), SimpleNamespace(pid=42))
+    assert [p.name for p in tmp_path.iterdir()] == ["values_42.db"]
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import myapp.auth.hashing as hashing
+from myapp import create_app
+from myapp.auth.hashing import EXTENSION_KEY, HashExecutor, HashingUnavailable
+from myapp.metrics import render
+from myapp.models import User
+from tests.helpers import create_user, login
+
+
+@pytest.fixture()
+def gate():
+    gate = threading.Event()
+    yield gate
+    gate.set()
+
+
+def _occupy(executor: HashExecutor, gate: threading.Event) -> threading.Thread:
+    """Hold one executor slot until `gate` is set."""
+    started = threading.Event()
+
+    def blocked():
+        started.set()
+        gate.wait(5)
+
+    def submit():
+        try:
+            executor.run(blocked)
+        except HashingUnavailable:  # the holder may stop waiting too; its slot stays taken
+            pass
+
+    t = threading.Thread(target=submit)
+    t.start()
+    assert started.wait(5)
+    return t
+
+
+def test_rejects_when_workers_and_queue_are_full(gate):
+    executor = HashExecutor(max_workers=1, max_queue=0, retry_after=7)
+    holder = _occupy(executor, gate)
+
+    with pytest.raises(HashingUnavailable) as exc_info:
+        executor.run(lambda: "never")
+    assert dict(exc_info.value.get_headers())["Retry-After"] == "7"
+    assert executor.rejected == 1
+
+    gate.set()
+    holder.join()
+    assert executor.run(lambda: "ok") == "ok"
+    executor.shutdown()
+
+
+def test_gives_up_waiting_after_timeout(gate):
+    executor = HashExecutor(max_workers=1, max_queue=1, wait_timeout=0.05)
+    holder = _occupy(executor, gate)
+
+    with pytest.raises(HashingUnavailable):
+        executor.run(lambda: "queued behind the blocked hash")
+
+    gate.set()
+    holder.join()
+    executor.shutdown()
+
+
+def test_executor_usable_after_fork_reset():
+    executor = HashExecutor(max_workers=1, max_queue=0)
+    assert executor.run(lambda: 1) == 1
+    hashing._after_fork_in_child()
+    assert executor.run(lambda: 2) == 2
+    executor.shutdown()
+
+
+def test_saturated_login_fails_fast_with_503(app, db, gate):
+    with app.app_context():
+        create_user(db, email="hash@example.com", username="hash")
+
+    busy_app = create_app("testing")
+    executor = HashExecutor(max_workers=1, max_queue=0, retry_after=3)
+    busy_app.extensions[EXTENSION_KEY] = executor
+    holder = _occupy(executor, gate)
+    client = busy_app.test_client()
+
+    form = {"email": "hash@example.com", "password": "supersecret123"}
+    resp = client.post("/auth/login", data=form)
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "3"
+    assert resp.get_json()["error"] == "service_unavailable"
+
+    page = client.post("/auth/login", data=form, headers={"Accept": "text/html"})
+    assert page.status_code == 503
+    assert page.headers["Retry-After"] == "3"
+    assert b"503" in page.data
+
+    gate.set()
+    holder.join()
+    assert client.post("/auth/login", data=form).status_code == 302
+
+    text = render(busy_app.extensions["metrics"].collect())
+    assert 'myapp_password_hash_rejections_total{op="verify"} 2.0' in text
+    assert 'myapp_password_hash_seconds_count{op="verify"} 1.0' in text
+
+
+def test_canonical_method_and_needs_rehash():
+    assert hashing.canonical_method("scrypt") == "scrypt:32768:8:1"
+    assert hashing.canonical_method("pbkdf2") == "pbkdf2:sha256:1000000"
+    assert hashing.canonical_method("pbkdf2:sha512") == "pbkdf2:sha512:1000000"
+    with pytest.raises(ValueError):
+        hashing.canonical_method("md5")
+
+    pwhash = generate_password_hash("pw", "pbkdf2:sha256:1000")
+    assert not hashing.needs_rehash(pwhash, "pbkdf2:sha256:1000")
+    assert hashing.needs_rehash(pwhash, "pbkdf2")
+    assert hashing.needs_rehash(pwhash)  # outside an app: werkzeug's default
+
+
+def _fake_benchmark(monkeypatch, timings):
+    monkeypatch.setattr(hashing, "benchmark", lambda method, rounds=3: timings[method])
+
+
+def test_calibrate_picks_strongest_scrypt_within_target(monkeypatch):
+    timings = dict(zip(hashing.SCRYPT_CANDIDATES, (50, 100, 200, 400), strict=True))
+    _fake_benchmark(monkeypatch, timings)
+
+    best, results = hashing.calibrate(150)
+    assert best.method == "scrypt:32768:8:1"
+    # scrypt stops at the first candidate over target
+    assert [m.method for m in results if m.method.startswith("scrypt")] == list(
+        hashing.SCRYPT_CANDIDATES[:3]
+    )
+
+
+def test_calibrate_falls_back_to_pbkdf2(monkeypatch):
+    timings = dict.fromkeys(hashing.SCRYPT_CANDIDATES, 500)
+    timings.update(zip(hashing.PBKDF2_CANDIDATES, (40, 80, 120, 180, 240), strict=True))
+    _fake_benchmark(monkeypatch, timings)
+
+    best, _ = hashing.calibrate(200)
+    assert best.method == "pbkdf2:sha256:1500000"
+
+    best, results = hashing.calibrate(1000, families=("scrypt",), max_memory_kib=20 * 1024)
+    assert best.method == "scrypt:16384:8:1"  # 16 MiB; the 32 MiB candidate is skipped
+    assert len(results) == 1
+
+
+def test_calibrate_cli_writes_env_file(monkeypatch, app, tmp_path):
+    timings = dict(zip(hashing.SCRYPT_CANDIDATES, (50, 100, 200, 400), strict=True))
+    _fake_benchmark(monkeypatch, timings)
+    env_file = tmp_path / ".env"
+    env_file.write_text("SECRET_KEY=x\n")
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(
+        args=["calibrate-hash", "--target-ms", "250", "--write", "--env-file", str(env_file)]
+    )
+    assert result.exit_code == 0, result.output
+    assert "PASSWORD_HASH_METHOD=scrypt:65536:8:1" in result.output
+    assert env_file.read_text() == "SECRET_KEY=x\nPASSWORD_HASH_METHOD=scrypt:65536:8:1\n"
+
+    result = runner.invoke(args=["calibrate-hash", "--target-ms", "10", "--family", "scrypt"])
+    assert result.exit_code != 0
+    assert "No candidate" in result.output
+
+
+def test_login_upgrades_outdated_hash(monkeypatch, app, db):
+    with app.app_context():
+        user = create_user(db, email="rehash@example.com", username="rehash")
+        user.password_hash = generate_password_hash("supersecret123", "pbkdf2:sha256:1000")
+        db.session.commit()
+
+    monkeypatch.setenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256:2000")
+    client = create_app("testing").test_client()
+    assert login(client, email="rehash@example.com").status_code == 302
+
+    with app.app_context():
+        stored = User.query.filter_by(email="rehash@example.com").one().password_hash
+    assert stored.startswith("pbkdf2:sha256:2000$")
+
+
+def test_invalid_method_fails_at_startup(monkeypatch):
+    monkeypatch.setenv("PASSWORD_HASH_METHOD", "md5")
+    with pytest.raises(ValueError, match="md5"):
+        create_app("testing")
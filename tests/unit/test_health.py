@@ -1,4 +1,8 @@
+import myapp.health as health
 from myapp import create_app
+from myapp.extensions import db
+from myapp.health import HealthMonitor
+from myapp.querystats import capture_queries
 
 
 def test_health_endpoint():
@@ -9,3 +13,101 @@ def test_health_endpoint():
     assert r.status_code == 200
     assert r.get_json() == {"status": "ok"}
     assert r.headers.get("X-Request-ID")
+
+
+def test_live_and_ready(app, client):
+    assert client.get("/health/live").get_json() == {"status": "ok"}
+
+    resp = client.get("/health/ready")
+    assert resp.status_code == 200, resp.get_json()
+    body = resp.get_json()
+    assert body["status"] == "ready"
+    assert body["checks"]["database"]["ok"]
+    assert body["checks"]["pool"]["capacity"] >= 1
+    assert body["checks"]["migrations"]["required"] is False  # schema from create_all
+
+    # Answered from the probe thread's last results, not by querying
+    with capture_queries() as stats:
+        assert client.get("/health/ready").status_code == 200
+    assert stats.count == 0
+
+
+def test_ready_reports_migration_mismatch(app):
+    monitor = HealthMonitor(app)
+    app.config["HEALTH_REQUIRE_MIGRATIONS"] = True
+    try:
+        monitor.refresh()
+    finally:
+        app.config["HEALTH_REQUIRE_MIGRATIONS"] = False
+    ready, body = monitor.report()
+    monitor.stop()
+    assert not ready
+    migrations = body["checks"]["migrations"]
+    assert migrations["current"] == []  # no alembic_version table in the test schema
+    assert migrations["head"]
+
+
+def test_pool_capacity_comes_from_the_engine_options(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'capacity.sqlite3'}")
+    monkeypatch.setenv("DB_POOL_SIZE", "2")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "3")
+    app = create_app("testing")
+    monitor = app.extensions["health"]
+    monitor.refresh()
+    monitor.stop()
+    assert monitor.results["pool"]["capacity"] == 5
+
+    with app.app_context():
+        unbounded = health._check_pool(db.engine, 1.0, -1)
+    assert unbounded["ok"] and unbounded["capacity"] is None
+
+
+def test_saturated_pool_and_dead_database_are_not_ready(monkeypatch, tmp_path, caplog):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'pool.sqlite3'}")
+    monkeypatch.setenv("DB_POOL_SIZE", "1")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("DB_POOL_TIMEOUT", "0.05")
+    app = create_app("testing")
+    monitor = app.extensions["health"]
+
+    with app.app_context():
+        held = db.engine.connect()
+    try:
+        monitor.refresh()
+    finally:
+        held.close()
+    checks = monitor.results
+    assert checks["pool"]["saturation"] == 1.0
+    assert not checks["pool"]["ok"]
+    assert not checks["database"]["ok"]  # could not get a connection in time
+    assert app.test_client().get("/health/ready").status_code == 503
+    monitor.stop()
+
+    missing_dir = tmp_path / "missing" / "db.sqlite3"
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{missing_dir}")
+    dead = create_app("testing").extensions["health"]
+    dead.refresh()
+    assert dead.results["database"]["error"] == "OperationalError"
+    assert str(missing_dir) not in str(dead.results)
+    assert "unable to open database file" in caplog.text  # the detail is only logged
+
+
+def test_stale_results_are_not_ready(app):
+    monitor = HealthMonitor(app, interval=1.0)
+    monitor.refresh()
+    assert monitor.report()[0]
+    monitor.checked_at -= 10
+    ready, body = monitor.report()
+    assert not ready
+    assert body["status"] == "stale"
+    monitor.stop()
+
+
+def test_probe_thread_restarts_after_fork(app):
+    monitor = HealthMonitor(app, interval=0.01)
+    monitor.ensure_started()
+    assert monitor.report()[0]
+    health._after_fork_in_child()
+    assert monitor.checked_at is None
+    assert monitor.report()[0]  # a new thread probed again
+    monitor.stop()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import logging
+
+import pytest
+
+import myapp.logs as logs
+from myapp import create_app
+from myapp.logs import JsonFormatter, SamplingFilter
+
+
+@pytest.fixture()
+def json_app(monkeypatch, tmp_path):
+    root = logging.getLogger()
+    saved_level = root.level
+    log_file = tmp_path / "app.log"
+    monkeypatch.setenv("LOG_JSON", "1")
+    monkeypatch.setenv("LOG_ACCESS", "1")
+    monkeypatch.setenv("LOG_FILE", str(log_file))
+    monkeypatch.setenv("LOG_LEVELS", "test.verbose=DEBUG")
+
+    app = create_app("testing")
+
+    def records():
+        logs.shutdown_logging()  # drains the queue
+        return [json.loads(line) for line in log_file.read_text().splitlines()]
+
+    yield app, records
+
+    logs.shutdown_logging()
+    root.setLevel(saved_level)
+    logging.getLogger("test.verbose").setLevel(logging.NOTSET)
+
+
+def test_access_record_carries_request_context(json_app):
+    app, records = json_app
+
+    r = app.test_client().get("/health", headers={"X-Request-ID": "rid-123"})
+    assert r.status_code == 200
+
+    [access] = [rec for rec in records() if rec["logger"] == logs.ACCESS_LOGGER]
+    assert access["message"] == "GET /health 200"
+    assert access["request_id"] == "rid-123"
+    assert access["endpoint"] == "health"
+    assert access["latency_ms"] >= 0
+    assert access["status"] == 200
+
+
+def test_exceptions_are_formatted_by_listener(json_app):
+    app, records = json_app
+    try:
+        raise ValueError("bad")
+    except ValueError:
+        app.logger.exception("failed %s", "here")
+
+    [rec] = [rec for rec in records() if rec["logger"] == app.logger.name]
+    assert rec["message"] == "failed here"
+    assert "ValueError: bad" in rec["exc"]
+    assert "request_id" not in rec
+
+
+def test_per_logger_levels_from_env(json_app):
+    _, records = json_app
+    logging.getLogger("test.verbose").debug("detail")
+
+    assert [rec["message"] for rec in records() if rec["logger"] == "test.verbose"] == ["detail"]
+
+
+def test_listener_restarts_after_fork(json_app):
+    _, records = json_app
+    old_listener = logs._pipeline.listener
+
+    logs._after_fork_in_child()
+    logging.getLogger("test.verbose").warning("from child")
+
+    assert logs._pipeline.listener is not old_listener
+    assert "from child" in [rec["message"] for rec in records()]
+
+
+def test_sampling_filter_only_thins_low_levels():
+    f = SamplingFilter({"myapp": 0.0, "myapp.access": 1.0})
+
+    def rec(name, level):
+        return logging.makeLogRecord({"name": name, "levelno": level})
+
+    assert f.filter(rec("myapp.auth", logging.INFO)) is False
+    assert f.filter(rec("myapp.auth", logging.WARNING)) is True
+    assert f.filter(rec("myapp.access", logging.INFO)) is True
+    assert f.filter(rec("other", logging.DEBUG)) is True
+    assert f.rate_for("myapplication") == 1.0
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logging.makeLogRecord(
+        {"name": "x", "levelno": logging.INFO, "levelname": "INFO", "msg": "hi", "user_id": 7}
+    )
+    data = json.loads(JsonFormatter().format(record))
+    assert data["message"] == "hi"
+    assert data["user_id"] == 7
+    assert "ts" in data
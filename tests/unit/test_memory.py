@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import tracemalloc
+
+import pytest
+
+from myapp.memory import MemoryInspector, SnapshotError, process_stats
+from myapp.models import User
+from tests.helpers import create_user, login
+
+
+@pytest.fixture()
+def inspector():
+    inspector = MemoryInspector(max_snapshots=2)
+    yield inspector
+    tracemalloc.stop()
+
+
+def _leak(n: int) -> list[bytearray]:
+    return [bytearray(1024) for _ in range(n)]
+
+
+def test_diff_points_at_the_allocating_line(inspector):
+    with pytest.raises(SnapshotError):
+        inspector.snapshot("before")
+
+    inspector.start()
+    inspector.snapshot("before")
+    kept = _leak(500)
+    inspector.snapshot("after")
+
+    [biggest] = inspector.diff("before", "after", limit=1)
+    assert biggest["where"].startswith(__file__)
+    assert biggest["size_diff_kib"] >= 500
+    assert biggest["count_diff"] >= 500
+
+    [by_file] = inspector.top("after", group="filename", limit=1)
+    assert by_file["where"] == __file__
+    del kept
+
+
+def test_oldest_snapshots_are_dropped(inspector):
+    inspector.start()
+    for name in ("a", "b", "c"):
+        inspector.snapshot(name)
+    assert [s["name"] for s in inspector.snapshots()] == ["b", "c"]
+    with pytest.raises(SnapshotError):
+        inspector.top("a")
+    with pytest.raises(ValueError):
+        inspector.top("b", group="function")
+
+
+def test_process_stats_report_identity_maps(app, db):
+    with app.app_context():
+        create_user(db, email="mem@example.com", username="mem")
+        users = User.query.all()  # the identity map holds instances weakly
+        stats = process_stats()
+        assert stats["identity_map_total"] >= len(users) >= 1
+    assert len(stats["gc_counts"]) == 3
+    assert stats["pid"] > 0
+
+
+def test_admin_memory_pages(app, client, db):
+    with app.app_context():
+        create_user(db, email="mem-admin@example.com", username="mem-admin", is_admin=True)
+    login(client, email="mem-admin@example.com")
+
+    try:
+        assert client.post("/admin/memory/snapshot").status_code == 409
+        client.post("/admin/memory/start")
+        client.post("/admin/memory/snapshot", data={"name": "one"})
+        client.post("/admin/memory/snapshot", data={"name": "two"})
+
+        page = client.get("/admin/memory/?snapshot=two").get_data(as_text=True)
+        assert "Top allocation sites" in page
+
+        report = client.get("/admin/memory/report.json?old=one&new=two&group=filename").json
+        assert report["stats"]["tracing"] is True
+        assert [s["name"] for s in report["snapshots"]] == ["one", "two"]
+        assert "diff" in report
+
+        assert client.get("/admin/memory/report.json?snapshot=nope").status_code == 404
+        assert client.get("/admin/memory/?snapshot=two&group=x").status_code == 400
+        assert client.post("/admin/memory/explode").status_code == 404
+    finally:
+        client.post("/admin/memory/stop")
+    assert not tracemalloc.is_tracing()
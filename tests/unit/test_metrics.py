@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+
+import pytest
+
+import myapp.metrics as metrics_mod
+from myapp import create_app
+from myapp.extensions import db
+from myapp.metrics import Metrics, MmapStore, mark_process_dead, read_file, render
+
+
+def _sample(text: str, line_prefix: str) -> float:
+    [line] = [line for line in text.splitlines() if line.startswith(line_prefix + " ")]
+    return float(line.rsplit(" ", 1)[1])
+
+
+def test_mmap_store_roundtrip_and_growth(tmp_path):
+    path = str(tmp_path / "values_1.db")
+    store = MmapStore(path)
+    for i in range(3000):  # well past the initial 64 KiB
+        store.add(f"key-{i}", 1.0)
+    store.add("key-7", 2.5)
+    store.set("gauge", 4.0)
+
+    samples = dict(read_file(path))
+    assert len(samples) == 3001
+    assert samples["key-7"] == 3.5
+    assert samples["gauge"] == 4.0
+    store.close()
+
+    # Reopening continues where the file left off
+    reopened = MmapStore(path)
+    reopened.add("key-7", 1.0)
+    assert dict(reopened.items())["key-7"] == 4.5
+    reopened.close()
+
+
+def _worker(directory):
+    m = Metrics(directory)
+    m.inc("myapp_http_requests_total", (("endpoint", "x"),), 3)
+    m.add_gauge("myapp_http_requests_in_flight", 2)
+
+
+def test_samples_merge_across_processes(tmp_path):
+    directory = str(tmp_path)
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_worker, args=(directory,)) for _ in range(2)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+    m = Metrics(directory)
+    m.inc("myapp_http_requests_total", (("endpoint", "x"),))
+    text = render(m.collect())
+    assert _sample(text, 'myapp_http_requests_total{endpoint="x"}') == 7
+    assert _sample(text, "myapp_http_requests_in_flight") == 4
+
+    # A dead worker's gauges go away, its counters stay
+    mark_process_dead(procs[0].pid, directory)
+    text = render(m.collect())
+    assert _sample(text, 'myapp_http_requests_total{endpoint="x"}') == 7
+    assert _sample(text, "myapp_http_requests_in_flight") == 2
+
+
+def test_histogram_buckets_are_cumulative():
+    m = Metrics()
+    for value in (0.003, 0.02, 0.02, 30):
+        m.observe("myapp_http_request_duration_seconds", value, (("endpoint", "e"),))
+
+    text = render(m.collect())
+    family = "myapp_http_request_duration_seconds"
+    assert f"# TYPE {family} histogram" in text
+    assert _sample(text, f'{family}_bucket{{endpoint="e",le="0.005"}}') == 1
+    assert _sample(text, f'{family}_bucket{{endpoint="e",le="0.025"}}') == 3
+    assert _sample(text, f'{family}_bucket{{endpoint="e",le="10.0"}}') == 3
+    assert _sample(text, f'{family}_bucket{{endpoint="e",le="+Inf"}}') == 4
+    assert _sample(text, f'{family}_count{{endpoint="e"}}') == 4
+
+
+def test_non_finite_values_are_rendered():
+    m = Metrics()
+    m.set_gauge("myapp_db_pool_size", float("inf"))
+    m.set_gauge("myapp_db_pool_overflow", float("nan"))
+    text = render(m.collect())
+    assert "myapp_db_pool_size +Inf" in text
+    assert "myapp_db_pool_overflow NaN" in text
+
+
+def test_label_values_are_escaped():
+    m = Metrics()
+    m.inc("myapp_http_requests_total", (("endpoint", 'a"b\\c'),))
+    assert 'endpoint="a\\"b\\\\c"' in render(m.collect())
+
+
+@pytest.fixture()
+def metrics_app(app):
+    # Own app on the shared test database so counters start from zero
+    test_app = create_app("testing")
+    return test_app
+
+
+def test_requests_pool_and_cache_are_exported(metrics_app):
+    client = metrics_app.test_client()
+    client.get("/health")
+    client.get("/health")
+    client.get("/does-not-exist")
+    with metrics_app.app_context():
+        db.session.execute(db.text("SELECT 1"))
+        db.session.remove()
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert (
+        _sample(text, 'myapp_http_requests_total{method="GET",endpoint="health",status="200"}') == 2
+    )
+    assert (
+        _sample(text, 'myapp_http_requests_total{method="GET",endpoint="unmatched",status="404"}')
+        == 1
+    )
+    assert _sample(text, 'myapp_http_request_duration_seconds_count{endpoint="health"}') == 2
+    assert _sample(text, "myapp_http_requests_in_flight") == 1  # the scrape itself
+    assert _sample(text, 'myapp_db_pool_checkouts_total{bind="default"}') >= 1
+    assert _sample(text, 'myapp_db_connect_seconds_count{bind="default"}') >= 1
+    assert _sample(text, 'myapp_db_pool_checked_out{bind="default"}') == 0
+    assert "myapp_user_cache_hits" in text
+
+
+def test_connect_timing_survives_dispose(metrics_app):
+    metrics = metrics_app.extensions[metrics_mod.EXTENSION_KEY]
+    count = 'myapp_db_connect_seconds_count{bind="default"}'
+    with metrics_app.app_context():
+        db.session.execute(db.text("SELECT 1"))
+        db.session.remove()
+        before = _sample(render(metrics.collect()), count)
+        db.engine.dispose()
+        db.session.execute(db.text("SELECT 1"))
+        db.session.remove()
+    assert _sample(render(metrics.collect()), count) == before + 1
+
+
+def test_metrics_token_and_disable(monkeypatch, app):
+    monkeypatch.setenv("METRICS_TOKEN", "s3cret")
+    client = create_app("testing").test_client()
+    assert client.get("/metrics").status_code == 404
+    r = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert r.status_code == 200
+
+    # Outside debug/testing, /metrics is not served without a token
+    monkeypatch.delenv("METRICS_TOKEN")
+    production_like = create_app("testing")
+    production_like.testing = False
+    assert production_like.test_client().get("/metrics").status_code == 404
+
+    monkeypatch.setenv("METRICS_ENABLED", "0")
+    disabled = create_app("testing")
+    assert metrics_mod.EXTENSION_KEY not in disabled.extensions
+    assert disabled.test_client().get("/metrics").status_code == 404
+
+
+def test_child_resets_inherited_stores(tmp_path):
+    m = Metrics(str(tmp_path))
+    m.inc("myapp_http_requests_total")
+    metrics_mod._after_fork_in_child()
+    m.inc("myapp_http_requests_total")
+    # Same pid here, so both writes land in one file that the new store reopened
+    assert os.listdir(tmp_path) and _sample(render(m.collect()), "myapp_http_requests_total") == 2
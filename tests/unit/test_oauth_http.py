@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from myapp import create_app
+from myapp.auth.http import CircuitBreaker, OutboundHTTP, ProviderUnavailable
+
+# Adds the OAuth routes to the auth blueprint before any app registers it
+from myapp.blueprints.auth import routes_oauth  # noqa: F401
+from myapp.blueprints.auth.oauth import oauth
+from myapp.extensions import db
+from myapp.metrics import render, sync_collectors
+from myapp.models import AuthIdentity, User
+from tests.stub_provider import StubProvider
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_circuit_breaker_opens_and_probes_once():
+    clock = Clock()
+    breaker = CircuitBreaker("github", failure_threshold=2, reset_timeout=30, clock=clock)
+
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.record_success()  # a success in between resets the count
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now += 10
+    with pytest.raises(ProviderUnavailable) as exc_info:
+        breaker.before_call()
+    assert exc_info.value.code == 503
+    assert dict(exc_info.value.get_headers())["Retry-After"] == "20"
+
+    clock.now += 20
+    breaker.before_call()  # the trial call
+    with pytest.raises(ProviderUnavailable):
+        breaker.before_call()  # everyone else waits for its outcome
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_timeouts_and_server_errors_count_as_failures():
+    outbound = OutboundHTTP(read_timeout=0.1, failure_threshold=2)
+    session = requests.Session()
+    outbound.mount(session)
+
+    with StubProvider() as stub:
+        stub.delays["/user"] = 0.5
+        stub.responses["/user/emails"] = (502, {})
+        with pytest.raises(ProviderUnavailable):
+            outbound.call(
+                "github", lambda: session.get(f"{stub.url}/user", timeout=outbound.timeout)
+            )
+        with pytest.raises(ProviderUnavailable):
+            outbound.call("github", lambda: session.get(f"{stub.url}/user/emails"))
+
+        with pytest.raises(ProviderUnavailable):  # open: not even sent
+            outbound.call("github", lambda: session.get(f"{stub.url}/login/oauth/access_token"))
+        assert stub.hits["/login/oauth/access_token"] == 0
+        assert outbound.breaker("github").state == "open"
+        assert outbound.breaker("google").state == "closed"
+
+
+@pytest.fixture()
+def github_app(app, monkeypatch):
+    monkeypatch.setenv("AUTH_PROVIDERS", "local,github")
+    monkeypatch.setenv("GITHUB_CLIENT_ID", "client-id")
+    monkeypatch.setenv("GITHUB_CLIENT_SECRET", "client-secret")
+    monkeypatch.setenv("OAUTH_BREAKER_FAILURES", "3")
+    return create_app("testing")
+
+
+@pytest.fixture()
+def provider(github_app, monkeypatch):
+    with StubProvider() as stub:
+        monkeypatch.setattr(
+            oauth.github, "access_token_url", f"{stub.url}/login/oauth/access_token"
+        )
+        monkeypatch.setattr(oauth.github, "authorize_url", f"{stub.url}/login/oauth/authorize")
+        monkeypatch.setattr(oauth.github, "api_base_url", f"{stub.url}/")
+        yield stub
+
+
+def github_login(client):
+    location = client.get("/auth/github/login").headers["Location"]
+    state = parse_qs(urlparse(location).query)["state"][0]
+    return client.get(f"/auth/github/callback?code=abc&state={state}")
+
+
+def test_github_callback_uses_pooled_concurrent_calls(github_app, provider):
+    provider.delays = {"/user": 0.1, "/user/emails": 0.1}
+
+    resp = github_login(github_app.test_client())
+    assert resp.status_code == 302
+    assert provider.max_in_flight == 2  # user and emails were fetched at the same time
+
+    with github_app.app_context():
+        user = User.query.filter_by(email="octo@example.com").one()
+        assert user.username == "octo"
+        assert AuthIdentity.query.filter_by(provider="github", subject="4242").count() == 1
+
+    # Another login reuses the two keep-alive connections of the first
+    assert github_login(github_app.test_client()).status_code == 302
+    assert sum(provider.hits.values()) == 6
+    assert len(provider.connections) == 2
+
+
+def test_failing_email_lookup_does_not_fail_the_login(github_app, provider):
+    provider.responses["/user"] = (200, {"id": 5151, "login": "no-email"})
+    provider.responses["/user/emails"] = (502, {"message": "Bad Gateway"})
+
+    assert github_login(github_app.test_client()).status_code == 302
+
+    with github_app.app_context():
+        (identity,) = AuthIdentity.query.filter_by(provider="github", subject="5151").all()
+        assert identity.email is None
+        assert db.session.get(User, identity.user_id).username == "no-email"
+
+
+def test_degraded_provider_fails_fast_with_503(github_app, provider):
+    for path in ("/login/oauth/access_token", "/user", "/user/emails"):
+        provider.responses[path] = (502, {"message": "Bad Gateway"})
+    client = github_app.test_client()
+
+    for _ in range(3):
+        assert github_login(client).status_code == 503
+    assert provider.hits["/login/oauth/access_token"] == 3
+
+    resp = github_login(client)
+    assert resp.status_code == 503
+    assert int(resp.headers["Retry-After"]) > 0
+    assert provider.hits["/login/oauth/access_token"] == 3  # the circuit is open
+
+    metrics = github_app.extensions["metrics"]
+    with github_app.app_context():
+        sync_collectors(github_app, metrics)
+    assert 'myapp_oauth_circuit_open{provider="github"} 1' in render(metrics.collect())
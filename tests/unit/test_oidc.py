@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import os
+import time
+
+import pytest
+import requests
+from joserfc import jwt
+from joserfc.errors import InvalidKeyIdError
+from joserfc.jwk import RSAKey
+
+from myapp import create_app
+from myapp.auth.oidc import OIDCDocuments, cache_ttl
+
+# Adds the OAuth routes to the auth blueprint before any app registers it
+from myapp.blueprints.auth import routes_oauth  # noqa: F401
+from myapp.blueprints.auth.oauth import oauth
+from tests.stub_provider import StubProvider
+
+DISCOVERY = "/.well-known/openid-configuration"
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def signing_key(kid: str) -> RSAKey:
+    return RSAKey.generate_key(2048, parameters={"kid": kid})
+
+
+def publish(stub: StubProvider, *keys: RSAKey, max_age: int = 600) -> None:
+    stub.responses["/jwks"] = (200, {"keys": [k.as_dict(private=False) for k in keys]})
+    stub.headers["/jwks"] = {"Cache-Control": f"public, max-age={max_age}"}
+
+
+@pytest.fixture()
+def stub():
+    with StubProvider() as stub:
+        stub.responses[DISCOVERY] = (
+            200,
+            {
+                "issuer": stub.url,
+                "jwks_uri": f"{stub.url}/jwks",
+                "id_token_signing_alg_values_supported": ["RS256"],
+            },
+        )
+        stub.headers[DISCOVERY] = {"Cache-Control": "public, max-age=1000"}
+        yield stub
+
+
+def fetch(url: str) -> requests.Response:
+    return requests.get(url, timeout=5)
+
+
+@pytest.fixture()
+def documents(stub, tmp_path):
+    """Factory for OIDCDocuments sharing one cache dir, like the workers of a host."""
+    created = []
+
+    def make(clock):
+        docs = OIDCDocuments(
+            "test", stub.url + DISCOVERY, fetch, cache_dir=str(tmp_path), clock=clock
+        )
+        created.append(docs)
+        return docs
+
+    yield make
+    for docs in created:
+        docs.stop()
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({}, 3600),
+        ({"Cache-Control": "public, max-age=19000"}, 19000),
+        ({"Cache-Control": "public, max-age=19000", "Age": "1000"}, 18000),
+        ({"Cache-Control": "max-age=5"}, 300),  # clamped to the minimum
+        ({"Cache-Control": "max-age=999999"}, 86400),
+        ({"Cache-Control": "no-cache"}, 300),
+    ],
+)
+def test_cache_ttl(headers, expected):
+    assert cache_ttl(headers) == expected
+
+
+def test_documents_are_persisted_and_refreshed_ahead_of_expiry(stub, documents, tmp_path):
+    publish(stub, signing_key("k1"))
+    clock = Clock()
+    docs = documents(clock)
+    assert docs.metadata()["issuer"] == stub.url
+    assert [k["kid"] for k in docs.jwks()["keys"]] == ["k1"]
+    assert docs.documents["jwks"].expires_at == 1600  # max-age=600
+    assert sorted(os.listdir(tmp_path)) == ["test-jwks.json", "test-metadata.json"]
+
+    # A restarted worker starts from the files
+    restarted = documents(clock)
+    assert restarted.jwks() == docs.jwks()
+    assert stub.hits == {DISCOVERY: 1, "/jwks": 1}
+
+    # 80% of the JWKS max-age has passed: refreshed, still valid metadata is not
+    publish(stub, signing_key("k1"), signing_key("k2"))
+    clock.now += 500
+    assert [k["kid"] for k in docs.jwks()["keys"]] == ["k1"]  # served from memory
+    docs.refresh_due()
+    assert stub.hits == {DISCOVERY: 1, "/jwks": 2}
+    assert [k["kid"] for k in docs.jwks()["keys"]] == ["k1", "k2"]
+
+    # The other worker adopts the refreshed file instead of fetching again
+    restarted.refresh_due()
+    assert [k["kid"] for k in restarted.jwks()["keys"]] == ["k1", "k2"]
+    assert stub.hits["/jwks"] == 2
+
+
+def test_expired_documents_are_served_while_the_provider_fails(stub, documents, caplog):
+    publish(stub, signing_key("k1"))
+    clock = Clock()
+    docs = documents(clock)
+    keys = docs.jwks()
+    stub.responses["/jwks"] = (503, {})
+    clock.now += 5000
+
+    started = time.perf_counter()
+    assert docs.jwks() == keys
+    assert time.perf_counter() - started < 0.05  # no waiting on the provider
+
+    docs.refresh_due()
+    assert "keeping the cached copy" in caplog.text
+    assert docs.jwks() == keys
+    hits = stub.hits["/jwks"]
+    docs.refresh_due()  # retried after OIDC_MIN_TTL, not on every call
+    assert stub.hits["/jwks"] == hits
+
+
+@pytest.fixture()
+def google(app, monkeypatch, stub, tmp_path):
+    monkeypatch.setenv("AUTH_PROVIDERS", "local,google")
+    monkeypatch.setenv("GOOGLE_CLIENT_ID", "client-id")
+    monkeypatch.setenv("GOOGLE_CLIENT_SECRET", "client-secret")
+    monkeypatch.setenv("OIDC_CACHE_DIR", str(tmp_path))
+    create_app("testing")
+    client = oauth.google
+    docs = OIDCDocuments(
+        "google", stub.url + DISCOVERY, client.fetch_document, cache_dir=str(tmp_path)
+    )
+    monkeypatch.setattr(client, "documents", docs)
+    yield client
+    docs.stop()
+
+
+def id_token(stub: StubProvider, key: RSAKey) -> dict[str, str]:
+    now = int(time.time())
+    claims = {
+        "iss": stub.url,
+        "aud": "client-id",
+        "sub": "g-123",
+        "email": "g@example.com",
+        "nonce": "n0nce",
+        "iat": now,
+        "exp": now + 300,
+    }
+    header = {"alg": "RS256", "kid": key.kid}
+    return {"id_token": jwt.encode(header, claims, key), "access_token": "at"}
+
+
+def test_parse_id_token_uses_cached_keys_and_refetches_for_new_kid(google, stub):
+    old, new = signing_key("k1"), signing_key("k2")
+    publish(stub, old)
+    assert google.parse_id_token(id_token(stub, old), nonce="n0nce")["sub"] == "g-123"
+    assert google.parse_id_token(id_token(stub, old), nonce="n0nce")["sub"] == "g-123"
+    assert stub.hits == {DISCOVERY: 1, "/jwks": 1}  # steady state: no network
+
+    # The provider rotated keys before our refresh was due
+    publish(stub, old, new)
+    assert google.parse_id_token(id_token(stub, new), nonce="n0nce")["sub"] == "g-123"
+    assert stub.hits["/jwks"] == 2
+
+    # Unknown kids refetch at most once per OIDC_KID_REFRESH_INTERVAL
+    with pytest.raises(InvalidKeyIdError):
+        google.parse_id_token(id_token(stub, signing_key("forged")), nonce="n0nce")
+    assert stub.hits["/jwks"] == 2
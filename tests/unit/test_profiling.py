@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import pstats
+import threading
+import time
+
+import pytest
+
+from myapp import create_app
+from myapp.models import User
+from myapp.profiling import HEADER, RESPONSE_HEADER, StackSampler, make_profile_token
+from tests.helpers import create_user, login
+
+
+def _busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampler_records_collapsed_stacks_of_target_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,))
+    worker.start()
+    sampler = StackSampler(0.001, {worker.ident}).start()
+    time.sleep(0.05)
+    sampler.stop()
+    stop.set()
+    worker.join()
+
+    assert sampler.samples > 0
+    stack, count = sampler.collapsed().splitlines()[0].rsplit(" ", 1)
+    assert stack.endswith("test_profiling:_busy_loop")
+    assert int(count) > 0
+
+
+@pytest.fixture()
+def profiled(monkeypatch, tmp_path, app, db):
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    profiled_app = create_app("testing")
+    with app.app_context():
+        if not User.query.filter_by(email="prof@example.com").first():
+            create_user(db, email="prof@example.com", username="prof", is_admin=True)
+    return profiled_app, tmp_path
+
+
+def test_admin_query_flag_profiles_one_request(profiled):
+    app, directory = profiled
+    client = app.test_client()
+
+    assert RESPONSE_HEADER not in client.get("/health?_profile=1").headers  # anonymous
+
+    login(client, email="prof@example.com")
+    resp = client.get("/admin/?_profile=1")
+    name = resp.headers[RESPONSE_HEADER]
+    assert name.endswith("-admin.dashboard.collapsed")
+    assert (directory / name).exists()
+
+    listing = client.get("/admin/profiles/").get_data(as_text=True)
+    assert name in listing
+    download = client.get(f"/admin/profiles/{name}")
+    assert download.status_code == 200
+    assert "attachment" in download.headers["Content-Disposition"]
+    assert client.get("/admin/profiles/..%2Fsecret.collapsed").status_code == 404
+
+
+def test_signed_header_and_cprofile_mode(profiled):
+    app, directory = profiled
+    client = app.test_client()
+
+    assert RESPONSE_HEADER not in client.get("/health", headers={HEADER: "forged"}).headers
+
+    resp = client.get("/health", headers={HEADER: make_profile_token(app, "cprofile")})
+    name = resp.headers[RESPONSE_HEADER]
+    assert name.endswith(".pstats")
+    stats = pstats.Stats(str(directory / name))
+    assert stats.total_calls > 0
+
+
+def test_window_samples_the_worker(profiled):
+    app, directory = profiled
+    client = app.test_client()
+    login(client, email="prof@example.com")
+
+    window = app.extensions["profiling"]
+    client.post("/admin/profiles/window", data={"seconds": "0.05"})
+    name = window.running
+    assert name and name.endswith("-window.collapsed")
+    assert window.start(1) is None  # one window at a time
+
+    deadline = time.monotonic() + 5
+    while window.running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert (directory / name).read_text()
+
+
+def test_profile_token_cli(app):
+    result = app.test_cli_runner().invoke(args=["profile-token", "--mode", "cprofile"])
+    assert result.exit_code == 0
+    assert result.output.strip()
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import logging
+
+import pytest
+
+from myapp import create_app
+from myapp.extensions import db
+from myapp.models import User
+from myapp.querystats import BUDGET_ATTR, QueryBudgetExceeded, capture_queries, query_budget
+
+
+def _app_with_routes(**env):
+    app = create_app("testing")
+    app.config.update(env)
+
+    @app.get("/two-queries")
+    @query_budget(1)
+    def two_queries():
+        db.session.execute(db.text("SELECT 1"))
+        db.session.execute(db.text("SELECT 2"))
+        return "ok"
+
+    @app.get("/n-plus-one")
+    def n_plus_one():
+        for user_id in range(6):
+            db.session.get(User, user_id + 10_000)
+        return "ok"
+
+    return app
+
+
+def test_budget_exceeded_fails_in_strict_mode(app):
+    client = _app_with_routes().test_client()
+    with pytest.raises(QueryBudgetExceeded, match="ran 2 SQL statements, budget is 1"):
+        client.get("/two-queries")
+
+
+def test_budget_exceeded_is_logged_otherwise(monkeypatch, app, caplog):
+    monkeypatch.setenv("SQL_BUDGET_STRICT", "0")
+    client = _app_with_routes().test_client()
+    with caplog.at_level(logging.WARNING, logger="myapp.sql"):
+        assert client.get("/two-queries").status_code == 200
+    assert any("budget is 1" in r.getMessage() for r in caplog.records)
+
+
+def test_repeated_statement_flagged_as_n_plus_one(app, caplog):
+    client = _app_with_routes().test_client()
+    with caplog.at_level(logging.WARNING, logger="myapp.sql"):
+        client.get("/n-plus-one")
+    [record] = [r for r in caplog.records if "Suspected N+1" in r.getMessage()]
+    assert "6 x SELECT" in record.getMessage()
+
+
+def test_capture_queries_outside_requests(app):
+    with app.app_context(), capture_queries() as stats:
+        db.session.execute(db.text("SELECT 1"))
+        db.session.execute(db.text("SELECT 1"))
+    assert stats.count == 2
+    assert stats.statements["SELECT 1"] == 2
+    assert stats.seconds > 0
+
+
+def test_budget_survives_outer_decorators(app):
+    # admin.dashboard is wrapped by admin_required/login_required
+    assert getattr(app.view_functions["admin.dashboard"], BUDGET_ATTR) == 1
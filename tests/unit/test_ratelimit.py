@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import pytest
+from flask import g
+
+from myapp import create_app
+from myapp.extensions import db
+from myapp.metrics import render
+from myapp.ratelimit import (
+    EXTENSION_KEY,
+    Limit,
+    MemoryStore,
+    RateLimited,
+    RateLimiter,
+    SQLiteStore,
+    parse_limit,
+)
+from tests.helpers import create_user
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_parse_limit():
+    assert parse_limit("5/60") == Limit(5, 60)
+    assert parse_limit("5/minute") == Limit(5, 60)
+    assert parse_limit("100 / hours") == Limit(100, 3600)
+    assert parse_limit("") is None
+    for bad in ("5", "five/60", "5/fortnight", "0/60"):
+        with pytest.raises(ValueError):
+            parse_limit(bad)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStore()
+    return SQLiteStore(str(tmp_path / "ratelimit.sqlite3"))
+
+
+def test_sliding_window(store):
+    clock = Clock(60 * 16_667 + 20.0)  # 20s into a 60s window
+    limiter = RateLimiter(store, clock=clock)
+    limit = Limit(3, 60)
+
+    for _ in range(3):
+        limiter.check("login", "ip", "10.0.0.1", limit)
+    with pytest.raises(RateLimited) as exc_info:
+        limiter.check("login", "ip", "10.0.0.1", limit)
+    # 4 hits in this window: wait for it and the next one to end
+    assert dict(exc_info.value.get_headers())["Retry-After"] == "100"
+
+    limiter.check("login", "ip", "10.0.0.2", limit)  # other keys are unaffected
+
+    # 30s into the next window half of the previous 4 hits still count
+    clock.now += 70
+    limiter.check("login", "ip", "10.0.0.1", limit)  # 1 + 4 * 0.5 = 3
+    with pytest.raises(RateLimited):
+        limiter.check("login", "ip", "10.0.0.1", limit)
+
+    clock.now += 120
+    limiter.check("login", "ip", "10.0.0.1", limit)
+
+
+def test_refund_takes_back_a_counted_hit(store):
+    limiter = RateLimiter(store, clock=Clock())
+    limit = Limit(2, 60)
+
+    for _ in range(3):
+        window = limiter.check("login", "email", "a@example.com", limit)
+        limiter.refund("login", "email", "a@example.com", limit, window)
+    limiter.check("login", "email", "a@example.com", limit)
+    limiter.check("login", "email", "a@example.com", limit)
+    with pytest.raises(RateLimited):
+        limiter.check("login", "email", "a@example.com", limit)
+    limiter.refund("login", "email", "b@example.com", limit, window)  # nothing to refund
+    limiter.check("login", "email", "b@example.com", limit)
+
+
+def test_sqlite_counters_are_shared_between_stores(tmp_path):
+    # Two stores on one file stand in for two gunicorn workers
+    path = str(tmp_path / "shared.sqlite3")
+    clock = Clock()
+    workers = [RateLimiter(SQLiteStore(path), clock=clock) for _ in range(2)]
+    limit = Limit(4, 60)
+
+    for i in range(4):
+        workers[i % 2].check("login", "email", "a@example.com", limit)
+    with pytest.raises(RateLimited):
+        workers[0].check("login", "email", "a@example.com", limit)
+
+
+def test_store_failure_lets_requests_through(caplog):
+    class Broken:
+        def hit(self, key, window, period):
+            raise OSError("disk full")
+
+    RateLimiter(Broken()).check("login", "ip", "10.0.0.1", Limit(1, 60))
+    assert "letting the request through" in caplog.text
+
+
+@pytest.fixture()
+def limited_app(monkeypatch):
+    monkeypatch.setenv("RATELIMIT_ENABLED", "1")
+    monkeypatch.setenv("RATELIMIT_STORAGE_URL", "memory://")
+    monkeypatch.setenv("RATELIMIT_LOGIN_PER_IP", "3/minute")
+    monkeypatch.setenv("RATELIMIT_LOGIN_PER_EMAIL", "2/minute")
+    return create_app("testing")
+
+
+def test_login_throttled_per_ip_and_email(limited_app, monkeypatch):
+    hashed = []
+
+    def validate_on_submit(self):
+        # The email attempt is already counted while the view runs, so parallel
+        # guesses cannot all pass the check before any of them is recorded
+        assert g.ratelimit_refund[1] == "email"
+        hashed.append(1)
+        return False
+
+    monkeypatch.setattr(
+        "myapp.blueprints.auth.routes_local.LoginForm.validate_on_submit", validate_on_submit
+    )
+    client = limited_app.test_client()
+
+    def attempt(email, ip):
+        return client.post(
+            "/auth/login",
+            data={"email": email, "password": "wrong"},
+            environ_base={"REMOTE_ADDR": ip},
+        )
+
+    assert attempt("victim@example.com", "10.0.0.1").status_code == 400
+    assert attempt("Victim@example.com ", "10.0.0.2").status_code == 400
+    # third try for this address, from yet another IP
+    resp = attempt("victim@example.com", "10.0.0.3")
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert resp.get_json()["error"] == "too_many_requests"
+
+    assert attempt("other@example.com", "10.0.0.1").status_code == 400
+    assert attempt("third@example.com", "10.0.0.1").status_code == 400
+    assert attempt("fourth@example.com", "10.0.0.1").status_code == 429  # 4th from this IP
+    assert len(hashed) == 4  # rejected attempts never reached the form
+
+    text = render(limited_app.extensions["metrics"].collect())
+    assert 'myapp_ratelimit_rejections_total{scope="login",kind="email"} 1.0' in text
+    assert 'myapp_ratelimit_rejections_total{scope="login",kind="ip"} 1.0' in text
+
+
+def test_disabled_in_testing_and_invalid_limits_fail_at_startup(app, monkeypatch):
+    assert EXTENSION_KEY not in app.extensions
+    monkeypatch.setenv("RATELIMIT_LOGIN_PER_IP", "lots")
+    with pytest.raises(ValueError, match="lots"):
+        create_app("testing")
+
+
+def test_successful_logins_do_not_count_against_the_email(app, limited_app):
+    with limited_app.app_context():
+        create_user(db, email="owner@example.com", username="owner")
+
+    def attempt(password, ip):
+        return limited_app.test_client().post(
+            "/auth/login",
+            data={"email": "owner@example.com", "password": password},
+            environ_base={"REMOTE_ADDR": ip},
+        )
+
+    # More than RATELIMIT_LOGIN_PER_EMAIL=2/minute, from different addresses
+    for n in range(4):
+        assert attempt("supersecret123", f"10.0.1.{n}").status_code == 302
+
+    for n in range(2):
+        assert attempt("wrong", f"10.0.2.{n}").status_code == 401
+    assert attempt("supersecret123", "10.0.3.1").status_code == 429
+
+
+def test_clients_behind_a_trusted_proxy_get_their_own_buckets(monkeypatch, limited_app):
+    monkeypatch.setenv("TRUSTED_PROXY_COUNT", "1")
+    client = create_app("testing").test_client()
+
+    def attempt(n, forwarded_for):
+        return client.post(
+            "/auth/login",
+            data={"email": f"user{n}@example.com", "password": "wrong"},
+            environ_base={"REMOTE_ADDR": "10.0.0.254"},  # the proxy
+            headers={"X-Forwarded-For": forwarded_for},
+        )
+
+    for n in range(3):  # RATELIMIT_LOGIN_PER_IP=3/minute
+        assert attempt(n, "203.0.113.1").status_code != 429
+    assert attempt(3, "203.0.113.1").status_code == 429
+    assert attempt(4, "203.0.113.2").status_code != 429
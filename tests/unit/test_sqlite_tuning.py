@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from myapp import create_app
+from myapp.extensions import db
+from myapp.sqlite_tuning import install_sqlite_pragmas, sqlite_pragmas
+
+
+def test_sqlite_pragmas_defaults():
+    pragmas = sqlite_pragmas({})
+    assert pragmas[0] == "PRAGMA busy_timeout = 5000"
+    assert "PRAGMA journal_mode = WAL" in pragmas
+    assert "PRAGMA synchronous = NORMAL" in pragmas
+    assert "PRAGMA temp_store = MEMORY" in pragmas
+
+
+def test_sqlite_pragmas_skip_file_only_settings_in_memory():
+    pragmas = sqlite_pragmas({}, in_memory=True)
+    assert not any("journal_mode" in p or "mmap_size" in p for p in pragmas)
+
+
+def test_sqlite_pragmas_reject_unknown_values():
+    with pytest.raises(ValueError, match="SQLITE_SYNCHRONOUS"):
+        sqlite_pragmas({"SQLITE_SYNCHRONOUS": "NORMAL; DROP TABLE users"})
+
+
+def test_install_sqlite_pragmas_applies_on_connect(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'p.sqlite3'}")
+    install_sqlite_pragmas(engine, sqlite_pragmas({"SQLITE_BUSY_TIMEOUT": 1234}))
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+    engine.dispose()
+
+
+def test_create_app_enables_profile_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{(tmp_path / 'app.sqlite3').as_posix()}")
+    monkeypatch.setenv("SQLITE_PERFORMANCE_MODE", "1")
+    app = create_app("testing")
+
+    with app.app_context():
+        assert db.session.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import pytest
+
+from myapp import create_app
+from myapp.startup import measure_startup, parse_importtime
+
+SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      2000 |      35000 | flask
+import time:       500 |        900 |   myapp.cli
+"""
+
+
+def test_parse_importtime_skips_header_and_other_lines():
+    rows = parse_importtime(SAMPLE + "some unrelated warning\n")
+    assert [r.module for r in rows] == ["_io", "flask", "myapp.cli"]
+    assert rows[1].self_us == 2000
+    assert rows[1].cumulative_us == 35000
+
+
+def test_unknown_blueprint_rejected(monkeypatch):
+    monkeypatch.setenv("APP_BLUEPRINTS", "auth,nope")
+    with pytest.raises(ValueError, match="APP_BLUEPRINTS"):
+        create_app("testing")
+
+
+def test_only_enabled_blueprints_are_registered(monkeypatch):
+    monkeypatch.setenv("APP_BLUEPRINTS", "api")
+    app = create_app("testing")
+    assert set(app.blueprints) == {"api"}
+
+
+def test_disabled_blueprints_are_not_imported():
+    report = measure_startup(env={"CONFIG": "testing", "APP_BLUEPRINTS": "none"})
+    modules = {row.module for row in report.imports}
+
+    assert "myapp.cli" in modules
+    assert not any(m.startswith("myapp.blueprints") for m in modules)
+    assert "authlib" not in modules
+    assert "myapp.startup" not in modules  # only loaded by the startup-report command
+    assert report.create_app_ms > 0
+
+
+def test_importing_the_package_does_not_load_subsystems():
+    probe = "import sys, myapp; print(sorted(m for m in sys.modules if m.startswith('myapp')))"
+    out = subprocess.run(
+        [sys.executable, "-c", probe], capture_output=True, text=True, check=True
+    ).stdout
+    assert out.strip() == "['myapp']"
+
+
+def test_startup_report_cli_enforces_budget(app):
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=["startup-report", "--top", "3", "--budget-ms", "0.001"])
+
+    assert result.exit_code != 0
+    assert "over the 0 ms budget" in result.output
+    assert "create_app:" in result.output
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import pytest
+from jinja2 import FileSystemBytecodeCache
+
+from myapp import create_app
+from myapp.templating import SharedBytecodeCache, compile_templates, template_cache_dir
+
+
+@pytest.fixture()
+def cached_app_factory(monkeypatch, tmp_path):
+    monkeypatch.setenv("JINJA_BYTECODE_CACHE", "1")
+    monkeypatch.setenv("JINJA_BYTECODE_CACHE_DIR", str(tmp_path))
+    return lambda: create_app("testing")
+
+
+def test_cache_dir_is_namespaced_by_versions(cached_app_factory, tmp_path):
+    app = cached_app_factory()
+    directory = template_cache_dir(app)
+    assert directory.parent == tmp_path
+    assert directory.name.startswith("myapp-")
+    assert "jinja2-" in directory.name
+
+
+def test_second_worker_loads_bytecode_instead_of_compiling(cached_app_factory):
+    first = cached_app_factory()
+    count = compile_templates(first)
+    assert len(list(template_cache_dir(first).iterdir())) == count
+
+    second = cached_app_factory()
+    compiled = []
+    original = second.jinja_env.compile
+
+    def spy(source, name=None, filename=None, raw=False, defer_init=False):
+        compiled.append(name)
+        return original(source, name, filename, raw, defer_init)
+
+    second.jinja_env.compile = spy
+    compile_templates(second)
+
+    assert compiled == []
+
+
+def test_unwritable_cache_does_not_break_rendering(cached_app_factory, monkeypatch):
+    def fail(self, bucket):
+        raise PermissionError("read-only")
+
+    monkeypatch.setattr(FileSystemBytecodeCache, "dump_bytecode", fail)
+    app = cached_app_factory()
+    assert isinstance(app.jinja_env.bytecode_cache, SharedBytecodeCache)
+
+    client = app.test_client()
+    assert client.get("/auth/login").status_code == 200
+
+
+def test_build_template_cache_cli(app, monkeypatch, tmp_path):
+    monkeypatch.setitem(app.config, "JINJA_BYTECODE_CACHE_DIR", str(tmp_path))
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=["build-template-cache"])
+
+    assert result.exit_code == 0, result.output
+    assert "Compiled" in result.output
+    assert any(template_cache_dir(app).iterdir())
+    app.jinja_env.bytecode_cache = None
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import logging
+import re
+import time
+
+from myapp import create_app
+from myapp.timing import HEADER, REQUEST_HEADER, RequestTimings
+from tests.helpers import create_user, login
+
+
+def _durations(header: str) -> dict[str, float]:
+    return {m[1]: float(m[2]) for m in re.finditer(r"(\w+);dur=([\d.]+)", header)}
+
+
+def test_nested_spans_count_exclusive_time():
+    t = RequestTimings()
+    t.start("tpl")
+    t.start("db")
+    time.sleep(0.02)
+    t.stop("db")
+    t.stop("tpl")
+    t.stop("tpl")  # unbalanced stop is ignored
+
+    assert t.counts == {"db": 1, "tpl": 1}
+    assert t.totals["db"] >= 0.02
+    assert t.totals["tpl"] < t.totals["db"]
+
+    durations = _durations(t.header(total=0.05))
+    assert set(durations) == {"db", "tpl", "app", "total"}
+    assert durations["total"] == 50.0
+
+
+def test_header_splits_login_into_buckets(monkeypatch, app, db, caplog):
+    monkeypatch.setenv("SERVER_TIMING_ENABLED", "1")
+    monkeypatch.setenv("SERVER_TIMING_LOG", "1")
+    timed_app = create_app("testing")
+    with app.app_context():
+        create_user(db, email="timing@example.com", username="timing")
+
+    client = timed_app.test_client()
+    page = client.get("/auth/login")
+    assert "tpl" in _durations(page.headers[HEADER])
+
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="myapp.timing"):
+        resp = login(client, email="timing@example.com")
+    durations = _durations(resp.headers[HEADER])
+    assert {"db", "hash", "app", "total"} <= set(durations)
+    assert durations["hash"] > 0
+    assert durations["total"] >= durations["hash"] + durations["db"]
+
+    [record] = [r for r in caplog.records if r.name == "myapp.timing"]
+    assert record.hash_ms > 0
+
+
+def test_disabled_except_for_admin_opt_in(app, client, db):
+    assert HEADER not in client.get("/health").headers
+    assert HEADER not in client.get("/health", headers={REQUEST_HEADER: "1"}).headers
+
+    with app.app_context():
+        create_user(db, email="timing-admin@example.com", username="timing-admin", is_admin=True)
+    login(client, email="timing-admin@example.com")
+
+    assert HEADER not in client.get("/admin/").headers
+    resp = client.get("/admin/", headers={REQUEST_HEADER: "1"})
+    assert {"tpl", "total"} <= set(_durations(resp.headers[HEADER]))
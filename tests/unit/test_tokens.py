@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+from werkzeug.exceptions import Forbidden
+
+from myapp import create_app
+from myapp.auth.tokens import (
+    EXTENSION_KEY,
+    InvalidToken,
+    decode_token,
+    get_revocation_list,
+    mint_token,
+    revoke_token,
+)
+from myapp.extensions import db as _db
+from myapp.models import RevokedToken
+from myapp.querystats import capture_queries
+
+
+def _bearer(token: str) -> dict[str, str]:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_mint_and_decode_round_trip(app):
+    token, claims = mint_token(app, "svc-billing", ["read", "write"], ttl=60)
+    assert token.startswith("default.")
+
+    decoded = decode_token(app, token)
+    assert decoded == claims
+    assert decoded.has_scopes(["read"])
+    assert not decoded.has_scopes(["admin"])
+
+    for bad in (token + "x", "other." + token.split(".", 1)[1], "garbage", ""):
+        with pytest.raises(InvalidToken):
+            decode_token(app, bad)
+
+    expired, _ = mint_token(app, "svc-billing", ttl=-1)
+    with pytest.raises(InvalidToken, match="expired"):
+        decode_token(app, expired)
+    assert decode_token(app, expired, verify_exp=False).sub == "svc-billing"
+
+
+def test_key_rotation(monkeypatch):
+    monkeypatch.setenv("API_TOKEN_KEYS", "old=first-secret,new=second-secret")
+    monkeypatch.setenv("API_TOKEN_KID", "old")
+    old_app = create_app("testing")
+    old_token, _ = mint_token(old_app, "svc")
+
+    monkeypatch.setenv("API_TOKEN_KID", "new")
+    rotated = create_app("testing")
+    new_token, claims = mint_token(rotated, "svc")
+    assert claims.kid == "new"
+    assert decode_token(rotated, old_token).kid == "old"  # still accepted during rotation
+
+    monkeypatch.setenv("API_TOKEN_KEYS", "new=second-secret")
+    retired = create_app("testing")
+    assert decode_token(retired, new_token).sub == "svc"
+    with pytest.raises(InvalidToken):
+        decode_token(retired, old_token)
+
+    monkeypatch.setenv("API_TOKEN_KID", "missing")
+    with pytest.raises(ValueError, match="missing"):
+        create_app("testing")
+
+
+def test_whoami_requires_valid_token_with_scopes(app, client):
+    assert client.get("/api/whoami").status_code == 401
+    resp = client.get("/api/whoami", headers=_bearer("default.forged"))
+    assert resp.status_code == 401
+    assert resp.headers["WWW-Authenticate"].startswith("Bearer")
+    assert resp.get_json()["error"] == "unauthorized"
+
+    token, claims = mint_token(app, "svc-reports", ["read"])
+    client.get("/api/whoami", headers=_bearer(token))  # the deny-list is loaded once per worker
+    with capture_queries() as stats:
+        resp = client.get("/api/whoami", headers=_bearer(token))
+    assert resp.status_code == 200
+    assert resp.get_json() == {"sub": "svc-reports", "scopes": ["read"], "exp": claims.exp}
+    assert stats.count == 0
+
+
+def test_missing_scope_is_forbidden(app):
+    from myapp.blueprints.api.utils import api_auth_required
+
+    view = api_auth_required("write")(lambda: "ok")
+    token, _ = mint_token(app, "svc", ["read"])
+    with app.test_request_context(headers=_bearer(token)):
+        with pytest.raises(Forbidden):
+            view()
+
+
+def test_revoked_token_is_rejected_by_other_workers(app, client):
+    token, claims = mint_token(app, "svc-leaked", ["read"])
+    assert client.get("/api/whoami", headers=_bearer(token)).status_code == 200
+
+    # A second app stands in for another worker with its own deny-list
+    worker = create_app("testing")
+    other = worker.test_client()
+    assert other.get("/api/whoami", headers=_bearer(token)).status_code == 200
+
+    result = app.test_cli_runner().invoke(args=["revoke-token", token])
+    assert result.exit_code == 0, result.output
+    assert client.get("/api/whoami", headers=_bearer(token)).status_code == 401
+
+    revocations = worker.extensions[EXTENSION_KEY]
+    revocations.reload()  # what the refresh thread does every API_TOKEN_REVOCATION_REFRESH
+    assert revocations.is_revoked(claims.jti)
+    assert other.get("/api/whoami", headers=_bearer(token)).status_code == 401
+    revocations.stop()
+
+
+def test_expired_revocations_are_dropped(app):
+    with app.app_context():
+        _, stale = mint_token(app, "svc", ttl=-10)
+        revoke_token(stale)
+        _db.session.commit()
+        _, fresh = mint_token(app, "svc")
+        revoke_token(fresh)
+        _db.session.commit()
+        assert _db.session.get(RevokedToken, stale.jti) is None
+
+        revocations = get_revocation_list()
+        revocations.reload()
+        assert revocations.is_revoked(fresh.jti)
+        assert not revocations.is_revoked(stale.jti)
+
+
+def test_mint_token_cli(app):
+    result = app.test_cli_runner().invoke(
+        args=["mint-token", "svc-cli", "--scope", "read", "--ttl", "120"]
+    )
+    assert result.exit_code == 0, result.output
+    claims = decode_token(app, result.stdout.strip())
+    assert claims.sub == "svc-cli"
+    assert claims.scopes == {"read"}
+    assert claims.exp <= time.time() + 120
+    assert f"jti={claims.jti}" in result.stderr
+
+    result = app.test_cli_runner().invoke(args=["revoke-token", "nope"])
+    assert result.exit_code != 0
+    assert "Not a valid token" in result.output
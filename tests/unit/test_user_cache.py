@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from sqlalchemy import event
+
+from myapp.auth.user_cache import UserCache, get_user_cache
+from myapp.models import User
+from tests.helpers import create_user
+
+
+def test_lru_evicts_least_recently_used():
+    cache = UserCache(maxsize=2, ttl=60)
+    cache.put(1, {"id": 1})
+    cache.put(2, {"id": 2})
+    assert cache.get(1) == {"id": 1}  # 1 becomes most recent
+
+    cache.put(3, {"id": 3})
+
+    assert cache.get(2) is None
+    assert cache.get(1) == {"id": 1}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_count_as_miss():
+    cache = UserCache(maxsize=8, ttl=0)
+    cache.put(1, {"id": 1})
+
+    assert cache.get(1) is None
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["size"] == 0
+
+
+def test_load_serves_hits_without_sql(app, db):
+    with app.app_context():
+        user = create_user(db, email="cache1@example.com", username="cache1")
+        user_id = user.id
+        cache = get_user_cache()
+        cache.clear()
+        db.session.remove()
+
+        statements = []
+
+        def _count(*args):
+            statements.append(args[2])
+
+        event.listen(db.engine, "before_cursor_execute", _count)
+        try:
+            first = cache.load(user_id)
+            db.session.remove()
+            second = cache.load(user_id)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _count)
+
+        assert len(statements) == 1
+        assert first.email == second.email == "cache1@example.com"
+        assert second in db.session
+        assert cache.stats()["hits"] >= 1
+
+
+def test_update_invalidates_entry(app, db):
+    with app.app_context():
+        user = create_user(db, email="cache2@example.com", username="cache2")
+        cache = get_user_cache()
+        cache.load(user.id)
+        assert cache.get(user.id) is not None
+
+        user.is_active = False
+        db.session.commit()
+
+        assert cache.get(user.id) is None
+        assert cache.load(user.id).is_active is False
+
+
+def test_bulk_update_clears_cache(app, db):
+    with app.app_context():
+        user = create_user(db, email="cache3@example.com", username="cache3")
+        cache = get_user_cache()
+        cache.load(user.id)
+
+        User.query.filter_by(id=user.id).update({"is_admin": True})
+        db.session.commit()
+
+        assert cache.stats()["size"] == 0
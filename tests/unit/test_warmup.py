@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from myapp import create_app
+from myapp.warmup import warmup
+
+
+def test_warmup_compiles_templates_and_opens_connections(app):
+    report = warmup(app, db_connections=2)
+
+    assert report["done"] is True
+    assert report["templates"] == len(app.jinja_env.list_templates())
+    assert report["routes"] > 0
+    assert report["db_connections"] == 2
+    assert app.extensions["warmup"] is report
+
+    cached = {key[1] for key in app.jinja_env.cache.keys()}
+    assert {"base.html", "auth/login.html", "errors/404.html"} <= cached
+
+
+def test_warmup_failures_are_logged_not_raised(app, monkeypatch):
+    import myapp.warmup as mod
+
+    def broken(app, connections):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(mod, "_warm_db", broken)
+    report = warmup(app)
+    assert report["db_connections"] is None
+    assert report["done"] is True
+
+
+def test_create_app_runs_warmup_when_enabled(monkeypatch):
+    monkeypatch.setenv("WARMUP_ON_CREATE", "1")
+    app = create_app("testing")
+    assert app.extensions["warmup"]["done"] is True